@@ -1,9 +1,20 @@
 const CHANNEL_ID = 'UCHf0witGYPnp5RYuijgV3Vw'; // Cricket Australia channel ID
+const SEARCH_INDEX_VERSION = 2; // Shard layout this page understands, see search_index.py
 
 class VideoPlayer {
     constructor() {
         this.videos = [];        // Current filtered/displayed videos
         this.allVideos = [];     // Store all videos for searching
+        this.totalVideos = 0;    // Size of the category, including shards still loading
+        this.manifest = undefined;  // Shard manifest, null when not published
+        this.remainingShards = Promise.resolve();
+        this.searchIndex = undefined;  // Search index listing, null when not published
+        this.searchShards = {};  // Loaded token shards with their videos' display records, by key
+        this.pendingVideos = undefined;  // Webhook videos the next scheduled run folds into the catalog
+        // Published files have precompressed copies S3 serves with Content-Encoding;
+        // browsers only decode brotli from secure origins, so plain HTTP gets gzip
+        this.compressedSuffix = window.isSecureContext ? '.br' : '.gz';
+        this.searchSeq = 0;
         this.currentPage = 1;
         this.loading = false;
         this.currentCategory = 'matches';
@@ -102,14 +113,7 @@ class VideoPlayer {
             document.getElementById('loading').style.display = 'block';
             document.getElementById('load-more').style.display = 'none';
             
-            const url = `${this.basePath}/static/data/${this.currentCategory}_videos.json`;
-            const response = await fetch(url);
-            
-            if (!response.ok) {
-                throw new Error(`Failed to load videos: ${response.status}`);
-            }
-
-            this.allVideos = await response.json();  // Store all videos
+            await this.fetchCategoryVideos(this.currentCategory);
             
             // Calculate pagination
             const startIndex = (this.currentPage - 1) * 20;
@@ -121,7 +125,7 @@ class VideoPlayer {
                 this.renderVideos();
                 
                 // Show/hide load more button
-                const hasMore = endIndex < this.allVideos.length;
+                const hasMore = endIndex < this.totalVideos;
                 document.getElementById('load-more').style.display = hasMore ? 'block' : 'none';
                 if (!hasMore) {
                     this.showNoMoreVideos();
@@ -137,6 +141,103 @@ class VideoPlayer {
         }
     }
 
+    async fetchJson(path) {
+        const [file, query] = path.split('?');
+        if (this.compressedSuffix) {
+            try {
+                const url = `${this.basePath}/static/data/${file}${this.compressedSuffix}${query ? `?${query}` : ''}`;
+                const response = await fetch(url);
+                if (response.ok) {
+                    return await response.json();
+                }
+            } catch (error) {
+                // Hosts that serve the copies without Content-Encoding get the plain files from now on
+                this.compressedSuffix = '';
+            }
+        }
+
+        const response = await fetch(`${this.basePath}/static/data/${path}`);
+        if (!response.ok) {
+            throw new Error(`Failed to load videos: ${response.status}`);
+        }
+        return response.json();
+    }
+
+    async loadManifest() {
+        if (this.manifest === undefined) {
+            try {
+                this.manifest = await this.fetchJson('manifest.json');
+            } catch (error) {
+                this.manifest = null;
+            }
+
+            // Only ask for copies the publisher could produce
+            const encodings = (this.manifest && this.manifest.encodings) || [];
+            if (this.compressedSuffix === '.br' && !encodings.includes('br')) {
+                this.compressedSuffix = encodings.includes('gzip') ? '.gz' : '';
+            }
+        }
+        return this.manifest;
+    }
+
+    async loadPendingVideos() {
+        if (this.pendingVideos === undefined) {
+            try {
+                // Small and rewritten often, so it is published without compressed copies
+                const response = await fetch(`${this.basePath}/static/data/pending_deltas.json`);
+                this.pendingVideos = response.ok ? await response.json() : [];
+            } catch (error) {
+                this.pendingVideos = [];
+            }
+        }
+        return this.pendingVideos;
+    }
+
+    mergePending(videos, pending) {
+        // Pending copies replace published ones with the same ID
+        if (pending.length === 0) return videos;
+        const ids = new Set(pending.map(video => video.id));
+        return pending.concat(videos.filter(video => !ids.has(video.id)))
+            .sort((a, b) => (b.upload_ts || 0) - (a.upload_ts || 0));
+    }
+
+    async fetchCategoryVideos(category) {
+        const [manifest, pendingVideos] = await Promise.all([this.loadManifest(), this.loadPendingVideos()]);
+        const entry = manifest && manifest.categories && manifest.categories[category];
+        const pending = pendingVideos.filter(video => video.category === category);
+
+        // Without shards, fall back to the full category file
+        if (!entry || entry.shards.length === 0) {
+            this.allVideos = this.mergePending(await this.fetchJson(`${category}_videos.json`), pending);
+            this.totalVideos = this.allVideos.length;
+            this.remainingShards = Promise.resolve();
+            return;
+        }
+
+        // Newest shards first, just enough for the first page
+        const shards = [...entry.shards];
+        let videos = [];
+        while (shards.length > 0 && videos.length < 20) {
+            videos = videos.concat(await this.fetchJson(shards.shift().name));
+        }
+        this.allVideos = this.mergePending(videos, pending);
+        this.totalVideos = entry.count + this.allVideos.length - videos.length;
+
+        // The rest loads in the background for paging and search, from the
+        // compact file when there is more than one request's worth of shards
+        const rest = entry.compact && shards.length > 1
+            ? this.fetchJson(entry.compact).then(decodeCompactCatalog)
+            : Promise.all(shards.map(shard => this.fetchJson(shard.name)))
+                .then(older => videos.concat(...older));
+        this.remainingShards = rest
+            .then(all => {
+                if (this.currentCategory === category) {
+                    this.allVideos = this.mergePending(all, pending);
+                }
+            })
+            .catch(error => console.error('Error loading older videos:', error));
+    }
+
     renderVideos() {
         const grid = document.getElementById('video-grid');
         
@@ -226,6 +327,7 @@ class VideoPlayer {
             this.loading = true;
             document.getElementById('loading').style.display = 'block';
             
+            await this.remainingShards;
             const startIndex = this.currentPage * 20;
             const endIndex = startIndex + 20;
             const nextPageVideos = this.allVideos.slice(startIndex, endIndex);
@@ -566,7 +668,79 @@ class VideoPlayer {
         });
     }
 
-    filterVideos(query) {
+    tokenize(text) {
+        // Same normalization as search_index.py
+        return text.toLowerCase()
+            .normalize('NFKD')
+            .replace(/[\u0300-\u036f]/g, '')
+            .split(/[^a-z0-9]+/)
+            .filter(token => token.length >= (this.searchIndex ? this.searchIndex.min_token_length : 2));
+    }
+
+    async loadSearchIndex() {
+        if (this.searchIndex === undefined) {
+            try {
+                const index = await this.fetchJson('search/index.json');
+                this.searchIndex = index.version === SEARCH_INDEX_VERSION ? index : null;
+            } catch (error) {
+                this.searchIndex = null;
+            }
+        }
+        return this.searchIndex;
+    }
+
+    async loadSearchShard(key) {
+        const shard = this.searchIndex.shards[key];
+        if (!shard) return { tokens: {}, videos: new Map() };
+        if (!this.searchShards[key]) {
+            // A shard carries the display records of every video it lists, so results never need the catalog
+            this.searchShards[key] = this.fetchJson(`${shard.name}?v=${shard.hash}`)
+                .then(data => ({
+                    tokens: data.tokens,
+                    videos: new Map(decodeCompactCatalog(data.videos).map(video => [video.id, video]))
+                }));
+        }
+        return this.searchShards[key];
+    }
+
+    async searchCatalog(query) {
+        // Every query token is a prefix; a video must match all of them
+        const index = await this.loadSearchIndex();
+        const tokens = index ? this.tokenize(query) : [];
+        if (tokens.length === 0) return null;
+
+        let matches = null;
+        let shard = null;
+        for (const token of tokens) {
+            shard = await this.loadSearchShard(token.slice(0, index.prefix_length));
+            const ids = new Set();
+            for (const [key, videoIds] of Object.entries(shard.tokens)) {
+                if (key.startsWith(token)) {
+                    videoIds.forEach(id => ids.add(id));
+                }
+            }
+            matches = matches === null ? ids : new Set([...matches].filter(id => ids.has(id)));
+            if (matches.size === 0) break;
+        }
+
+        // Every match is listed in every shard read, so the last one has all their records
+        const results = [...matches]
+            .map(id => shard.videos.get(id))
+            .filter(video => video)
+            .sort((a, b) => (b.upload_ts || 0) - (a.upload_ts || 0));
+
+        // Pending videos are not in the index yet, so they are matched here
+        const pending = (await this.loadPendingVideos()).filter(video => {
+            const fields = [video.title, video.channel_name, video.source, ...(video.teams || [])];
+            const videoTokens = this.tokenize(fields.filter(field => field).join(' '));
+            return tokens.every(token => videoTokens.some(videoToken => videoToken.startsWith(token)));
+        });
+        return this.mergePending(results, pending);
+    }
+
+    async filterVideos(query) {
+        const seq = ++this.searchSeq;
+        await this.remainingShards;
         if (!query) {
             // If search is empty, restore original videos for current category
             const startIndex = (this.currentPage - 1) * 20;
@@ -580,8 +754,19 @@ class VideoPlayer {
                 this.showNoMoreVideos();
             }
         } else {
-            // Filter videos based on search query
-            this.videos = this.allVideos.filter(video => {
+            // Look the query up in the prebuilt index across the whole catalog
+            let results = null;
+            try {
+                results = await this.searchCatalog(query);
+            } catch (error) {
+                console.error('Error searching index:', error);
+            }
+
+            // A newer keystroke already rendered its results
+            if (seq !== this.searchSeq) return;
+
+            // Fall back to scanning the loaded category without an index
+            this.videos = results || this.allVideos.filter(video => {
                 const titleMatch = video.title.toLowerCase().includes(query.toLowerCase());
                 const teamsMatch = video.teams && video.teams.some(team => 
                     team.toLowerCase().includes(query.toLowerCase())
@@ -617,8 +802,7 @@ class VideoPlayer {
 
     async loadTeams() {
         try {
-            const response = await fetch(`${this.basePath}/static/data/teams.json`);
-            const data = await response.json();
+            const data = await this.fetchJson('teams.json');
             this.renderTeamFilters(data.teams);
         } catch (error) {
             console.error('Error loading teams:', error);
@@ -1,10 +1,11 @@
 import json
 import boto3
 import logging
-from datetime import datetime
 import requests
 from bs4 import BeautifulSoup
-from botocore.exceptions import ClientError
+from team_matcher import extract_teams_from_text, extract_ipl_teams
+from video_dates import upload_timestamp
+from conditional_write import update_json, merge_videos, missing_videos
 
 # Set up logging
 logger = logging.getLogger()
@@ -51,9 +52,10 @@ def fetch_videos(url, source, disclaimer):
                     'thumbnail_url': element['data-thumbnile'],
                     'external_url': video_url,
                     'category': 'matches',
-                    'teams': extract_teams_from_text(element['data-title']),
+                    'teams': get_video_teams(element['data-title'], source),
                     'source': source,
                     'upload_date': element['data-videodate'],
+                    'upload_ts': upload_timestamp(element['data-videodate']),
                     'disclaimer': disclaimer,
                     'channel_name': source,
                     'views': element.get('data-videoview', 'N/A')
@@ -68,110 +70,29 @@ def fetch_videos(url, source, disclaimer):
         logger.error(f"Error fetching {source} videos: {e}")
         return []
 
-def extract_teams_from_text(text):
-    """Extract team names from text"""
-    teams = set()
-    text_lower = text.lower()
-    
-    # Use dictionary comprehension for team variations
-    team_variations = {
-        team: variations for team, variations in {
-            'india': ['india', 'ind', 'bcci'],
-            'australia': ['australia', 'aus'],
-            'england': ['england', 'eng'],
-            'pakistan': ['pakistan', 'pak'],
-            'south africa': ['south africa', 'sa'],
-            'new zealand': ['new zealand', 'nz'],
-            'west indies': ['west indies', 'wi'],
-            'sri lanka': ['sri lanka', 'sl'],
-            'bangladesh': ['bangladesh', 'ban']
-        }.items() if any(v in text_lower for v in variations)
-    }
-    
-    teams.update(team_variations.keys())
-    return list(map(str.title, teams)) or ['International']
-
-def get_existing_videos(path):
-    """Get existing videos from S3 with proper error handling"""
-    try:
-        response = s3.get_object(Bucket=BUCKET_NAME, Key=path)
-        return json.loads(response['Body'].read().decode('utf-8'))
-    except ClientError as e:
-        error_code = e.response['Error']['Code']
-        if error_code == 'NoSuchKey':
-            logger.info(f"No existing file found at {path}")
-            return []
-        else:
-            logger.error(f"Error getting {path}: {e}")
-            raise
-    except Exception as e:
-        logger.error(f"Unexpected error getting {path}: {e}")
-        return []
-
-def parse_date(video):
-    """Parse date from various formats"""
-    try:
-        date_str = video.get('upload_date', '')
-        if not date_str:
-            return datetime.min
-            
-        if ',' in date_str:  # IPL/BCCI format (e.g., "3rd Nov, 2024")
-            parts = date_str.split(',')
-            year = parts[1].strip()
-            month_day = parts[0].strip().split(' ')
-            month = month_day[1]
-            # Remove ordinal suffixes (st, nd, rd, th)
-            day = ''.join(filter(str.isdigit, month_day[0]))
-            return datetime.strptime(f"{day} {month} {year}", "%d %b %Y")
-        elif 'T' in date_str:  # YouTube ISO format with time
-            return datetime.strptime(date_str.split('T')[0], "%Y-%m-%d")
-        else:  # Simple date format
-            return datetime.strptime(date_str, "%Y-%m-%d")
-    except Exception as e:
-        logger.error(f"Error parsing date '{date_str}': {e}")
-        return datetime.min
+def get_video_teams(title, source):
+    """Extract teams using the shared matcher, with IPL franchise codes for IPL videos"""
+    if source == 'IPL':
+        return extract_ipl_teams(title)
+    return extract_teams_from_text(title) or ['International']
 
 def update_json_files(videos):
-    """Update JSON files in S3 efficiently"""
+    """Merge new videos into the published JSON files with conditional writes, so concurrent writers don't lose videos"""
     try:
         file_paths = ['static/data/all_videos.json', 'static/data/matches_videos.json']
         
-        # Batch get existing files
-        existing_videos = {}
-        for path in file_paths:
-            try:
-                response = s3.get_object(Bucket=BUCKET_NAME, Key=path)
-                existing_videos[path] = json.loads(response['Body'].read().decode('utf-8'))
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'NoSuchKey':
-                    existing_videos[path] = []
-                else:
-                    raise
-        
-        # Process all files in memory first
-        updated_files = {}
-        for path, existing in existing_videos.items():
-            # Create index of existing videos
-            video_index = {v['id']: v for v in existing}
-            video_index.update({v.get('external_url'): v for v in existing if v.get('external_url')})
-            
-            # Add new videos
-            for video in videos:
-                if video['id'] not in video_index and video.get('external_url') not in video_index:
-                    video_index[video['id']] = video
-            
-            # Convert to list and sort by parsed date
-            updated_videos = list(video_index.values())
-            updated_videos.sort(key=parse_date, reverse=True)
-            
-            updated_files[path] = updated_videos
+        def merge(existing):
+            # Nothing to write when every video is already published
+            return merge_videos(existing, videos) if missing_videos(existing, videos) else None
         
-        # Batch update S3
-        for path, content in updated_files.items():
-            s3.put_object(
-                Bucket=BUCKET_NAME,
-                Key=path,
-                Body=json.dumps(content, ensure_ascii=False, separators=(',', ':')),
+        for path in file_paths:
+            update_json(
+                s3,
+                BUCKET_NAME,
+                path,
+                merge,
+                default=[],
+                variants=True,
                 ContentType='application/json',
                 CacheControl='no-cache'
             )
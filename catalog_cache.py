@@ -0,0 +1,43 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class CatalogCache:
+    """Parsed catalogs kept at module level, so warm Lambda containers skip re-parsing them"""
+
+    def __init__(self):
+        self.entries = {}  # key -> (etag, value)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def record(self, key, hit):
+        """Count and log a cache lookup"""
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            logger.info(f"Catalog cache {'hit' if hit else 'miss'} for {key} ({self.hits} hits, {self.misses} misses)")
+
+    def get(self, key, etag):
+        """Get a cached value if it was built from the given ETag"""
+        with self.lock:
+            entry = self.entries.get(key)
+        hit = bool(entry and etag and entry[0] == etag)
+        self.record(key, hit)
+        return entry[1] if hit else None
+
+    def put(self, key, etag, value):
+        """Cache a value built from the object with the given ETag"""
+        with self.lock:
+            self.entries[key] = (etag, value)
+
+    def invalidate(self, key):
+        """Forget a cached value, e.g. after a failed write"""
+        with self.lock:
+            self.entries.pop(key, None)
+
+# Shared by every invocation of a warm container
+catalog_cache = CatalogCache()
@@ -0,0 +1,338 @@
+import hashlib
+import json
+import logging
+import os
+from compact_catalog import encode_compact
+from data_compression import VARIANT_SUFFIXES, available_encodings, write_variants
+from search_index import SEARCH_INDEX_VERSION, SHARD_PREFIX_LENGTH, MIN_TOKEN_LENGTH, build_search_index
+from team_matcher import TEAM_VARIATIONS
+from video_dates import normalize_upload_dates, upload_year
+
+logger = logging.getLogger(__name__)
+
+# Category files published next to all_videos.json
+CATEGORIES = ['matches', 'domestic', 'interviews', 'classic', 'other']
+
+DOMESTIC_TOURNAMENTS = {
+    'india': ['ranji trophy', 'vijay hazare', 'syed mushtaq ali', 'duleep trophy'],
+    'england': ['county championship', 't20 blast', 'royal london cup', 'the hundred'],
+    'australia': ['sheffield shield', 'marsh cup', 'big bash'],
+    'west_indies': ['super50 cup', 'regional 4-day', 'cpl'],
+    'south_africa': ['4-day series', 'csa t20', 'momentum cup'],
+    'new_zealand': ['plunket shield', 'ford trophy', 'super smash'],
+    'pakistan': ['quaid-e-azam trophy', 'pakistan cup', 'national t20'],
+    'bangladesh': ['national cricket league', 'bangladesh premier league'],
+    'sri_lanka': ['premier league tournament', 'lanka premier league']
+}
+
+# Lists the per-year shards of every category, e.g. classic/2019.json
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Lists the token shards of the search index, e.g. search/ma.json
+SEARCH_INDEX_FILE = 'search/index.json'
+
+# International sides including their women's, U19 and A teams
+INTERNATIONAL_TEAMS = {
+    name.lower()
+    for team in TEAM_VARIATIONS
+    for name in (team, f"{team} Women", f"{team} U19", f"{team} A")
+}
+
+def load_existing_json(file_path):
+    """Load existing JSON file if it exists"""
+    try:
+        if os.path.exists(file_path):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not load existing file {file_path}: {e}")
+    return []
+
+def is_international_team(team_name):
+    """Determine if a team is an international team"""
+    return team_name.lower() in INTERNATIONAL_TEAMS
+
+class Catalog:
+    def __init__(self, videos=None):
+        self.videos = {}  # id -> video
+        self.external_urls = {}  # external_url -> id, for IPL/BCCI videos
+        if videos:
+            self.add_many(videos)
+
+    def __len__(self):
+        return len(self.videos)
+
+    def __contains__(self, video):
+        if video['id'] in self.videos:
+            return True
+        external_url = self.get_external_url(video)
+        return bool(external_url) and external_url in self.external_urls
+
+    def get_external_url(self, video):
+        """Get the external URL that identifies an IPL/BCCI video"""
+        if video.get('source') in ['IPL', 'BCCI']:
+            return video.get('external_url')
+        return None
+
+    def add(self, video):
+        """Add a video unless it is already known by ID or external URL"""
+        if video in self:
+            logger.debug(f"Skipping duplicate video: {video.get('title')}")
+            return False
+
+        self.videos[video['id']] = video
+        external_url = self.get_external_url(video)
+        if external_url:
+            self.external_urls[external_url] = video['id']
+        return True
+
+    def add_many(self, videos):
+        """Add videos, returning how many were new"""
+        return sum(1 for video in videos if self.add(video))
+
+    def remove(self, video_id):
+        """Remove a video by ID"""
+        video = self.videos.pop(video_id, None)
+        external_url = self.get_external_url(video) if video else None
+        if external_url:
+            self.external_urls.pop(external_url, None)
+
+    def sorted_videos(self):
+        """Get every video sorted by upload timestamp, newest first"""
+        videos = normalize_upload_dates(list(self.videos.values()))
+        videos.sort(key=lambda x: x['upload_ts'], reverse=True)
+        return videos
+
+def partition_catalog(videos):
+    """Split sorted videos by category and collect team stats in a single pass"""
+    partitions = {category: [] for category in CATEGORIES}
+    team_stats = {}
+
+    for video in videos:
+        if video['category'] in partitions:
+            partitions[video['category']].append(video)
+
+        for team in video.get('teams', []):
+            if team not in team_stats:
+                team_stats[team] = {
+                    'name': team,
+                    'video_count': 0,
+                    'matches': 0,
+                    'domestic_matches': 0,
+                    'latest_video': None
+                }
+            stats = team_stats[team]
+            stats['video_count'] += 1
+
+            # Count both international and domestic matches
+            if video['category'] == 'matches':
+                stats['matches'] += 1
+            elif video['category'] == 'domestic':
+                stats['domestic_matches'] += 1
+
+            # Videos arrive newest first, so the first one seen is the latest
+            if not stats['latest_video']:
+                stats['latest_video'] = {
+                    'id': video['id'],
+                    'title': video['title'],
+                    'thumbnail_url': video['thumbnail_url'],
+                    'upload_date': video['upload_date'],
+                    'upload_ts': video['upload_ts'],
+                    'category': video['category']
+                }
+
+    return partitions, build_teams_data(team_stats)
+
+def build_teams_data(team_stats):
+    """Build the teams.json structure from per-team stats"""
+    teams_data = {
+        'international_teams': [],
+        'domestic_teams': [],
+        'variations': {team: list(variations) for team, variations in TEAM_VARIATIONS.items()},
+        'domestic_tournaments': DOMESTIC_TOURNAMENTS
+    }
+
+    # Categorize teams as international or domestic
+    for stats in team_stats.values():
+        if is_international_team(stats['name']):
+            teams_data['international_teams'].append(stats)
+        else:
+            teams_data['domestic_teams'].append(stats)
+
+    # Sort teams by video count
+    teams_data['international_teams'].sort(key=lambda x: x['video_count'], reverse=True)
+    teams_data['domestic_teams'].sort(key=lambda x: x['video_count'], reverse=True)
+    return teams_data
+
+def encode_json(data):
+    """Encode a published data file"""
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+def write_json(file_path, data):
+    """Write a published data file"""
+    with open(file_path, 'wb') as f:
+        f.write(encode_json(data))
+
+def encode_shard(videos):
+    """Encode a shard compactly, it is only read by code"""
+    return json.dumps(videos, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def content_hash(data):
+    """Short content hash used to tell whether a published file changed"""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def write_if_changed(data_dir, name, data, unchanged_hashes):
+    """Write a published file unless the previous publish had the same content, returning its hash and whether it was written"""
+    digest = content_hash(data)
+
+    # Unchanged files keep their local copy and their copy in S3
+    if unchanged_hashes.get(name) == digest and os.path.exists(f'{data_dir}/{name}'):
+        return digest, False
+    with open(f'{data_dir}/{name}', 'wb') as f:
+        f.write(data)
+    return digest, True
+
+def write_file_if_changed(data_dir, name, data, rewrite=False):
+    """Write a published file unless its local copy already has the same content, returning whether it was written"""
+    file_path = f'{data_dir}/{name}'
+    if not rewrite and os.path.exists(file_path):
+        with open(file_path, 'rb') as f:
+            if content_hash(f.read()) == content_hash(data):
+                return False
+    with open(file_path, 'wb') as f:
+        f.write(data)
+    return True
+
+def remove_published(data_dir, names):
+    """Remove published files and their compressed copies"""
+    for name in names:
+        for stale in [name] + [f'{name}{suffix}' for suffix in VARIANT_SUFFIXES.values()]:
+            if os.path.exists(f'{data_dir}/{stale}'):
+                os.remove(f'{data_dir}/{stale}')
+
+def shard_videos(videos):
+    """Group sorted videos by upload year, newest year first"""
+    shards = {}
+    for video in videos:
+        year = upload_year(video)
+        shards.setdefault(str(year) if year else 'undated', []).append(video)
+    return shards
+
+def load_manifest(data_dir):
+    """Load the previously published shard manifest"""
+    manifest = load_existing_json(f'{data_dir}/{MANIFEST_FILE}')
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'categories': {}}
+    return manifest
+
+def publish_shards(partitions, data_dir):
+    """Write per-year shards of every category and the manifest, returning the files that changed"""
+    previous = load_manifest(data_dir)
+    previous_hashes = {
+        shard['name']: shard['hash']
+        for entry in previous['categories'].values()
+        for shard in entry['shards']
+    }
+
+    # Shards published without a compressed copy we can now produce are rewritten
+    encodings = available_encodings()
+    unchanged_hashes = previous_hashes if previous.get('encodings') == encodings else {}
+
+    manifest = {'version': MANIFEST_VERSION, 'encodings': encodings, 'categories': {}}
+    written = []
+    for category, category_videos in partitions.items():
+        os.makedirs(f'{data_dir}/{category}', exist_ok=True)
+        shards = []
+        for year, shard in shard_videos(category_videos).items():
+            name = f'{category}/{year}.json'
+            digest, changed = write_if_changed(data_dir, name, encode_shard(shard), unchanged_hashes)
+            shards.append({'name': name, 'year': year, 'count': len(shard), 'hash': digest})
+            if changed:
+                written.append(name)
+
+        manifest['categories'][category] = {
+            'count': len(category_videos),
+            'compact': f'{category}_videos.compact.json',
+            'shards': shards
+        }
+
+    # Drop shards for years that no longer have videos
+    current = {shard['name'] for entry in manifest['categories'].values() for shard in entry['shards']}
+    remove_published(data_dir, set(previous_hashes) - current)
+
+    logger.info(f"Rewrote {len(written)} of {len(current)} shards")
+    if written or manifest != previous:
+        write_json(f'{data_dir}/{MANIFEST_FILE}', manifest)
+        written.append(MANIFEST_FILE)
+    return written
+
+def publish_search_index(videos, data_dir):
+    """Write the token shards of the search index and its listing, returning the files that changed"""
+    previous = load_existing_json(f'{data_dir}/{SEARCH_INDEX_FILE}')
+    if not isinstance(previous, dict) or previous.get('version') != SEARCH_INDEX_VERSION:
+        previous = {'shards': {}}
+    previous_hashes = {shard['name']: shard['hash'] for shard in previous['shards'].values()}
+
+    encodings = available_encodings()
+    unchanged_hashes = previous_hashes if previous.get('encodings') == encodings else {}
+
+    index = {
+        'version': SEARCH_INDEX_VERSION,
+        'encodings': encodings,
+        'prefix_length': SHARD_PREFIX_LENGTH,
+        'min_token_length': MIN_TOKEN_LENGTH,
+        'shards': {}
+    }
+    written = []
+    os.makedirs(f'{data_dir}/search', exist_ok=True)
+    for key, shard in build_search_index(videos).items():
+        name = f'search/{key}.json'
+        digest, changed = write_if_changed(data_dir, name, encode_shard(shard), unchanged_hashes)
+        index['shards'][key] = {'name': name, 'tokens': len(shard['tokens']), 'hash': digest}
+        if changed:
+            written.append(name)
+
+    current = {shard['name'] for shard in index['shards'].values()}
+    remove_published(data_dir, set(previous_hashes) - current)
+
+    logger.info(f"Rewrote {len(written)} of {len(current)} search index shards")
+    if written or index != previous:
+        with open(f'{data_dir}/{SEARCH_INDEX_FILE}', 'wb') as f:
+            f.write(encode_shard(index))
+        written.append(SEARCH_INDEX_FILE)
+    return written
+
+def publish_catalog(catalog, data_dir):
+    """Write the category files, shards, search index, all_videos.json, teams.json and their compressed copies, returning the files written"""
+    videos = catalog.sorted_videos()
+    partitions, teams_data = partition_catalog(videos)
+    return publish_partitions(videos, partitions, teams_data, data_dir)
+
+def publish_partitions(videos, partitions, teams_data, data_dir, categories=None):
+    """Publish already partitioned videos, considering only the given category files when categories is set.
+
+    Files whose content is unchanged are neither rewritten nor recompressed,
+    so they are not uploaded again either.
+    """
+    # Copies compressed before an encoding we can now produce was available are redone
+    rewrite = load_manifest(data_dir).get('encodings') != available_encodings()
+
+    files = {}
+    for category, category_videos in partitions.items():
+        if categories is None or category in categories:
+            files[f'{category}_videos.json'] = encode_json(category_videos)
+            files[f'{category}_videos.compact.json'] = encode_compact(category_videos)
+    files['all_videos.json'] = encode_json(videos)
+    files['teams.json'] = encode_json(teams_data)
+
+    written = [name for name, data in files.items() if write_file_if_changed(data_dir, name, data, rewrite)]
+    logger.info(f"Rewrote {len(written)} of {len(files)} catalog files ({len(videos)} videos, "
+                f"{len(teams_data['international_teams'])} international and {len(teams_data['domestic_teams'])} domestic teams)")
+
+    written.extend(publish_shards(partitions, data_dir))
+    written.extend(publish_search_index(videos, data_dir))
+
+    # Precompressed copies of everything rewritten, served with Content-Encoding
+    written.extend(write_variants(data_dir, list(written)))
+    return written
@@ -0,0 +1,394 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from catalog_publisher import Catalog
+from video_dates import normalize_upload_date
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = 'state/videos.db'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS videos (
+    id TEXT PRIMARY KEY,
+    external_url TEXT,
+    title TEXT NOT NULL,
+    category TEXT NOT NULL,
+    source TEXT,
+    channel_id TEXT,
+    upload_date TEXT,
+    upload_ts INTEGER NOT NULL DEFAULT 0,
+    rules_version TEXT,
+    data TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_external_url ON videos (external_url);
+CREATE INDEX IF NOT EXISTS idx_videos_upload_ts ON videos (upload_ts DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_category ON videos (category, upload_ts DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_rules_version ON videos (rules_version);
+
+CREATE TABLE IF NOT EXISTS video_teams (
+    video_id TEXT NOT NULL REFERENCES videos (id) ON DELETE CASCADE,
+    team TEXT NOT NULL,
+    PRIMARY KEY (team, video_id)
+);
+CREATE INDEX IF NOT EXISTS idx_video_teams_video ON video_teams (video_id);
+CREATE INDEX IF NOT EXISTS idx_videos_updated_at ON videos (updated_at);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- Categories a video moved out of or was deleted from, until the next export
+CREATE TABLE IF NOT EXISTS category_changes (
+    category TEXT PRIMARY KEY
+);
+
+-- When each video's views and availability were last checked, and how many checks in a row failed
+CREATE TABLE IF NOT EXISTS refresh_state (
+    video_id TEXT PRIMARY KEY REFERENCES videos (id) ON DELETE CASCADE,
+    refreshed_at INTEGER NOT NULL,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+
+-- Per-team aggregates maintained by the triggers below
+CREATE TABLE IF NOT EXISTS team_stats (
+    team TEXT PRIMARY KEY,
+    video_count INTEGER NOT NULL DEFAULT 0,
+    matches INTEGER NOT NULL DEFAULT 0,
+    domestic_matches INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS video_teams_after_insert AFTER INSERT ON video_teams
+BEGIN
+    INSERT OR IGNORE INTO team_stats (team) VALUES (NEW.team);
+    UPDATE team_stats SET
+        video_count = video_count + 1,
+        matches = matches + (SELECT category = 'matches' FROM videos WHERE id = NEW.video_id),
+        domestic_matches = domestic_matches + (SELECT category = 'domestic' FROM videos WHERE id = NEW.video_id)
+    WHERE team = NEW.team;
+END;
+
+CREATE TRIGGER IF NOT EXISTS video_teams_after_delete AFTER DELETE ON video_teams
+BEGIN
+    UPDATE team_stats SET
+        video_count = video_count - 1,
+        matches = matches - (SELECT category = 'matches' FROM videos WHERE id = OLD.video_id),
+        domestic_matches = domestic_matches - (SELECT category = 'domestic' FROM videos WHERE id = OLD.video_id)
+    WHERE team = OLD.team;
+    DELETE FROM team_stats WHERE team = OLD.team AND video_count <= 0;
+END;
+
+-- A trigger's OR IGNORE is overridden by the upsert that fires it, so existing categories are skipped
+-- with NOT EXISTS instead; stores created with the OR IGNORE versions get them replaced
+DROP TRIGGER IF EXISTS videos_after_category_update;
+DROP TRIGGER IF EXISTS videos_before_delete;
+
+CREATE TRIGGER videos_after_category_update AFTER UPDATE OF category ON videos
+WHEN OLD.category IS NOT NEW.category
+BEGIN
+    UPDATE team_stats SET
+        matches = matches + (NEW.category = 'matches') - (OLD.category = 'matches'),
+        domestic_matches = domestic_matches + (NEW.category = 'domestic') - (OLD.category = 'domestic')
+    WHERE team IN (SELECT team FROM video_teams WHERE video_id = NEW.id);
+    INSERT INTO category_changes (category) SELECT OLD.category
+    WHERE NOT EXISTS (SELECT 1 FROM category_changes WHERE category = OLD.category);
+END;
+
+-- Remove team rows first so the aggregates still see the video's category
+CREATE TRIGGER videos_before_delete BEFORE DELETE ON videos
+BEGIN
+    DELETE FROM video_teams WHERE video_id = OLD.id;
+    INSERT INTO category_changes (category) SELECT OLD.category
+    WHERE NOT EXISTS (SELECT 1 FROM category_changes WHERE category = OLD.category);
+END;
+'''
+
+class CatalogStore:
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('PRAGMA foreign_keys=ON')
+            self.conn.executescript(SCHEMA)
+
+            # Stores created before team_stats existed need their aggregates built once
+            team_stats = self.conn.execute('SELECT COUNT(*) FROM team_stats').fetchone()[0]
+            video_teams = self.conn.execute('SELECT COUNT(*) FROM video_teams').fetchone()[0]
+            if video_teams and not team_stats:
+                self.rebuild_team_stats()
+            self.conn.commit()
+
+    def close(self):
+        """Checkpoint the WAL into the database file and close the connection"""
+        with self.lock:
+            self.checkpoint()
+            self.conn.close()
+
+    def checkpoint(self):
+        """Fold the WAL into the main database file so it can be copied alone"""
+        with self.lock:
+            self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def rebuild_team_stats(self):
+        """Recompute the per-team aggregates from the team membership rows"""
+        with self.lock:
+            self.conn.execute('DELETE FROM team_stats')
+            self.conn.execute(
+                "INSERT INTO team_stats (team, video_count, matches, domestic_matches) "
+                "SELECT t.team, COUNT(*), SUM(v.category = 'matches'), SUM(v.category = 'domestic') "
+                "FROM video_teams t JOIN videos v ON v.id = t.video_id GROUP BY t.team"
+            )
+            self.conn.commit()
+
+    def get_meta(self, key, default=None):
+        """Get a stored metadata value"""
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+            return row['value'] if row else default
+
+    def set_meta(self, key, value):
+        """Store a metadata value"""
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+                (key, str(value))
+            )
+            self.conn.commit()
+
+    def changed_categories(self, since):
+        """Get the categories with videos added, updated, moved or deleted since a timestamp"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT DISTINCT category FROM videos WHERE updated_at >= ? '
+                'UNION SELECT category FROM category_changes',
+                (since,)
+            ).fetchall()
+            return {row['category'] for row in rows}
+
+    def clear_category_changes(self):
+        """Forget category moves once they have been exported"""
+        with self.lock:
+            self.conn.execute('DELETE FROM category_changes')
+            self.conn.commit()
+
+    def get_team_stats(self):
+        """Get the per-team aggregates with each team's latest video"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT s.team, s.video_count, s.matches, s.domestic_matches, '
+                '(SELECT v.data FROM video_teams t JOIN videos v ON v.id = t.video_id '
+                ' WHERE t.team = s.team ORDER BY v.upload_ts DESC LIMIT 1) AS latest '
+                'FROM team_stats s WHERE s.video_count > 0'
+            ).fetchall()
+
+        team_stats = {}
+        for row in rows:
+            latest = json.loads(row['latest']) if row['latest'] else None
+            team_stats[row['team']] = {
+                'name': row['team'],
+                'video_count': row['video_count'],
+                'matches': row['matches'],
+                'domestic_matches': row['domestic_matches'],
+                'latest_video': {
+                    'id': latest['id'],
+                    'title': latest['title'],
+                    'thumbnail_url': latest.get('thumbnail_url'),
+                    'upload_date': latest.get('upload_date'),
+                    'upload_ts': latest.get('upload_ts'),
+                    'category': latest.get('category')
+                } if latest else None
+            }
+        return team_stats
+
+    def channel_activity(self, since):
+        """Get per channel the stored videos, the videos uploaded since a timestamp and the newest upload"""
+        # Upload times, not insert times, so a freshly seeded store does not count its whole catalog as new
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT channel_id, COUNT(*) AS total, SUM(upload_ts >= ?) AS added, MAX(upload_ts) AS newest '
+                'FROM videos WHERE channel_id IS NOT NULL GROUP BY channel_id',
+                (since,)
+            ).fetchall()
+            return {
+                row['channel_id']: {'total': row['total'], 'added': row['added'], 'newest_upload_ts': row['newest']}
+                for row in rows
+            }
+
+    def count_added(self, category, since):
+        """Get the number of videos in a category added since a timestamp"""
+        with self.lock:
+            return self.conn.execute(
+                'SELECT COUNT(*) FROM videos WHERE category = ? AND created_at >= ?', (category, since)
+            ).fetchone()[0]
+
+    def count(self):
+        """Get the number of stored videos"""
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0]
+
+    def get_external_url(self, video):
+        """Get the external URL that identifies an IPL/BCCI video"""
+        if video.get('source') in ['IPL', 'BCCI']:
+            return video.get('external_url') or None
+        return None
+
+    def existing_ids(self, video_ids):
+        """Get which of the given video IDs are still stored"""
+        existing = set()
+        with self.lock:
+            for start in range(0, len(video_ids), 500):
+                batch = video_ids[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT id FROM videos WHERE id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                existing.update(row['id'] for row in rows)
+        return existing
+
+    def ids(self):
+        """Get the set of stored video IDs, for fast membership checks"""
+        with self.lock:
+            return {row[0] for row in self.conn.execute('SELECT id FROM videos')}
+
+    def row_values(self, video, now):
+        """Get the column values for a video record"""
+        normalize_upload_date(video)
+        return (
+            video['id'],
+            self.get_external_url(video),
+            video.get('title', ''),
+            video.get('category', 'other'),
+            video.get('source'),
+            video.get('channel_id'),
+            video.get('upload_date'),
+            video['upload_ts'],
+            video.get('rules_version'),
+            json.dumps(video, ensure_ascii=False, separators=(',', ':')),
+            now,
+            now
+        )
+
+    def replace_teams(self, video):
+        """Rewrite the team membership rows of a video"""
+        self.conn.execute('DELETE FROM video_teams WHERE video_id = ?', (video['id'],))
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO video_teams (video_id, team) VALUES (?, ?)',
+            [(video['id'], team) for team in video.get('teams', [])]
+        )
+
+    def insert_new(self, videos):
+        """Insert videos that are not stored yet, returning the ones that were added"""
+        added = []
+        now = int(time.time())
+        with self.lock:
+            for video in videos:
+                cursor = self.conn.execute(
+                    'INSERT OR IGNORE INTO videos (id, external_url, title, category, source, channel_id, '
+                    'upload_date, upload_ts, rules_version, data, created_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    self.row_values(video, now)
+                )
+                if cursor.rowcount:
+                    self.replace_teams(video)
+                    added.append(video)
+            self.conn.commit()
+        return added
+
+    def upsert_many(self, videos):
+        """Insert or update stored videos by ID"""
+        now = int(time.time())
+        with self.lock:
+            for video in videos:
+                self.conn.execute(
+                    'INSERT INTO videos (id, external_url, title, category, source, channel_id, '
+                    'upload_date, upload_ts, rules_version, data, created_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (id) DO UPDATE SET external_url = excluded.external_url, '
+                    'title = excluded.title, category = excluded.category, source = excluded.source, '
+                    'channel_id = excluded.channel_id, upload_date = excluded.upload_date, '
+                    'upload_ts = excluded.upload_ts, rules_version = excluded.rules_version, '
+                    'data = excluded.data, updated_at = excluded.updated_at',
+                    self.row_values(video, now)
+                )
+                self.replace_teams(video)
+            self.conn.commit()
+        return len(videos)
+
+    def iter_videos(self, category=None, where=None, params=()):
+        """Stream stored videos newest first from the cursor, optionally for one category; the store is locked until iteration ends"""
+        query = 'SELECT data FROM videos'
+        conditions = []
+        if category:
+            conditions.append('category = ?')
+            params = (category,) + tuple(params)
+        if where:
+            conditions.append(where)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY upload_ts DESC'
+
+        with self.lock:
+            cursor = self.conn.execute(query, params)
+            for row in cursor:
+                yield json.loads(row['data'])
+
+    def get_videos(self, video_ids):
+        """Get stored videos by ID"""
+        videos = []
+        with self.lock:
+            for start in range(0, len(video_ids), 500):
+                batch = video_ids[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT data FROM videos WHERE id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                videos.extend(json.loads(row['data']) for row in rows)
+        return videos
+
+    def delete_many(self, video_ids):
+        """Delete stored videos by ID"""
+        with self.lock:
+            self.conn.executemany('DELETE FROM videos WHERE id = ?', [(video_id,) for video_id in video_ids])
+            self.conn.commit()
+
+    def refresh_candidates(self):
+        """Get every YouTube video with its upload time, views and last refresh, for the refresh sweeper"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT v.id, v.upload_ts, CAST(json_extract(v.data, '$.views') AS INTEGER) AS views, "
+                "COALESCE(r.refreshed_at, v.created_at) AS refreshed_at, COALESCE(r.misses, 0) AS misses "
+                "FROM videos v LEFT JOIN refresh_state r ON r.video_id = v.id "
+                "WHERE v.source IS NULL OR v.source NOT IN ('IPL', 'BCCI')"
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    def record_refresh(self, misses, now):
+        """Record a refresh of videos given as video ID -> consecutive failed checks"""
+        with self.lock:
+            self.conn.executemany(
+                'INSERT INTO refresh_state (video_id, refreshed_at, misses) VALUES (?, ?, ?) '
+                'ON CONFLICT (video_id) DO UPDATE SET refreshed_at = excluded.refreshed_at, misses = excluded.misses',
+                [(video_id, now, count) for video_id, count in misses.items()]
+            )
+            self.conn.commit()
+
+    def iter_stale_videos(self, rules_version):
+        """Iterate videos classified by a different rules version"""
+        return self.iter_videos(where='rules_version IS NOT ?', params=(rules_version,))
+
+    def load_catalog(self):
+        """Load every stored video into an in-memory catalog"""
+        return Catalog(self.iter_videos())
@@ -0,0 +1,73 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# search.list returns at most 50 results per page, and videos.list takes up to 50 IDs
+PAGE_SIZE = 50
+BATCH_SIZE = 50
+
+def query_order(queries, progress, now, revisit_seconds):
+    """Order the queries to page through: ones part way through first, then least recently run.
+
+    A query whose results were paged to the end is skipped until revisit_seconds
+    have passed, then started again from the first page.
+    """
+    due = []
+    for position, query in enumerate(queries):
+        state = progress.get(query, {})
+        in_progress = bool(state.get('page_token'))
+        completed_at = state.get('completed_at')
+        if completed_at and not in_progress and now - completed_at < revisit_seconds:
+            continue
+        due.append((not in_progress, state.get('last_run', 0), position, query))
+    due.sort()
+    return [query for *_, query in due]
+
+def discover(queries, progress, search_page, lookup, is_known, max_pages, revisit_seconds, save=None, now=None):
+    """Page through the classic queries, looking up details only for videos not already known.
+
+    search_page takes a query and page token and returns the page's video IDs and
+    the next page token. lookup takes up to 50 IDs and returns their records.
+    progress maps each query to its page token and last run, and is updated after
+    every page (and saved when save is given), so the next run carries on where
+    this one stopped.
+    """
+    now = int(now or time.time())
+    stats = {'pages': 0, 'found': 0, 'looked_up': 0, 'videos': []}
+    seen = set()
+
+    for query in query_order(queries, progress, now, revisit_seconds):
+        state = progress.setdefault(query, {})
+        while stats['pages'] < max_pages:
+            try:
+                video_ids, next_token = search_page(query, state.get('page_token'))
+                stats['pages'] += 1
+                stats['found'] += len(video_ids)
+
+                new_ids = [video_id for video_id in video_ids if video_id not in seen and not is_known(video_id)]
+                seen.update(video_ids)
+                for start in range(0, len(new_ids), BATCH_SIZE):
+                    batch = new_ids[start:start + BATCH_SIZE]
+                    stats['videos'].extend(lookup(batch))
+                    stats['looked_up'] += len(batch)
+            except Exception as e:
+                # Pages already read are recorded; this one is searched again next run
+                logger.error(f"Error discovering classic matches for '{query}', stopping: {e}")
+                return stats
+
+            state['last_run'] = now
+            state['page_token'] = next_token
+            if not next_token:
+                state['completed_at'] = now
+            if save:
+                save()
+            if not next_token:
+                break
+
+        if stats['pages'] >= max_pages:
+            break
+
+    logger.info(f"Classic discovery read {stats['pages']} pages: {stats['found']} results, "
+                f"{stats['looked_up']} new looked up, {len(stats['videos'])} kept")
+    return stats
@@ -0,0 +1,64 @@
+// Decoder for the compact video lists written by compact_catalog.py
+const COMPACT_FORMAT = 'videos-compact';
+const COMPACT_VERSION = 1;
+
+const STRING_FIELDS = new Set(['category', 'channel_name', 'channel_id', 'source', 'disclaimer', 'rules_version']);
+
+function formatCompactDuration(total) {
+    const hours = Math.floor(total / 3600);
+    const minutes = Math.floor((total % 3600) / 60);
+    const seconds = total % 60;
+    const parts = (hours ? `${hours}H` : '') + (minutes ? `${minutes}M` : '') + (seconds ? `${seconds}S` : '');
+    return parts ? `PT${parts}` : 'P0D';
+}
+
+function formatCompactTimestamp(uploadTs) {
+    // Same shape as YouTube's publishedAt, without milliseconds
+    return new Date(uploadTs * 1000).toISOString().replace('.000Z', 'Z');
+}
+
+function decodeCompactVideo(values, data) {
+    const row = {};
+    data.fields.forEach((field, index) => {
+        row[field] = index < values.length ? values[index] : null;
+    });
+
+    const video = {};
+    data.fields.forEach(field => {
+        const value = row[field];
+        if (value === null || value === undefined || field === 'extra') return;
+        if (field === 'upload_date' && value === false) return;
+
+        if (STRING_FIELDS.has(field)) {
+            video[field] = data.strings[value];
+        } else if (field === 'teams') {
+            video[field] = value.map(team => data.strings[team]);
+        } else if (field === 'duration') {
+            video[field] = formatCompactDuration(value);
+        } else if (field === 'views') {
+            video[field] = String(value);
+        } else if (field === 'thumbnail_url' && typeof value === 'number') {
+            video[field] = data.thumbnails[value].replace('{id}', row.id);
+        } else if (field === 'thumbnail_src' && value === true) {
+            video[field] = video.thumbnail_url;
+        } else {
+            video[field] = value;
+        }
+    });
+
+    if (row.upload_date === null && typeof row.upload_ts === 'number') {
+        video.upload_date = formatCompactTimestamp(row.upload_ts);
+    }
+    return Object.assign(video, row.extra || {});
+}
+
+function decodeCompactCatalog(data) {
+    if (data.format !== COMPACT_FORMAT || data.version !== COMPACT_VERSION) {
+        throw new Error(`Unsupported compact catalog: ${data.format} v${data.version}`);
+    }
+    return data.videos.map(values => decodeCompactVideo(values, data));
+}
+
+if (typeof module !== 'undefined') {
+    module.exports = { decodeCompactCatalog };
+}
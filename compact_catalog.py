@@ -0,0 +1,172 @@
+import json
+import re
+from datetime import datetime, timezone
+
+COMPACT_FORMAT = 'videos-compact'
+COMPACT_VERSION = 1
+
+# Position of each field in a row; trailing absent fields are dropped
+FIELDS = [
+    'id', 'title', 'upload_ts', 'upload_date', 'category', 'teams',
+    'channel_name', 'channel_id', 'source', 'duration', 'views',
+    'thumbnail_url', 'thumbnail_src', 'external_url', 'disclaimer',
+    'rules_version', 'extra'
+]
+
+# Fields stored as an index into the shared string table
+STRING_FIELDS = {'category', 'channel_name', 'channel_id', 'source', 'disclaimer', 'rules_version'}
+
+# YouTube thumbnails are derived from the video ID instead of stored per record
+THUMBNAIL_TEMPLATES = [
+    'https://i.ytimg.com/vi/{id}/hqdefault.jpg',
+    'https://i.ytimg.com/vi/{id}/maxresdefault.jpg'
+]
+
+ISO_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+DURATION_PATTERN = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+
+def duration_seconds(duration):
+    """Convert a canonical ISO 8601 duration to seconds, None if it can't round-trip"""
+    match = DURATION_PATTERN.fullmatch(duration)
+    if not match or duration == 'PT':
+        return None
+    hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    total = hours * 3600 + minutes * 60 + seconds
+    return total if format_duration(total) == duration else None
+
+def format_duration(total):
+    """Convert seconds back to the ISO 8601 duration YouTube returns"""
+    hours, rest = divmod(total, 3600)
+    minutes, seconds = divmod(rest, 60)
+    parts = (f'{hours}H' if hours else '') + (f'{minutes}M' if minutes else '') + (f'{seconds}S' if seconds else '')
+    return f'PT{parts}' if parts else 'P0D'
+
+def format_timestamp(upload_ts):
+    """Format an upload timestamp the way YouTube publishes dates"""
+    return datetime.fromtimestamp(upload_ts, timezone.utc).strftime(ISO_TIMESTAMP_FORMAT)
+
+class StringTable:
+    def __init__(self, strings=None):
+        self.strings = list(strings or [])
+        self.index = {value: i for i, value in enumerate(self.strings)}
+
+    def add(self, value):
+        """Get the index of a string, adding it on first use"""
+        if value not in self.index:
+            self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return self.index[value]
+
+def encode_video(video, strings):
+    """Encode one video record as a row"""
+    row = dict.fromkeys(FIELDS)
+    extra = {}
+
+    for key, value in video.items():
+        if key not in row or value is None:
+            extra[key] = value
+        elif key in STRING_FIELDS and isinstance(value, str):
+            row[key] = strings.add(value)
+        elif key == 'teams' and isinstance(value, list) and all(isinstance(team, str) for team in value):
+            row[key] = [strings.add(team) for team in value]
+        else:
+            row[key] = value
+
+    # Dates that match the timestamp are rebuilt from it; False marks a record that has no date
+    if isinstance(row['upload_ts'], int) and row['upload_date'] == format_timestamp(row['upload_ts']):
+        row['upload_date'] = None
+    elif isinstance(row['upload_ts'], int) and 'upload_date' not in video:
+        row['upload_date'] = False
+
+    duration = row['duration']
+    if isinstance(duration, str) and duration_seconds(duration) is not None:
+        row['duration'] = duration_seconds(duration)
+    elif duration is not None:
+        extra['duration'] = duration
+        row['duration'] = None
+
+    views = row['views']
+    if isinstance(views, str) and views.isdigit() and str(int(views)) == views:
+        row['views'] = int(views)
+    elif views is not None and not isinstance(views, str):
+        extra['views'] = views
+        row['views'] = None
+
+    thumbnail_url = row['thumbnail_url']
+    templates = [template.format(id=video['id']) for template in THUMBNAIL_TEMPLATES]
+    if thumbnail_url in templates:
+        row['thumbnail_url'] = templates.index(thumbnail_url)
+    elif thumbnail_url is not None and not isinstance(thumbnail_url, str):
+        extra['thumbnail_url'] = thumbnail_url
+        row['thumbnail_url'] = None
+
+    # thumbnail_src is almost always a copy of thumbnail_url
+    if row['thumbnail_src'] is not None:
+        if row['thumbnail_src'] == thumbnail_url:
+            row['thumbnail_src'] = True
+        elif not isinstance(row['thumbnail_src'], str):
+            extra['thumbnail_src'] = row['thumbnail_src']
+            row['thumbnail_src'] = None
+
+    row['extra'] = extra or None
+    values = [row[field] for field in FIELDS]
+    while values and values[-1] is None:
+        values.pop()
+    return values
+
+def decode_video(values, strings, thumbnails=THUMBNAIL_TEMPLATES):
+    """Decode one row back into a video record"""
+    row = dict(zip(FIELDS, values))
+    video = {}
+
+    for field in FIELDS:
+        value = row.get(field)
+        if value is None or field == 'extra' or (field == 'upload_date' and value is False):
+            continue
+        if field in STRING_FIELDS:
+            video[field] = strings[value]
+        elif field == 'teams':
+            video[field] = [strings[team] for team in value]
+        elif field == 'duration':
+            video[field] = format_duration(value)
+        elif field == 'views':
+            video[field] = str(value)
+        elif field == 'thumbnail_url' and isinstance(value, int):
+            video[field] = thumbnails[value].format(id=row['id'])
+        elif field == 'thumbnail_src' and value is True:
+            video[field] = video['thumbnail_url']
+        else:
+            video[field] = value
+
+    if row.get('upload_date') is None and isinstance(row.get('upload_ts'), int):
+        video['upload_date'] = format_timestamp(row['upload_ts'])
+    video.update(row.get('extra') or {})
+    return video
+
+def encode_videos(videos):
+    """Encode a list of video records into the compact format"""
+    strings = StringTable()
+    rows = [encode_video(video, strings) for video in videos]
+    return {
+        'format': COMPACT_FORMAT,
+        'version': COMPACT_VERSION,
+        'fields': FIELDS,
+        'thumbnails': THUMBNAIL_TEMPLATES,
+        'strings': strings.strings,
+        'videos': rows
+    }
+
+def decode_videos(data):
+    """Decode the compact format back into video records"""
+    if data.get('format') != COMPACT_FORMAT or data.get('version') != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact catalog: {data.get('format')} v{data.get('version')}")
+    return [decode_video(values, data['strings'], data['thumbnails']) for values in data['videos']]
+
+def encode_compact(videos):
+    """Encode video records as the bytes of a compact file"""
+    return json.dumps(encode_videos(videos), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def read_compact(file_path):
+    """Read video records from a compact file"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return decode_videos(json.load(f))
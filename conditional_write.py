@@ -0,0 +1,126 @@
+import json
+import logging
+import random
+import time
+from botocore.exceptions import ClientError
+from data_compression import put_variants
+from video_dates import normalize_upload_dates
+
+logger = logging.getLogger(__name__)
+
+# Attempts before a writer gives up on an object other writers keep changing
+MAX_ATTEMPTS = 5
+
+# Backoff between attempts in seconds, doubled each time with full jitter
+RETRY_BASE_DELAY = 0.1
+
+# S3 answers a failed If-Match/If-None-Match with 412, or 409 when another conditional write is in flight
+CONFLICT_CODES = {'PreconditionFailed', 'ConditionalRequestConflict', '412', '409'}
+
+class WriteConflictError(Exception):
+    """Raised when a conditional write keeps losing to other writers"""
+
+def is_conflict(error):
+    """Check whether a failed put lost a race with another writer"""
+    return isinstance(error, ClientError) and error.response['Error']['Code'] in CONFLICT_CODES
+
+def backoff(attempt):
+    """Sleep before retrying a conflicting write"""
+    time.sleep(random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt))
+
+def read_object(s3, bucket, key):
+    """Get an object's body and ETag, (None, None) if it doesn't exist"""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            return None, None
+        raise
+    return response['Body'].read(), response['ETag'].strip('"')
+
+def read_json(s3, bucket, key, default=None):
+    """Get a parsed JSON object and its ETag, (default, None) if it doesn't exist"""
+    body, etag = read_object(s3, bucket, key)
+    if body is None:
+        return default, None
+    return json.loads(body.decode('utf-8')), etag
+
+def conditional_put(s3, bucket, key, body, etag, **extra_args):
+    """Put an object only if it still has the given ETag, or only if it doesn't exist when etag is None"""
+    condition = {'IfMatch': f'"{etag}"'} if etag else {'IfNoneMatch': '*'}
+    response = s3.put_object(Bucket=bucket, Key=key, Body=body, **condition, **extra_args)
+    return response['ETag'].strip('"')
+
+def read_if_changed(s3, bucket, key, etag):
+    """Get an object's body and ETag unless it still has the given ETag, (None, etag) if it does"""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key, IfNoneMatch=f'"{etag}"')
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        if code in ('304', 'NotModified'):
+            return None, etag
+        if code in ('404', 'NoSuchKey'):
+            return None, None
+        raise
+    return response['Body'].read(), response['ETag'].strip('"')
+
+def sync_variants(s3, bucket, key, etag, max_attempts=MAX_ATTEMPTS, **extra_args):
+    """Rebuild a file's compressed variants when a newer write replaced the version they were built from"""
+    for _ in range(max_attempts):
+        body, current = read_if_changed(s3, bucket, key, etag)
+        if body is None:
+            return
+        logger.info(f"{key} changed after its variants were written, rebuilding them")
+        put_variants(s3, bucket, key, body, **extra_args)
+        etag = current
+    logger.warning(f"Variants of {key} may be stale after {max_attempts} attempts")
+
+def update_json(s3, bucket, key, merge, default=None, variants=False, max_attempts=MAX_ATTEMPTS, **extra_args):
+    """Read-modify-write a JSON object, re-reading and re-merging whenever another writer got there first.
+
+    merge returns the new value, or None when the current one needs no change.
+    """
+    for attempt in range(max_attempts):
+        current, etag = read_json(s3, bucket, key, default)
+        updated = merge(current)
+        if updated is None:
+            return etag
+        body = json.dumps(updated, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        try:
+            new_etag = conditional_put(s3, bucket, key, body, etag, **extra_args)
+        except ClientError as e:
+            if not is_conflict(e):
+                raise
+            logger.info(f"Conflicting write to {key}, merging again (attempt {attempt + 1} of {max_attempts})")
+            backoff(attempt)
+            continue
+
+        if variants:
+            put_variants(s3, bucket, key, body, **extra_args)
+            sync_variants(s3, bucket, key, new_etag, **extra_args)
+        return new_etag
+    raise WriteConflictError(f"Gave up writing {key} after {max_attempts} conflicting attempts")
+
+def missing_videos(videos, others):
+    """Get the videos in others that are not in videos, matching by ID or external URL"""
+    ids = {video['id'] for video in videos}
+    urls = {video['external_url'] for video in videos if video.get('external_url')}
+    missing = []
+    for video in others:
+        url = video.get('external_url')
+        if video['id'] in ids or (url and url in urls):
+            continue
+        missing.append(video)
+        ids.add(video['id'])
+        if url:
+            urls.add(url)
+    return missing
+
+def merge_videos(videos, new_videos):
+    """Add new videos to a published list, newest first"""
+    extra = missing_videos(videos, new_videos)
+    if not extra:
+        return videos
+    merged = normalize_upload_dates(extra + list(videos))
+    merged.sort(key=lambda video: video['upload_ts'], reverse=True)
+    return merged
@@ -1,4 +1,5 @@
 import os
+import re
 from typing import List
 from dotenv import load_dotenv
 
@@ -6,11 +7,15 @@ from dotenv import load_dotenv
 load_dotenv()
 
 def get_api_keys() -> List[str]:
-    """Get API keys from environment variables"""
+    """Get API keys from environment variables, YOUTUBE_API_KEY_1 onwards in order"""
+    numbered = []
+    for name, value in os.environ.items():
+        match = re.fullmatch(r'YOUTUBE_API_KEY_(\d+)', name)
+        if match and value:
+            numbered.append((int(match.group(1)), value))
     keys = []
-    for i in range(1, 6):  # For 5 API keys
-        key = os.getenv(f'YOUTUBE_API_KEY_{i}')
-        if key:
+    for _, key in sorted(numbered):
+        if key not in keys:
             keys.append(key)
     return keys
 
@@ -38,5 +43,45 @@ BCCI_VIDEO_BASE_URL = "https://www.bcci.tv/videos/highlights"
 IPL_DISCLAIMER = "IPL videos are available on the official IPLT20.com website. Click to watch on the official platform."
 BCCI_DISCLAIMER = "BCCI videos are available on the official BCCI.tv website. Click to watch on the official platform."
 
+# Fetch concurrency: worker pool size and per API/host token buckets (requests per second, burst)
+FETCH_MAX_WORKERS = 4
+RATE_LIMITS = {
+    'youtube': (5, 5),
+    'www.iplt20.com': (1, 1),
+    'www.bcci.tv': (1, 1)
+}
+
 # S3 Configuration
-BUCKET_NAME = 'latestcrickethighlights-videos'
\ No newline at end of file
+BUCKET_NAME = 'latestcrickethighlights-videos'
+
+# Concurrent S3 transfers when publishing and restoring the data files
+S3_MAX_WORKERS = 8
+
+# Webhook batching: each invocation drains its queued notifications in videos.list lookups of up to 50 IDs
+WEBHOOK_BATCH_SIZE = 50
+
+# Quota planning: how often the scheduled fetch runs, and units kept back for webhook lookups
+FETCH_RUN_INTERVAL_MINUTES = 60
+QUOTA_RESERVE_UNITS = 500
+
+# Refresh sweeper: videos.list batches (1 unit per 50 videos) spent per run on view counts and removed videos
+REFRESH_UNITS_PER_RUN = 40
+
+# Classic match discovery: search queries paged through in turn, search.list pages (100 units each, plus
+# one videos.list unit per 50 new IDs) read per run, and days before a query that was read to the end starts over
+CLASSIC_TEAMS = ['India', 'Australia', 'England', 'Pakistan', 'South Africa', 'New Zealand', 'West Indies', 'Sri Lanka']
+CLASSIC_DECADES = ['1970s', '1980s', '1990s', '2000s', '2010s']
+CLASSIC_TOURNAMENTS = ['Cricket World Cup', 'T20 World Cup', 'Champions Trophy', 'The Ashes', 'Asia Cup']
+CLASSIC_QUERIES = (
+    ['classic cricket match highlights'] +
+    [f'{team} classic cricket match highlights' for team in CLASSIC_TEAMS] +
+    [f'{decade} cricket match highlights' for decade in CLASSIC_DECADES] +
+    [f'{tournament} classic match highlights' for tournament in CLASSIC_TOURNAMENTS]
+)
+CLASSIC_PAGES_PER_RUN = 2
+CLASSIC_REVISIT_DAYS = 30
+CLASSIC_MIN_VIEWS = 100000
+
+# Video details cache: videos.list items kept on local disk so known videos cost no lookups
+DETAILS_CACHE_TTL_HOURS = 24
+DETAILS_CACHE_MAX_ENTRIES = 20000
@@ -0,0 +1,114 @@
+import argparse
+import gzip
+import logging
+import os
+import time
+
+try:
+    import brotli
+except ImportError:  # brotli variants are skipped when the module is missing
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Published files are compressed once and downloaded many times, so use the highest levels
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Content-Encoding -> suffix of the precompressed copy
+VARIANT_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+def available_encodings():
+    """Get the encodings that can be produced in this environment"""
+    return ['gzip', 'br'] if brotli else ['gzip']
+
+def compress(data, encoding, level=None):
+    """Compress bytes with one content encoding"""
+    if encoding == 'gzip':
+        # Fixed mtime keeps the output stable for unchanged input
+        return gzip.compress(data, compresslevel=level or GZIP_LEVEL, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(data, quality=level or BROTLI_QUALITY)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def compressed_variants(data):
+    """Get every precompressed variant of some bytes"""
+    return {encoding: compress(data, encoding) for encoding in available_encodings()}
+
+def write_variants(data_dir, file_names):
+    """Write .gz and .br copies next to published files, returning their names"""
+    written = []
+    for file_name in file_names:
+        with open(f'{data_dir}/{file_name}', 'rb') as f:
+            data = f.read()
+        for encoding, compressed in compressed_variants(data).items():
+            variant = f'{file_name}{VARIANT_SUFFIXES[encoding]}'
+            with open(f'{data_dir}/{variant}', 'wb') as f:
+                f.write(compressed)
+            written.append(variant)
+    return written
+
+def content_encoding(file_name):
+    """Get the Content-Encoding of a precompressed file, None for plain files"""
+    for encoding, suffix in VARIANT_SUFFIXES.items():
+        if file_name.endswith(suffix):
+            return encoding
+    return None
+
+def upload_args(file_name, content_type='application/json', cache_control='no-cache'):
+    """Get the S3 ExtraArgs for a data file or one of its variants"""
+    extra_args = {'ContentType': content_type, 'CacheControl': cache_control}
+    encoding = content_encoding(file_name)
+    if encoding:
+        extra_args['ContentEncoding'] = encoding
+    return extra_args
+
+def put_variants(s3, bucket, key, body, **extra_args):
+    """Put the precompressed variants of a data file to S3"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    for encoding, compressed in compressed_variants(body).items():
+        s3.put_object(
+            Bucket=bucket,
+            Key=f'{key}{VARIANT_SUFFIXES[encoding]}',
+            Body=compressed,
+            ContentEncoding=encoding,
+            **extra_args
+        )
+
+def benchmark(data_dir, levels=None):
+    """Time each encoding and level against the bytes it saves on the published files"""
+    levels = levels or {'gzip': [1, 6, 9], 'br': [4, 9, 11]}
+    files = sorted(f for f in os.listdir(data_dir) if f.endswith('.json'))
+    data = {}
+    for file_name in files:
+        with open(f'{data_dir}/{file_name}', 'rb') as f:
+            data[file_name] = f.read()
+    raw_total = sum(len(d) for d in data.values())
+
+    results = []
+    for encoding in available_encodings():
+        for level in levels[encoding]:
+            start = time.perf_counter()
+            compressed_total = sum(len(compress(d, encoding, level)) for d in data.values())
+            elapsed = time.perf_counter() - start
+            results.append({
+                'encoding': encoding,
+                'level': level,
+                'seconds': round(elapsed, 3),
+                'bytes': compressed_total,
+                'saved': raw_total - compressed_total,
+                'ratio': round(raw_total / compressed_total, 1) if compressed_total else 0
+            })
+    return raw_total, results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark compression of the published data files')
+    parser.add_argument('data_dir', nargs='?', default='static/data')
+    args = parser.parse_args()
+
+    raw_total, results = benchmark(args.data_dir)
+    print(f"{raw_total} bytes uncompressed")
+    for result in results:
+        print(f"{result['encoding']:>5} level {result['level']:>2}: {result['bytes']:>9} bytes "
+              f"({result['ratio']}x, {result['saved']} saved) in {result['seconds']}s")
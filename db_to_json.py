@@ -1,142 +1,95 @@
-import sqlite3
-import json
+import argparse
 import os
 import logging
-from datetime import datetime
+import time
+from catalog_publisher import CATEGORIES, build_teams_data, load_existing_json, publish_catalog, publish_partitions
+from catalog_store import CatalogStore, DEFAULT_DB_PATH
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def load_existing_json(file_path):
-    """Load existing JSON file if it exists"""
-    try:
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        logger.warning(f"Could not load existing file {file_path}: {e}")
-    return []
+# Meta key holding the time the last export started
+EXPORT_WATERMARK_KEY = 'last_export_at'
+
+def newest_first(videos):
+    """Sort videos by upload timestamp, newest first"""
+    return sorted(videos, key=lambda x: x['upload_ts'], reverse=True)
 
-def merge_videos(existing_videos, new_videos):
-    """Merge new videos with existing ones, avoiding duplicates"""
-    # Create a dictionary of existing videos by ID
-    existing_dict = {video['id']: video for video in existing_videos}
-    
-    # Add or update videos
-    for video in new_videos:
-        existing_dict[video['id']] = video
-    
-    # Convert back to list and sort by upload date
-    merged = list(existing_dict.values())
-    merged.sort(key=lambda x: x['upload_date'], reverse=True)
-    return merged
+def apply_changes(previous, changed, removed, category=None):
+    """Replace the changed videos in a previously exported list and drop the removed ones"""
+    kept = [video for video in previous if video['id'] not in changed and video['id'] not in removed]
+    added = [video for video in changed.values() if category is None or video['category'] == category]
+    return newest_first(kept + added)
+
+def export_catalog(store, data_dir='static/data', incremental=True):
+    """Apply the rows changed since the last export to the exported files, then republish the shards, search index and teams"""
+    export_started = int(time.time())
+    last_export = int(store.get_meta(EXPORT_WATERMARK_KEY, 0)) if incremental else 0
+    exported = ['all_videos.json'] + [f'{category}_videos.json' for category in CATEGORIES]
+
+    if not last_export or not all(os.path.exists(f'{data_dir}/{name}') for name in exported):
+        publish_catalog(store.load_catalog(), data_dir)
+    else:
+        dirty = store.changed_categories(last_export)
+        if not dirty:
+            logger.info("No videos changed since the last export")
+            return True
 
-def convert_db_to_json():
-    """Convert videos database to JSON files, updating only new content"""
+        # Only rows touched since the last export are read from the store, the rest come from the exported files
+        changed = {video['id']: video for video in store.iter_videos(where='updated_at >= ?', params=(last_export,))}
+        partitions = {}
+        removed = set()
+        for category in CATEGORIES:
+            previous = load_existing_json(f'{data_dir}/{category}_videos.json')
+            if category in dirty:
+                # Videos deleted from the store are the ones it no longer has
+                unchanged_ids = [video['id'] for video in previous if video['id'] not in changed]
+                removed |= set(unchanged_ids) - store.existing_ids(unchanged_ids)
+                previous = apply_changes(previous, changed, removed, category)
+            partitions[category] = previous
+        videos = apply_changes(load_existing_json(f'{data_dir}/all_videos.json'), changed, removed)
+        logger.info(f"Exporting {len(changed)} changed and {len(removed)} deleted videos")
+
+        # Team aggregates are kept current by the store's triggers
+        teams_data = build_teams_data(store.get_team_stats())
+        publish_partitions(videos, partitions, teams_data, data_dir, categories=dirty)
+
+    store.clear_category_changes()
+    store.set_meta(EXPORT_WATERMARK_KEY, export_started)
+    return True
+
+def convert_db_to_json(db_path=DEFAULT_DB_PATH, data_dir='static/data', incremental=True):
+    """Convert videos database to JSON files, updating only changed content"""
     try:
         logger.info("Starting database to JSON conversion")
         
         # Create static/data directory if it doesn't exist
-        os.makedirs('static/data', exist_ok=True)
+        os.makedirs(data_dir, exist_ok=True)
         
-        with sqlite3.connect('videos.db') as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Get latest videos from database
-            cursor.execute('SELECT * FROM videos ORDER BY upload_date DESC')
-            new_videos = [dict(row) for row in cursor.fetchall()]
-            
-            if not new_videos:
+        store = CatalogStore(db_path)
+        try:
+            if not store.count():
                 logger.warning("No videos found in database")
                 return False
-            
-            # Update all_videos.json
-            all_videos_path = 'static/data/all_videos.json'
-            existing_all = load_existing_json(all_videos_path)
-            merged_all = merge_videos(existing_all, new_videos)
-            with open(all_videos_path, 'w', encoding='utf-8') as f:
-                json.dump(merged_all, f, ensure_ascii=False, indent=2)
-            logger.info(f"Updated all_videos.json with {len(merged_all)} total videos")
-            
-            # Update category-specific files
-            categories = ['matches', 'interviews', 'classic', 'other']
-            for category in categories:
-                category_path = f'static/data/{category}_videos.json'
-                existing_category = load_existing_json(category_path)
-                new_category_videos = [v for v in new_videos if v['category'] == category]
-                merged_category = merge_videos(existing_category, new_category_videos)
-                
-                with open(category_path, 'w', encoding='utf-8') as f:
-                    json.dump(merged_category, f, ensure_ascii=False, indent=2)
-                logger.info(f"Updated {category}_videos.json with {len(merged_category)} videos")
-            
-            # Update team stats
-            teams_path = 'static/data/teams.json'
-            existing_teams_data = load_existing_json(teams_path)
-            existing_teams = existing_teams_data.get('teams', []) if existing_teams_data else []
-            
-            team_stats = {}
-            # First, load existing team stats
-            for team in existing_teams:
-                team_stats[team['name']] = team
-            
-            # Update with new videos
-            for video in new_videos:
-                for team in video.get('teams', []):
-                    if team not in team_stats:
-                        team_stats[team] = {
-                            'name': team,
-                            'video_count': 0,
-                            'matches': 0,
-                            'latest_video': None
-                        }
-                    
-                    team_stats[team]['video_count'] += 1
-                    if video['category'] == 'matches':
-                        team_stats[team]['matches'] += 1
-                    
-                    # Update latest video if newer
-                    if not team_stats[team]['latest_video'] or \
-                       video['upload_date'] > team_stats[team]['latest_video']['upload_date']:
-                        team_stats[team]['latest_video'] = {
-                            'id': video['id'],
-                            'title': video['title'],
-                            'thumbnail_url': video['thumbnail_url'],
-                            'upload_date': video['upload_date']
-                        }
-            
-            # Save updated team stats
-            with open(teams_path, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'teams': list(team_stats.values()),
-                    'variations': get_team_variations()
-                }, f, ensure_ascii=False, indent=2)
-            logger.info(f"Updated teams.json with {len(team_stats)} teams")
-            
+
+            export_catalog(store, data_dir, incremental)
             logger.info("JSON conversion completed successfully")
             return True
+        finally:
+            store.close()
             
     except Exception as e:
         logger.error(f"Error converting database to JSON: {e}")
         return False
 
-def get_team_variations():
-    """Get variations of team names"""
-    return {
-        'australia': ['australia', 'aussies', 'aus'],
-        'india': ['india', 'ind', 'bcci', 'team india'],
-        'england': ['england', 'eng', 'english'],
-        'pakistan': ['pakistan', 'pak', 'pcb'],
-        'south africa': ['south africa', 'sa', 'proteas'],
-        'new zealand': ['new zealand', 'nz', 'black caps', 'blackcaps'],
-        'west indies': ['west indies', 'wi', 'windies', 'caribbean'],
-        'sri lanka': ['sri lanka', 'sl', 'lanka'],
-        'bangladesh': ['bangladesh', 'ban', 'tigers']
-    }
-
 if __name__ == "__main__":
-    success = convert_db_to_json()
+    parser = argparse.ArgumentParser(description='Export the video database to the static JSON files')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Path to the SQLite catalog')
+    parser.add_argument('--data-dir', default='static/data', help='Directory to write the JSON files to')
+    parser.add_argument('--full', action='store_true', help='Rebuild every file from the database instead of applying only changed rows')
+    args = parser.parse_args()
+
+    success = convert_db_to_json(args.db, args.data_dir, incremental=not args.full)
     if not success:
-        exit(1) 
\ No newline at end of file
+        exit(1)
@@ -0,0 +1,88 @@
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from conditional_write import conditional_put, is_conflict, backoff, update_json, WriteConflictError, MAX_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+# Webhook events are appended here and folded into the catalog by the scheduled run
+DELTA_PREFIX = 'deltas/'
+
+# Videos waiting in deltas, published for the site to merge over the catalog until the next run folds them in
+PENDING_KEY = 'static/data/pending_deltas.json'
+
+# S3 deletes at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+
+def delta_key(videos):
+    """Build a key that sorts deltas by the time they were written"""
+    return f"{DELTA_PREFIX}{int(time.time() * 1000):013d}-{videos[0]['id']}-{uuid.uuid4().hex[:8]}.json"
+
+def append_delta(s3, bucket, videos):
+    """Record new videos as one small delta object, returning its key"""
+    body = json.dumps({'created_at': int(time.time()), 'videos': videos}, ensure_ascii=False).encode('utf-8')
+    for attempt in range(MAX_ATTEMPTS):
+        # Create-only, so a key collision can never replace another writer's delta
+        key = delta_key(videos)
+        try:
+            conditional_put(s3, bucket, key, body, None, ContentType='application/json')
+        except ClientError as e:
+            if not is_conflict(e):
+                raise
+            backoff(attempt)
+            continue
+        logger.info(f"Appended delta {key} with {len(videos)} videos")
+        return key
+    raise WriteConflictError(f"Could not find a free delta key after {MAX_ATTEMPTS} attempts")
+
+def list_delta_keys(s3, bucket):
+    """List pending delta keys, oldest first"""
+    keys = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=DELTA_PREFIX):
+        keys.extend(item['Key'] for item in page.get('Contents', []))
+    return sorted(keys)
+
+def read_delta(s3, bucket, key):
+    """Read the videos recorded in one delta"""
+    response = s3.get_object(Bucket=bucket, Key=key)
+    return json.loads(response['Body'].read().decode('utf-8')).get('videos', [])
+
+def read_deltas(s3, bucket, max_workers=8):
+    """Read every pending delta, returning (key, videos) pairs oldest first"""
+    keys = list_delta_keys(s3, bucket)
+    if not keys:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda key: read_delta(s3, bucket, key), keys))
+    logger.info(f"Read {len(keys)} pending deltas")
+    return list(zip(keys, results))
+
+def delta_videos(deltas):
+    """Flatten deltas into one list of videos, keeping the latest copy of each"""
+    videos = {}
+    for _, delta in deltas:
+        for video in delta:
+            videos[video['id']] = video
+    return list(videos.values())
+
+def delete_deltas(s3, bucket, keys):
+    """Delete deltas that have been folded into the catalog"""
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[start:start + DELETE_BATCH_SIZE]
+        s3.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True})
+    logger.info(f"Deleted {len(keys)} compacted deltas")
+
+def publish_pending(s3, bucket, added=(), published_ids=()):
+    """Add videos to the published pending list and drop the ones the catalog now has"""
+    added = list(added)
+    dropped = set(published_ids) | {video['id'] for video in added}
+
+    def merge(pending):
+        videos = [video for video in pending if video['id'] not in dropped] + added
+        return videos if videos != pending else None
+
+    update_json(s3, bucket, PENDING_KEY, merge, default=[], ContentType='application/json', CacheControl='no-cache')
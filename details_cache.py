@@ -0,0 +1,112 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# videos.list takes up to 50 IDs per call
+BATCH_SIZE = 50
+
+# Every detail lookup asks for the same parts and fields, so any cached item serves any caller
+DETAILS_PARTS = "snippet,contentDetails,statistics,status"
+DETAILS_FIELDS = ("items(id,snippet(title,description,channelId,channelTitle,publishedAt,thumbnails),"
+                  "contentDetails/duration,statistics/viewCount,status(privacyStatus,embeddable))")
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS details (
+    video_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_details_used_at ON details(used_at);
+'''
+
+class VideoDetailsCache:
+    """videos.list items by video ID on local disk, expiring after a TTL and evicting the least recently used"""
+
+    def __init__(self, db_path, ttl_seconds, max_entries):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def size(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM details').fetchone()[0]
+
+    def get_many(self, video_ids):
+        """Get the cached items that have not expired, keyed by video ID"""
+        now = time.time()
+        items = {}
+        with self.lock:
+            for start in range(0, len(video_ids), 500):
+                batch = video_ids[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT video_id, data FROM details WHERE fetched_at >= ? AND video_id IN ({','.join('?' * len(batch))})",
+                    [now - self.ttl_seconds] + list(batch)
+                ).fetchall()
+                items.update((row['video_id'], json.loads(row['data'])) for row in rows)
+            if items:
+                self.conn.executemany(
+                    'UPDATE details SET used_at = ? WHERE video_id = ?', [(now, video_id) for video_id in items]
+                )
+                self.conn.commit()
+        return items
+
+    def put_many(self, items):
+        """Cache videos.list items, then drop expired entries and the least recently used past the size limit"""
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                'INSERT INTO details (video_id, data, fetched_at, used_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (video_id) DO UPDATE SET data = excluded.data, fetched_at = excluded.fetched_at, '
+                'used_at = excluded.used_at',
+                [(item['id'], json.dumps(item, separators=(',', ':')), now, now) for item in items]
+            )
+            self.conn.execute('DELETE FROM details WHERE fetched_at < ?', (now - self.ttl_seconds,))
+            self.conn.execute(
+                'DELETE FROM details WHERE video_id IN '
+                '(SELECT video_id FROM details ORDER BY used_at DESC LIMIT -1 OFFSET ?)', (self.max_entries,)
+            )
+            self.conn.commit()
+
+def get_details(cache, video_ids, fetch):
+    """Get videos.list items keyed by video ID, calling fetch only for the IDs the cache does not have.
+
+    fetch takes up to 50 IDs and returns their items; IDs it leaves out are
+    deleted or private and are looked up again next time.
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    items = cache.get_many(video_ids) if cache is not None else {}
+    missing = [video_id for video_id in video_ids if video_id not in items]
+
+    for start in range(0, len(missing), BATCH_SIZE):
+        fetched = fetch(missing[start:start + BATCH_SIZE])
+        if cache is not None:
+            cache.put_many(fetched)
+        items.update((item['id'], item) for item in fetched)
+
+    if video_ids:
+        logger.debug(f"Video details: {len(video_ids) - len(missing)} of {len(video_ids)} from cache")
+    return items
@@ -1,53 +1,257 @@
-import time
-from typing import Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from conditional_write import read_json, update_json
+
+logger = logging.getLogger(__name__)
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+except Exception:  # no tz database; Pacific standard time is close enough for a daily reset
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+# YouTube's daily quota per key, reset at midnight Pacific time
+DAILY_QUOTA_LIMIT = 10000
+
+# Quota units charged per API method
+METHOD_COSTS = {
+    'search.list': 100,
+    'videos.list': 1,
+    'playlistItems.list': 1,
+    'channels.list': 1
+}
+
+# 403 reasons that mean a key has no quota left today
+QUOTA_ERROR_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+
+def quota_day(now: Optional[datetime] = None) -> str:
+    """Get the quota day a moment falls in, as the Pacific date"""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(QUOTA_TIMEZONE).date().isoformat()
+
+def key_id(api_key: str) -> str:
+    """Identify a key in the ledger without storing the key itself"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+def is_quota_exceeded(error) -> bool:
+    """Check whether a YouTube API error means the key's daily quota is spent"""
+    if getattr(error, 'resp', None) is None or error.resp.status != 403:
+        return False
+    details = getattr(error, 'error_details', None)
+    if not details:
+        try:
+            details = json.loads(error.content.decode('utf-8'))['error']['errors']
+        except Exception:
+            # A 403 without a readable reason is treated as quota, as it always was
+            return True
+    return any(isinstance(detail, dict) and detail.get('reason') in QUOTA_ERROR_REASONS for detail in details)
+
+class SQLiteQuotaLedger:
+    """Quota usage per key and Pacific day in a local SQLite file, shared by processes on one host"""
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.lock = threading.RLock()
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS quota_usage ('
+                'key_id TEXT NOT NULL, day TEXT NOT NULL, units INTEGER NOT NULL, '
+                'PRIMARY KEY (key_id, day))'
+            )
+            self.conn.commit()
+
+    def usage(self, day: str) -> Dict[str, int]:
+        """Get the units each key has used on a day"""
+        with self.lock:
+            rows = self.conn.execute('SELECT key_id, units FROM quota_usage WHERE day = ?', (day,)).fetchall()
+        return dict(rows)
+
+    def charge(self, day: str, kid: str, units: int):
+        """Add units to a key's usage for a day"""
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO quota_usage (key_id, day, units) VALUES (?, ?, ?) '
+                'ON CONFLICT (key_id, day) DO UPDATE SET units = units + excluded.units',
+                (kid, day, units)
+            )
+            self.conn.commit()
+
+    def exhaust(self, day: str, kid: str, limit: int):
+        """Record that a key has no quota left for a day"""
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO quota_usage (key_id, day, units) VALUES (?, ?, ?) '
+                'ON CONFLICT (key_id, day) DO UPDATE SET units = MAX(units, excluded.units)',
+                (kid, day, limit)
+            )
+            self.conn.commit()
+
+    def flush(self):
+        """Charges are written as they happen"""
+
+class S3QuotaLedger:
+    """Quota usage shared by every Lambda through one S3 object.
+
+    Charges are buffered and merged into the object with conditional writes, so
+    concurrent containers add to each other's usage instead of replacing it.
+    """
+
+    # Merge buffered charges once this many units are pending
+    FLUSH_UNITS = 200
+
+    # Days kept in the object; older ones can no longer affect any key
+    KEEP_DAYS = 2
+
+    def __init__(self, s3, bucket: str, key: str = 'state/quota_ledger.json'):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.days = None  # day -> key ID -> units, as last read
+        self.pending = {}  # day -> key ID -> units not merged yet
+        self.exhausted = {}  # day -> key ID -> limit not merged yet
+        self.lock = threading.RLock()
+
+    def load(self):
+        document, _ = read_json(self.s3, self.bucket, self.key, default={})
+        self.days = document.get('days', {})
+
+    def usage(self, day: str) -> Dict[str, int]:
+        """Get the units each key has used on a day, including charges not merged yet"""
+        with self.lock:
+            if self.days is None:
+                self.load()
+            usage = dict(self.days.get(day, {}))
+            for kid, units in self.pending.get(day, {}).items():
+                usage[kid] = usage.get(kid, 0) + units
+            for kid, limit in self.exhausted.get(day, {}).items():
+                usage[kid] = max(usage.get(kid, 0), limit)
+            return usage
+
+    def charge(self, day: str, kid: str, units: int):
+        """Buffer units against a key, merging them once enough are pending"""
+        with self.lock:
+            day_pending = self.pending.setdefault(day, {})
+            day_pending[kid] = day_pending.get(kid, 0) + units
+            if sum(sum(day_units.values()) for day_units in self.pending.values()) >= self.FLUSH_UNITS:
+                self.flush()
+
+    def exhaust(self, day: str, kid: str, limit: int):
+        """Record that a key has no quota left for a day, telling other containers right away"""
+        with self.lock:
+            self.exhausted.setdefault(day, {})[kid] = limit
+            self.flush()
+
+    def flush(self):
+        """Merge buffered charges into the shared object"""
+        with self.lock:
+            if not self.pending and not self.exhausted:
+                return
+            pending, exhausted = self.pending, self.exhausted
+            merged = {}
+
+            def merge(document):
+                days = {day: dict(usage) for day, usage in document.get('days', {}).items()}
+                for day, usage in pending.items():
+                    day_usage = days.setdefault(day, {})
+                    for kid, units in usage.items():
+                        day_usage[kid] = day_usage.get(kid, 0) + units
+                for day, usage in exhausted.items():
+                    day_usage = days.setdefault(day, {})
+                    for kid, limit in usage.items():
+                        day_usage[kid] = max(day_usage.get(kid, 0), limit)
+                merged['days'] = dict(sorted(days.items())[-self.KEEP_DAYS:])
+                return merged
+
+            try:
+                update_json(self.s3, self.bucket, self.key, merge, default={}, ContentType='application/json')
+            except Exception as e:
+                # Keep the charges buffered; a ledger outage must not stop the API calls themselves
+                logger.warning(f"Could not update quota ledger {self.key}: {e}")
+                return
+            self.days = merged['days']
+            self.pending, self.exhausted = {}, {}
 
 class YouTubeKeyManager:
-    def __init__(self, api_keys):
+    def __init__(self, api_keys, ledger=None, daily_quota_limit=DAILY_QUOTA_LIMIT):
         self.api_keys = api_keys
-        self.current_key_index = 0
-        self.quota_usage = {key: 0 for key in api_keys}
-        self.last_used = {key: 0 for key in api_keys}
-        self.daily_quota_limit = 10000  # YouTube's daily quota limit
-        
-    def get_current_key(self) -> Optional[str]:
-        """Get the current usable API key"""
-        current_time = time.time()
-        
-        # Try all keys
-        for _ in range(len(self.api_keys)):
-            key = self.api_keys[self.current_key_index]
-            
-            # Reset quota if 24 hours have passed
-            if current_time - self.last_used[key] >= 86400:  # 24 hours
-                self.quota_usage[key] = 0
-                
-            # If key has available quota, use it
-            if self.quota_usage[key] < self.daily_quota_limit:
-                return key
-                
-            # Try next key
-            self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-        
-        return None
-    
-    def next_key(self) -> Optional[str]:
-        """Switch to next API key and return it"""
-        self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-        return self.get_current_key()
-    
+        self.daily_quota_limit = daily_quota_limit  # YouTube's daily quota limit
+
+        # Usage persists across containers and runs; without a ledger it only lasts this process
+        self.ledger = ledger or SQLiteQuotaLedger(':memory:')
+        self.key_ids = {key: key_id(key) for key in api_keys}
+
+        # Shared by concurrent fetchers; reentrant because methods call each other
+        self.lock = threading.RLock()
+
+    @property
+    def quota_usage(self) -> Dict[str, int]:
+        """Units each key has used today"""
+        usage = self.ledger.usage(quota_day())
+        return {key: usage.get(kid, 0) for key, kid in self.key_ids.items()}
+
+    def get_current_key(self, cost: int = 1) -> Optional[str]:
+        """Get the key with the most quota left today, None if none can afford the cost"""
+        with self.lock:
+            available = {key: self.daily_quota_limit - used for key, used in self.quota_usage.items()}
+            usable = [key for key in self.api_keys if available[key] >= cost]
+            if not usable:
+                return None
+            return max(usable, key=lambda key: available[key])
+
+    def next_key(self, failed_key: Optional[str] = None) -> Optional[str]:
+        """Get the next key to use after failed_key ran out of quota"""
+        with self.lock:
+            if failed_key is not None:
+                self.mark_exhausted(failed_key)
+            return self.get_current_key()
+
+    def acquire_key(self, cost: int = 1) -> Optional[str]:
+        """Get a usable key and charge its quota in one atomic step"""
+        with self.lock:
+            key = self.get_current_key(cost)
+            if key is not None:
+                self.update_quota_usage(key, cost)
+            return key
+
+    def charge(self, key: str, method: str):
+        """Charge a key for one call of an API method"""
+        self.update_quota_usage(key, METHOD_COSTS.get(method, 1))
+
     def update_quota_usage(self, key: str, cost: int):
         """Update the quota usage for a key"""
-        self.quota_usage[key] += cost
-        self.last_used[key] = time.time()
-        
-        # If quota exceeded, move to next key
-        if self.quota_usage[key] >= self.daily_quota_limit:
-            self.next_key()
-    
+        with self.lock:
+            self.ledger.charge(quota_day(), self.key_ids[key], cost)
+
+    def mark_exhausted(self, key: str):
+        """Record that the API refused a key for quota, so nobody uses it again until the reset"""
+        with self.lock:
+            self.ledger.exhaust(quota_day(), self.key_ids[key], self.daily_quota_limit)
+
+    def flush(self):
+        """Write buffered usage to the ledger"""
+        with self.lock:
+            self.ledger.flush()
+
     def get_available_quota(self, key: str) -> int:
         """Get remaining quota for a key"""
-        return max(0, self.daily_quota_limit - self.quota_usage.get(key, 0))
-    
+        with self.lock:
+            return max(0, self.daily_quota_limit - self.quota_usage.get(key, 0))
+
+    def get_total_available_quota(self) -> int:
+        """Get the quota left today across every key"""
+        with self.lock:
+            return sum(max(0, self.daily_quota_limit - used) for used in self.quota_usage.values())
+
     def is_quota_available(self, key: str, required_quota: int = 1) -> bool:
         """Check if key has enough quota available"""
-        return self.get_available_quota(key) >= required_quota
\ No newline at end of file
+        return self.get_available_quota(key) >= required_quota
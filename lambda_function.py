@@ -1,8 +1,17 @@
 import json
 import boto3
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
 from video_fetcher import VideoFetcher
-from config import get_api_keys
+from key_manager import S3QuotaLedger
+from config import get_api_keys, FETCH_MAX_WORKERS, S3_MAX_WORKERS
+from data_compression import upload_args
+from catalog_cache import catalog_cache
+from catalog_publisher import load_existing_json
+from delta_log import read_deltas, delta_videos, delete_deltas, publish_pending
+from conditional_write import conditional_put, read_json, is_conflict, missing_videos, sync_variants, backoff
 import os
 
 # Set up logging
@@ -13,96 +22,438 @@ logger.setLevel(logging.INFO)
 s3 = boto3.client('s3')
 BUCKET_NAME = 'latestcrickethighlights-videos'  # Your S3 bucket name
 
+# Fetcher state kept between runs: uploads playlist IDs and per-channel watermarks,
+# and the SQLite catalog store the JSON files are generated from
+STATE_FILES = {
+    'sync_state.json': 'application/json',
+    'videos.db': 'application/vnd.sqlite3',
+    'published_hashes.json': 'application/json'
+}
+
+# MD5 of every data file as last uploaded, keyed by S3 key
+PUBLISHED_HASHES_PATH = '/tmp/state/published_hashes.json'
+
+# S3 ETag and local (mtime, size) of each data and state file in /tmp, kept across warm
+# invocations so unchanged files are revalidated with If-None-Match instead of downloaded again
+local_etags = {}
+
+# The store's catalog stays parsed in memory while state/videos.db keeps the ETag we uploaded
+STORE_KEY = 'state/videos.db'
+
+# Published data files, relative to static/data; year shards are uploaded when they change
+DATA_FILES = [
+    'all_videos.json',
+    'matches_videos.json',
+    'domestic_videos.json',
+    'interviews_videos.json',
+    'classic_videos.json',
+    'other_videos.json',
+    'teams.json'
+]
+
+# Previous shard and search index hashes, so unchanged shards are not rewritten or uploaded
+SHARD_LISTINGS = ['manifest.json', 'search/index.json']
+
+# Video lists the BCCI/IPL fetcher also writes. They are uploaded with If-Match against the version
+# this run downloaded; when another writer got there first its videos are merged in and the upload retried
+MERGED_FILES = [f for f in DATA_FILES if f.endswith('_videos.json')]
+MAX_REMERGE_ATTEMPTS = 3
+
+def download_state_files():
+    """Download changed fetcher state files from S3 to local /tmp directory"""
+    os.makedirs('/tmp/state', exist_ok=True)
+    for file_name in STATE_FILES:
+        try:
+            status, size = download_if_changed(f'state/{file_name}', f'/tmp/state/{file_name}')
+            if status == 'missing':
+                # Missing state just means the next run starts from the catalog
+                logger.info(f"No state file {file_name} in S3")
+            elif status == 'downloaded':
+                logger.info(f"Downloaded state/{file_name} from S3")
+        except Exception as e:
+            logger.info(f"No state file {file_name} downloaded: {e}")
+
+def upload_state_files():
+    """Upload fetcher state files from local /tmp to S3"""
+    for file_name, content_type in STATE_FILES.items():
+        local_path = f'/tmp/state/{file_name}'
+        if not os.path.exists(local_path):
+            continue
+        try:
+            s3.upload_file(
+                local_path,
+                BUCKET_NAME,
+                f'state/{file_name}',
+                ExtraArgs={'ContentType': content_type}
+            )
+            remember_etag(f'state/{file_name}', local_path, get_remote_etag(f'state/{file_name}'))
+            logger.info(f"Uploaded state/{file_name} to S3")
+        except Exception as e:
+            logger.error(f"Error uploading state file {file_name}: {e}")
+
+def local_signature(local_path):
+    """Identify the local copy of a file, so edits since its ETag was recorded are noticed"""
+    stat = os.stat(local_path)
+    return stat.st_mtime_ns, stat.st_size
+
+def remember_etag(s3_path, local_path, etag):
+    """Record the S3 ETag matching the current local copy of a file"""
+    if etag:
+        local_etags[s3_path] = (etag, local_signature(local_path))
+
+def cached_etag(s3_path, local_path):
+    """Get the ETag of the local copy of a file, None if there is none or it changed"""
+    entry = local_etags.get(s3_path)
+    if not entry or not os.path.exists(local_path):
+        return None
+    etag, signature = entry
+    return etag if local_signature(local_path) == signature else None
+
+def download_if_changed(s3_path, local_path):
+    """Download an object unless the local copy is current, returning (status, bytes)"""
+    request = {'Bucket': BUCKET_NAME, 'Key': s3_path}
+    etag = cached_etag(s3_path, local_path)
+    if etag:
+        request['IfNoneMatch'] = f'"{etag}"'
+    
+    try:
+        response = s3.get_object(**request)
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        if code in ('304', 'NotModified'):
+            return 'not_modified', 0
+        if code in ('404', 'NoSuchKey'):
+            local_etags.pop(s3_path, None)
+            return 'missing', 0
+        raise
+    
+    # Write beside the target and swap, so a failed transfer never leaves half a file
+    size = 0
+    with open(f'{local_path}.part', 'wb') as f:
+        for chunk in response['Body'].iter_chunks():
+            f.write(chunk)
+            size += len(chunk)
+    os.replace(f'{local_path}.part', local_path)
+    remember_etag(s3_path, local_path, response['ETag'].strip('"'))
+    return 'downloaded', size
+
+def download_file_if_changed(file_name):
+    """Download one data file unless the local copy is current, returning (status, bytes)"""
+    local_path = f'/tmp/static/data/{file_name}'
+    status, size = download_if_changed(f'static/data/{file_name}', local_path)
+    if status == 'missing':
+        # Create empty file if it doesn't exist in S3
+        with open(local_path, 'w') as f:
+            json.dump([], f)
+        logger.info(f"Created new empty file {file_name}")
+    elif status == 'downloaded':
+        logger.info(f"Downloaded {file_name} from S3")
+    return status, size
+
 def download_existing_files():
-    """Download existing JSON files from S3 to local /tmp directory"""
+    """Download changed JSON files from S3 to local /tmp directory concurrently"""
     try:
-        # Create tmp/static/data directory
-        os.makedirs('/tmp/static/data', exist_ok=True)
-        
-        # List of files to download
-        files = [
-            'all_videos.json',
-            'matches_videos.json',
-            'interviews_videos.json',
-            'classic_videos.json',
-            'other_videos.json',
-            'teams.json'
-        ]
-        
-        for file_name in files:
-            try:
-                s3_path = f'static/data/{file_name}'
-                local_path = f'/tmp/static/data/{file_name}'
-                
-                # Download file from S3
-                s3.download_file(BUCKET_NAME, s3_path, local_path)
-                logger.info(f"Downloaded {file_name} from S3")
-            except s3.exceptions.NoSuchKey:
-                # Create empty file if it doesn't exist in S3
-                with open(local_path, 'w') as f:
-                    json.dump([], f)
-                logger.info(f"Created new empty file {file_name}")
-            except Exception as e:
-                logger.error(f"Error downloading {file_name}: {e}")
+        # Create tmp/static/data and search index directories
+        os.makedirs('/tmp/static/data/search', exist_ok=True)
+        
+        files = DATA_FILES + SHARD_LISTINGS
+        stats = {'downloaded': 0, 'downloaded_bytes': 0, 'not_modified': 0, 'missing': 0, 'failed': 0}
+        with ThreadPoolExecutor(max_workers=S3_MAX_WORKERS) as executor:
+            futures = {executor.submit(download_file_if_changed, f): f for f in files}
+            for future, file_name in futures.items():
+                try:
+                    status, size = future.result()
+                except Exception as e:
+                    logger.error(f"Error downloading {file_name}: {e}")
+                    stats['failed'] += 1
+                    continue
+                stats[status] += 1
+                if status == 'downloaded':
+                    stats['downloaded_bytes'] += size
+        
+        logger.info(f"Downloaded {stats['downloaded']} files ({stats['downloaded_bytes']} bytes), "
+                    f"{stats['not_modified']} not modified, {stats['missing']} missing, {stats['failed']} failed")
+        return stats
                 
     except Exception as e:
         logger.error(f"Error setting up local files: {e}")
         raise
 
-def upload_to_s3():
-    """Upload updated JSON files from local /tmp to S3"""
+def load_published_hashes():
+    """Load the hashes of the data files as last uploaded"""
     try:
-        files = [
-            'all_videos.json',
-            'matches_videos.json',
-            'interviews_videos.json',
-            'classic_videos.json',
-            'other_videos.json',
-            'teams.json'
-        ]
-        
-        for file_name in files:
-            try:
-                local_path = f'/tmp/static/data/{file_name}'
-                s3_path = f'static/data/{file_name}'
+        with open(PUBLISHED_HASHES_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_published_hashes(hashes):
+    """Save the hashes of the uploaded data files for the next run"""
+    os.makedirs(os.path.dirname(PUBLISHED_HASHES_PATH), exist_ok=True)
+    with open(PUBLISHED_HASHES_PATH, 'w') as f:
+        json.dump(hashes, f, indent=2, sort_keys=True)
+
+def file_md5(local_path):
+    """MD5 of a local file, which is the ETag S3 gives a single-part upload"""
+    digest = hashlib.md5()
+    with open(local_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_remote_etag(s3_path):
+    """Get the ETag of a published object, None if it doesn't exist"""
+    try:
+        return s3.head_object(Bucket=BUCKET_NAME, Key=s3_path)['ETag'].strip('"')
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+class UploadConflict(Exception):
+    """Raised when another writer replaced a video list since this run downloaded it"""
+
+    def __init__(self, s3_path, videos):
+        super().__init__(f"{s3_path} changed since it was downloaded")
+        self.videos = videos
+
+def put_merged_file(file_name, local_path, s3_path):
+    """Upload a shared video list only if S3 still has the version this run started from, returning its ETag"""
+    base_etag = local_etags.get(s3_path, (None, None))[0]
+    with open(local_path, 'rb') as f:
+        body = f.read()
+    
+    try:
+        return conditional_put(s3, BUCKET_NAME, s3_path, body, base_etag, **upload_args(file_name))
+    except ClientError as e:
+        if not is_conflict(e):
+            raise
+    
+    # Collect the other writer's videos for the store and retry against its version
+    remote, remote_etag = read_json(s3, BUCKET_NAME, s3_path, default=[])
+    local_etags[s3_path] = (remote_etag, None)
+    raise UploadConflict(s3_path, missing_videos(json.loads(body.decode('utf-8')), remote))
+
+def upload_file_if_changed(file_name, published_hashes):
+    """Upload one data file unless S3 already has the same content, returning (uploaded, size, md5)"""
+    local_path = f'/tmp/static/data/{file_name}'
+    s3_path = f'static/data/{file_name}'
+    size = os.path.getsize(local_path)
+    md5 = file_md5(local_path)
+    
+    # Fall back to the object's ETag for files this container has no record of
+    last_hash = published_hashes.get(s3_path)
+    if last_hash is None:
+        last_hash = get_remote_etag(s3_path)
+    if last_hash == md5:
+        remember_etag(s3_path, local_path, md5)
+        return False, size, md5
+    
+    if file_name in MERGED_FILES:
+        put_merged_file(file_name, local_path, s3_path)
+    else:
+        s3.upload_file(
+            local_path,
+            BUCKET_NAME,
+            s3_path,
+            ExtraArgs=upload_args(file_name)
+        )
+    remember_etag(s3_path, local_path, md5)
+    logger.info(f"Uploaded {file_name} to S3")
+    return True, size, md5
+
+def upload_to_s3(files=None):
+    """Upload changed JSON files from local /tmp to S3 concurrently, skipping unchanged ones"""
+    try:
+        files = DATA_FILES if files is None else files
+        published_hashes = load_published_hashes()
+        stats = {'uploaded': 0, 'uploaded_bytes': 0, 'skipped': 0, 'skipped_bytes': 0, 'failed': 0,
+                 'conflicts': 0, 'remerge_videos': []}
+        
+        # Shared video lists go first, so nothing derived from them is uploaded after a conflict;
+        # listings go last so clients never see a shard hash before the shard itself
+        merged = [f for f in files if f in MERGED_FILES]
+        listings = [f for f in files if any(f.startswith(listing) for listing in SHARD_LISTINGS)]
+        batches = [merged, [f for f in files if f not in merged and f not in listings], listings]
+        uploaded_lists = []
+        
+        with ThreadPoolExecutor(max_workers=S3_MAX_WORKERS) as executor:
+            for batch in batches:
+                futures = {executor.submit(upload_file_if_changed, f, published_hashes): f for f in batch}
+                for future, file_name in futures.items():
+                    try:
+                        uploaded, size, md5 = future.result()
+                    except UploadConflict as e:
+                        logger.info(f"Conflicting upload of {file_name}, {len(e.videos)} videos to merge")
+                        stats['conflicts'] += 1
+                        stats['remerge_videos'].extend(e.videos)
+                        continue
+                    except Exception as e:
+                        logger.error(f"Error uploading {file_name}: {e}")
+                        stats['failed'] += 1
+                        continue
+                    
+                    published_hashes[f'static/data/{file_name}'] = md5
+                    if uploaded:
+                        if file_name in merged:
+                            uploaded_lists.append(file_name)
+                        stats['uploaded'] += 1
+                        stats['uploaded_bytes'] += size
+                    else:
+                        stats['skipped'] += 1
+                        stats['skipped_bytes'] += size
                 
-                # Upload file to S3
-                s3.upload_file(
-                    local_path,
-                    BUCKET_NAME,
-                    s3_path,
-                    ExtraArgs={
-                        'ContentType': 'application/json',
-                        'CacheControl': 'no-cache'
-                    }
-                )
-                logger.info(f"Uploaded {file_name} to S3")
-            except Exception as e:
-                logger.error(f"Error uploading {file_name}: {e}")
+                if stats['conflicts']:
+                    break
+        
+        # Variants uploaded after a newer write to their list are rebuilt from it
+        if not stats['conflicts']:
+            for file_name in uploaded_lists:
+                s3_path = f'static/data/{file_name}'
+                sync_variants(s3, BUCKET_NAME, s3_path, published_hashes[s3_path], **upload_args(file_name))
+        
+        save_published_hashes(published_hashes)
+        logger.info(f"Uploaded {stats['uploaded']} files ({stats['uploaded_bytes']} bytes), "
+                    f"skipped {stats['skipped']} unchanged ({stats['skipped_bytes']} bytes), "
+                    f"{stats['conflicts']} conflicts, {stats['failed']} failed")
+        return stats
                 
     except Exception as e:
         logger.error(f"Error uploading files to S3: {e}")
         raise
 
+def publish_files(fetcher):
+    """Upload the fetcher's published files, merging in videos other writers published meanwhile"""
+    files = list(fetcher.published_files or [])
+    stats = upload_to_s3(files)
+    for attempt in range(MAX_REMERGE_ATTEMPTS):
+        if not stats['conflicts']:
+            return stats
+        
+        # Other writers' videos go into the store, so the next publish keeps them too
+        if stats['remerge_videos']:
+            fetcher.update_json_files(stats['remerge_videos'])
+            files.extend(f for f in fetcher.published_files if f not in files)
+        backoff(attempt)
+        stats = upload_to_s3(files)
+    
+    if stats['conflicts']:
+        logger.error(f"Gave up publishing after {MAX_REMERGE_ATTEMPTS} conflicting attempts")
+        stats['failed'] += stats['conflicts']
+    return stats
+
+def store_missing_videos(fetcher):
+    """Get the videos in the downloaded video lists that the store lacks, such as ones the BCCI/IPL fetcher wrote"""
+    if not fetcher.use_store:
+        return []
+    if fetcher.catalog is None:
+        fetcher.catalog = fetcher.get_store().load_catalog()
+    
+    downloaded = []
+    for file_name in MERGED_FILES:
+        downloaded.extend(load_existing_json(f'{fetcher.base_path}/static/data/{file_name}'))
+    missing = missing_videos(list(fetcher.catalog.videos.values()), downloaded)
+    if missing:
+        logger.info(f"Folding in {len(missing)} videos other writers published to the video lists")
+    return missing
+
+def cache_store_catalog(fetcher):
+    """Keep the fetcher's catalog for the next warm invocation, tied to the uploaded store's ETag"""
+    etag = cached_etag(STORE_KEY, f'/tmp/{STORE_KEY}')
+    if fetcher.catalog is not None and etag:
+        catalog_cache.put(STORE_KEY, etag, fetcher.catalog)
+
 def lambda_handler(event, context):
     try:
         logger.info("Starting video update process")
         
         # Download existing files from S3
         download_existing_files()
+        download_state_files()
         
-        # Initialize video fetcher with tmp path
+        # Initialize video fetcher with tmp path, syncing only new uploads in parallel;
+        # quota usage is shared with the webhook and other containers through S3
         api_keys = get_api_keys()
-        fetcher = VideoFetcher(api_keys, base_path='/tmp')
+        fetcher = VideoFetcher(api_keys, base_path='/tmp', incremental=True, max_workers=FETCH_MAX_WORKERS,
+                               quota_ledger=S3QuotaLedger(s3, BUCKET_NAME))
         
-        # Fetch and update videos
-        # This will automatically update the local JSON files in /tmp
-        new_videos = fetcher.fetch_all_videos()
+        # Dry runs only report which sources this run's quota budget covers
+        if event and event.get('dry_run'):
+            plan = fetcher.plan_fetch()
+            if fetcher.store:
+                fetcher.store.close()
+            fetcher.details_cache.close()
+            return {
+                'statusCode': 200,
+                'body': json.dumps(plan)
+            }
         
-        if new_videos:
-            # Upload updated files to S3
-            upload_to_s3()
+        # Reuse the parsed catalog while nobody else has replaced the store; it is taken
+        # out of the cache while this run changes it and put back once the store is uploaded
+        fetcher.catalog = catalog_cache.get(STORE_KEY, cached_etag(STORE_KEY, f'/tmp/{STORE_KEY}'))
+        catalog_cache.invalidate(STORE_KEY)
+        
+        # The lists are uploaded If-Match the downloaded version but generated from the store,
+        # so whatever other writers put in them has to be in the store before publishing
+        downloaded_videos = store_missing_videos(fetcher)
+        
+        # Explicit reclassification after a rules change, without fetching
+        if event and event.get('reclassify_all'):
+            success = fetcher.reclassify_catalog(downloaded_videos)
+            if success:
+                publish_files(fetcher)
+                if fetcher.store:
+                    fetcher.store.close()
+                fetcher.details_cache.close()
+                upload_state_files()
+                cache_store_catalog(fetcher)
+            return {
+                'statusCode': 200 if success else 500,
+                'body': json.dumps('Reclassified all videos' if success else 'Failed to reclassify videos')
+            }
+        
+        # Webhook deltas are folded into this run and deleted once their videos are published
+        deltas = read_deltas(s3, BUCKET_NAME, max_workers=S3_MAX_WORKERS)
+        pending_videos = delta_videos(deltas) + downloaded_videos
+        
+        # Compaction only folds the deltas, without fetching
+        refreshed = False
+        if event and event.get('compact_deltas'):
+            new_videos = pending_videos
+            if new_videos:
+                fetcher.update_json_files(new_videos)
+        else:
+            # Refresh view counts and drop removed videos first, so the publish below includes them
+            refresh_stats = fetcher.refresh_catalog()
+            refreshed = refresh_stats['changed'] or refresh_stats['dropped']
             
+            # Fetch and update videos
+            # This will automatically update the local JSON files in /tmp
+            # Only the sources that fit this run's share of the daily quota are fetched
+            new_videos = fetcher.fetch_all_videos(pending_videos=pending_videos, plan=fetcher.plan_fetch())
+            if refreshed and not new_videos:
+                fetcher.update_json_files([])
+        
+        if new_videos or refreshed:
+            # Upload updated files to S3
+            upload_stats = publish_files(fetcher)
+            if deltas and fetcher.published_files is not None and not upload_stats['failed']:
+                delete_deltas(s3, BUCKET_NAME, [key for key, _ in deltas])
+                try:
+                    publish_pending(s3, BUCKET_NAME, published_ids=[video['id'] for video in delta_videos(deltas)])
+                except Exception as e:
+                    # The site dedups by ID, so a stale pending list only costs a few extra bytes
+                    logger.warning(f"Could not trim the pending list: {e}")
+        
+        # Watermarks in the uploaded state only cover uploads that made it into the store
+        if fetcher.store:
+            fetcher.store.close()
+        fetcher.details_cache.close()
+        upload_state_files()
+        cache_store_catalog(fetcher)
+        fetcher.key_manager.flush()
+        
+        if new_videos:
             logger.info(f"Successfully processed {len(new_videos)} new videos")
             return {
                 'statusCode': 200,
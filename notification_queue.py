@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Local buffer grouping notifications into shared lookups; what a failed invocation leaves lasts as long as the warm container
+DEFAULT_QUEUE_PATH = '/tmp/state/webhook_queue.db'
+
+# Give up on a video after this many failed lookups
+MAX_ATTEMPTS = 3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS queue (
+    video_id TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    received_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_queue_received_at ON queue(received_at);
+'''
+
+class NotificationQueue:
+    """Buffers hub notification video IDs until they are looked up in one batch"""
+
+    def __init__(self, db_path=DEFAULT_QUEUE_PATH):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def enqueue(self, entries):
+        """Queue (video_id, channel_id) pairs, ignoring ones already waiting; returns how many were new"""
+        now = time.time()
+        with self.lock:
+            before = self.size()
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO queue (video_id, channel_id, received_at) VALUES (?, ?, ?)',
+                [(video_id, channel_id, now) for video_id, channel_id in entries]
+            )
+            self.conn.commit()
+            return self.size() - before
+
+    def size(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+
+    def peek(self, limit):
+        """Get the oldest queued notifications as (video_id, channel_id) pairs without removing them"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT video_id, channel_id FROM queue ORDER BY received_at, video_id LIMIT ?', (limit,)
+            ).fetchall()
+        return [(row['video_id'], row['channel_id']) for row in rows]
+
+    def remove(self, video_ids):
+        """Drop notifications that have been published"""
+        with self.lock:
+            self.conn.executemany('DELETE FROM queue WHERE video_id = ?', [(video_id,) for video_id in video_ids])
+            self.conn.commit()
+
+    def record_failure(self, video_ids):
+        """Count a failed lookup, dropping notifications that keep failing"""
+        with self.lock:
+            self.conn.executemany(
+                'UPDATE queue SET attempts = attempts + 1 WHERE video_id = ?', [(video_id,) for video_id in video_ids]
+            )
+            dropped = self.conn.execute('DELETE FROM queue WHERE attempts >= ?', (MAX_ATTEMPTS,)).rowcount
+            self.conn.commit()
+        if dropped:
+            logger.warning(f"Dropped {dropped} notifications after {MAX_ATTEMPTS} failed lookups")
@@ -0,0 +1,107 @@
+import math
+from datetime import datetime, timedelta, timezone
+from key_manager import METHOD_COSTS, QUOTA_TIMEZONE, quota_day
+
+PLAN_VERSION = 1
+
+# Catalog history used to estimate how often each source adds videos
+ACTIVITY_WINDOW_DAYS = 30
+
+# Quiet sources still get an expected rate, so they are checked once their staleness adds up
+MIN_DAILY_RATE = 0.1
+
+# Results per playlistItems/search page and IDs per videos.list call
+PAGE_SIZE = 50
+
+# search.list stops returning results after about this many
+SEARCH_RESULT_LIMIT = 500
+
+def runs_left_today(now, interval_minutes):
+    """Count the scheduled runs left before the Pacific midnight quota reset, this one included"""
+    local_now = now.astimezone(QUOTA_TIMEZONE)
+    midnight = datetime.combine(local_now.date() + timedelta(days=1), datetime.min.time(), QUOTA_TIMEZONE)
+    seconds_left = (midnight - local_now).total_seconds()
+    return max(1, math.ceil(seconds_left / (interval_minutes * 60)))
+
+def run_budget(available_units, now, interval_minutes, reserve_units):
+    """Split the quota left today evenly over the remaining runs, keeping a reserve for the webhook"""
+    spendable = max(0, available_units - reserve_units)
+    return spendable // runs_left_today(now, interval_minutes)
+
+def staleness_days(checked_ts, newest_ts, now_ts):
+    """Days since a source was last checked, or since its newest known video if it never was, capped at the activity window"""
+    since = checked_ts or newest_ts
+    if not since:
+        return float(ACTIVITY_WINDOW_DAYS)
+    return min(float(ACTIVITY_WINDOW_DAYS), max(0.0, (now_ts - since) / 86400))
+
+def expected_videos(added, staleness):
+    """Expected new videos from the recent add rate and the time since the last check"""
+    rate = max(MIN_DAILY_RATE, added / ACTIVITY_WINDOW_DAYS)
+    return rate * staleness
+
+def channel_cost(incremental, expected, total, playlist_cached):
+    """Estimate the quota units one channel fetch will use"""
+    detail_calls = math.ceil(expected / PAGE_SIZE)
+    if incremental:
+        # Uploads playlist pages down to the watermark, plus the playlist lookup when it is not cached
+        pages = max(1, detail_calls)
+        lookup = 0 if playlist_cached else METHOD_COSTS['channels.list']
+        return lookup + pages * METHOD_COSTS['playlistItems.list'] + detail_calls * METHOD_COSTS['videos.list']
+
+    # A search fetch pages through the channel's whole result set every time
+    pages = max(1, math.ceil(min(max(total, expected), SEARCH_RESULT_LIMIT) / PAGE_SIZE))
+    return pages * (METHOD_COSTS['search.list'] + METHOD_COSTS['videos.list'])
+
+def source_entry(label, kind, units, expected, staleness, **extra):
+    """Describe one source for the plan"""
+    entry = {
+        'label': label,
+        'kind': kind,
+        'estimated_units': int(units),
+        'expected_new_videos': round(expected, 2),
+        'staleness_hours': round(staleness * 24, 1)
+    }
+    entry.update(extra)
+    return entry
+
+def build_plan(sources, available_units, budget_units, now=None, mode=None):
+    """Pick the sources that add the most expected videos per quota unit within the run budget"""
+    now = now or datetime.now(timezone.utc)
+
+    # Free sources always run; the rest go by expected videos per unit, stalest first on ties
+    ranked = sorted(
+        sources,
+        key=lambda s: (
+            s['estimated_units'] > 0,
+            -(s['expected_new_videos'] / s['estimated_units']) if s['estimated_units'] else 0,
+            -s['staleness_hours']
+        )
+    )
+
+    remaining = budget_units
+    for source in ranked:
+        if source['estimated_units'] <= remaining:
+            source['selected'] = True
+            source['reason'] = 'free' if not source['estimated_units'] else 'within budget'
+            remaining -= source['estimated_units']
+        else:
+            source['selected'] = False
+            source['reason'] = 'over budget'
+
+    planned = budget_units - remaining
+    return {
+        'version': PLAN_VERSION,
+        'generated_at': now.isoformat(),
+        'quota_day': quota_day(now),
+        'mode': mode,
+        'available_units': available_units,
+        'budget_units': budget_units,
+        'planned_units': planned,
+        'expected_new_videos': round(sum(s['expected_new_videos'] for s in ranked if s['selected']), 2),
+        'sources': ranked
+    }
+
+def selected_labels(plan):
+    """Get the labels of the sources a plan runs"""
+    return {source['label'] for source in plan['sources'] if source['selected']}
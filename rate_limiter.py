@@ -0,0 +1,50 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate  # Tokens added per second
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until the requested number of tokens is available"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+
+                wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+class RateLimiter:
+    def __init__(self, limits=None, default_rate=1):
+        self.limits = limits or {}  # name -> (rate, capacity)
+        self.default_rate = default_rate
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def get_bucket(self, name):
+        """Get or create the token bucket for an API or host"""
+        with self.lock:
+            if name not in self.buckets:
+                rate, capacity = self.limits.get(name, (self.default_rate, self.default_rate))
+                self.buckets[name] = TokenBucket(rate, capacity)
+            return self.buckets[name]
+
+    def acquire(self, name, tokens=1):
+        """Wait for a request slot for an API name or host"""
+        self.get_bucket(name).acquire(tokens)
+
+    def acquire_url(self, url, tokens=1):
+        """Wait for a request slot for the host of a URL"""
+        self.acquire(urlparse(url).hostname or url, tokens)
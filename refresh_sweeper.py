@@ -0,0 +1,115 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# videos.list takes up to 50 IDs for 1 quota unit
+BATCH_SIZE = 50
+
+# (max age in days, hours between refreshes): new videos gain views fastest
+AGE_INTERVALS = [
+    (2, 6),
+    (7, 24),
+    (30, 72),
+    (365, 24 * 14)
+]
+OLD_INTERVAL_HOURS = 24 * 60
+
+# Popular videos are refreshed at least weekly whatever their age
+POPULAR_VIEWS = 1000000
+POPULAR_INTERVAL_HOURS = 24 * 7
+
+# A video that failed a check is flagged and checked again soon; it is dropped when it fails this many in a row
+RECHECK_INTERVAL_HOURS = 6
+DROP_AFTER_MISSES = 2
+
+def refresh_interval(candidate, now):
+    """Seconds between refreshes of a video, from its age, popularity and failed checks"""
+    if candidate['misses']:
+        return RECHECK_INTERVAL_HOURS * 3600
+
+    age_days = (now - (candidate['upload_ts'] or 0)) / 86400
+    hours = OLD_INTERVAL_HOURS
+    for max_age, interval in AGE_INTERVALS:
+        if age_days <= max_age:
+            hours = interval
+            break
+    if (candidate['views'] or 0) >= POPULAR_VIEWS:
+        hours = min(hours, POPULAR_INTERVAL_HOURS)
+    return hours * 3600
+
+def due_videos(candidates, now):
+    """Get the videos due for a refresh, most overdue first, as (video_id, misses) pairs"""
+    due = []
+    for candidate in candidates:
+        overdue = (now - candidate['refreshed_at']) / refresh_interval(candidate, now)
+        if overdue >= 1:
+            due.append((overdue, candidate['id'], candidate['misses']))
+    due.sort(reverse=True)
+    return [(video_id, misses) for _, video_id, misses in due]
+
+def is_available(item):
+    """Check whether a videos.list item can still be embedded on the site"""
+    status = item.get('status', {})
+    return status.get('privacyStatus') == 'public' and status.get('embeddable', True)
+
+def apply_refresh(video, item):
+    """Update a stored video from its refreshed details, returning whether anything changed"""
+    changed = False
+    views = item.get('statistics', {}).get('viewCount')
+    if views is not None and video.get('views') != views:
+        video['views'] = views
+        changed = True
+    if video.pop('unavailable', False):
+        changed = True
+    return changed
+
+def sweep(store, lookup, max_batches, now=None):
+    """Refresh the most overdue videos in batches of 50 until the batch budget runs out.
+
+    lookup takes up to 50 video IDs and returns their videos.list items; IDs it
+    leaves out are deleted or private. Progress is saved after every batch, so
+    the next run carries on with whatever is still due.
+    """
+    now = int(now or time.time())
+    due = due_videos(store.refresh_candidates(), now)
+    stats = {'due': len(due), 'checked': 0, 'batches': 0, 'changed': [], 'flagged': [], 'dropped': []}
+
+    for start in range(0, min(len(due), max_batches * BATCH_SIZE), BATCH_SIZE):
+        batch = dict(due[start:start + BATCH_SIZE])
+        try:
+            items = {item['id']: item for item in lookup(list(batch))}
+        except Exception as e:
+            # Batches already swept are saved; the rest stay due for the next run
+            logger.error(f"Error refreshing video details, stopping the sweep: {e}")
+            break
+        stats['batches'] += 1
+        stats['checked'] += len(batch)
+
+        changed, dropped, misses = [], [], {}
+        for video in store.get_videos(list(batch)):
+            item = items.get(video['id'])
+            if item and is_available(item):
+                misses[video['id']] = 0
+                if apply_refresh(video, item):
+                    changed.append(video)
+                continue
+
+            # Flag first so a transient failure never removes a video; drop it if the recheck fails too
+            misses[video['id']] = batch[video['id']] + 1
+            if misses[video['id']] >= DROP_AFTER_MISSES:
+                dropped.append(video['id'])
+            elif not video.get('unavailable'):
+                video['unavailable'] = True
+                changed.append(video)
+                stats['flagged'].append(video['id'])
+
+        store.upsert_many(changed)
+        store.record_refresh({video_id: count for video_id, count in misses.items() if video_id not in dropped}, now)
+        store.delete_many(dropped)
+        stats['changed'].extend(changed)
+        stats['dropped'].extend(dropped)
+
+    logger.info(f"Refreshed {stats['checked']} of {stats['due']} due videos in {stats['batches']} batches: "
+                f"{len(stats['changed']) - len(stats['flagged'])} updated, {len(stats['flagged'])} flagged, {len(stats['dropped'])} dropped")
+    return stats
@@ -0,0 +1,59 @@
+import re
+import unicodedata
+from compact_catalog import encode_videos
+
+SEARCH_INDEX_VERSION = 2
+
+# Tokens are sharded by their first characters, so a typeahead query loads one shard
+SHARD_PREFIX_LENGTH = 2
+MIN_TOKEN_LENGTH = 2
+
+TOKEN_SPLIT_PATTERN = re.compile(r'[^a-z0-9]+')
+
+# What a result card shows; every shard carries these for its videos, so results render without the catalog
+DISPLAY_FIELDS = ['id', 'title', 'upload_ts', 'upload_date', 'category', 'channel_name', 'source',
+                  'thumbnail_url', 'external_url', 'disclaimer']
+
+def normalize_text(text):
+    """Lowercase text and strip accents so 'Héritage' matches 'heritage'"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text):
+    """Split text into searchable tokens"""
+    return [
+        token for token in TOKEN_SPLIT_PATTERN.split(normalize_text(text or ''))
+        if len(token) >= MIN_TOKEN_LENGTH
+    ]
+
+def video_tokens(video):
+    """Get every token a video can be found by: title, teams, channel and source"""
+    fields = [video.get('title', ''), video.get('channel_name', ''), video.get('source', '')]
+    fields.extend(video.get('teams', []))
+    return {token for field in fields for token in tokenize(field)}
+
+def shard_key(token):
+    """Get the shard a token is stored in"""
+    return token[:SHARD_PREFIX_LENGTH]
+
+def display_record(video):
+    """Get the fields a search result shows"""
+    return {field: video[field] for field in DISPLAY_FIELDS if video.get(field) is not None}
+
+def build_search_index(videos):
+    """Map shard key -> its token postings, in the catalog's newest-first order, and its videos' display records"""
+    postings = {}
+    shard_videos = {}
+    for video in videos:
+        tokens = video_tokens(video)
+        record = display_record(video)
+        for key in {shard_key(token) for token in tokens}:
+            shard_videos.setdefault(key, []).append(record)
+        for token in tokens:
+            postings.setdefault(shard_key(token), {}).setdefault(token, []).append(video['id'])
+
+    # Sorted tokens let clients binary search a shard for prefix matches
+    return {
+        key: {'tokens': dict(sorted(postings[key].items())), 'videos': encode_videos(shard_videos[key])}
+        for key in sorted(postings)
+    }
@@ -0,0 +1,151 @@
+import re
+
+# International teams and the aliases that identify them in titles
+TEAM_VARIATIONS = {
+    'australia': ['australia', 'aussies'],
+    'india': ['india', 'ind'],
+    'england': ['england', 'eng'],
+    'pakistan': ['pakistan', 'pak'],
+    'south africa': ['south africa', 'proteas'],
+    'new zealand': ['new zealand', 'nz', 'blackcaps'],
+    'west indies': ['west indies', 'windies'],  # Removed 'wi' as it's too ambiguous
+    'sri lanka': ['sri lanka', 'lanka'],
+    'bangladesh': ['bangladesh', 'ban'],
+    'afghanistan': ['afghanistan', 'afg'],
+    'ireland': ['ireland', 'ire'],
+    'zimbabwe': ['zimbabwe', 'zim']
+}
+
+# IPL franchise codes and their full names
+IPL_TEAMS = {
+    'CSK': 'Chennai Super Kings',
+    'MI': 'Mumbai Indians',
+    'RCB': 'Royal Challengers Bangalore',
+    'KKR': 'Kolkata Knight Riders',
+    'DC': 'Delhi Capitals',
+    'PBKS': 'Punjab Kings',
+    'RR': 'Rajasthan Royals',
+    'SRH': 'Sunrisers Hyderabad',
+    'GT': 'Gujarat Titans',
+    'LSG': 'Lucknow Super Giants'
+}
+
+def build_alternation(words):
+    """Build a regex alternation that prefers the longest alias"""
+    return '|'.join(re.escape(w) for w in sorted(set(words), key=len, reverse=True))
+
+class TeamMatcher:
+    # "Team A vs Team B" and "Team A | Team B" title layouts, tried in order
+    VS_PATTERN = re.compile(r'\b(\w+(?:\s+\w+)*)\s+(?:vs|v|versus)\s+(\w+(?:\s+\w+)*)\b')
+    SEPARATOR_PATTERN = re.compile(r'(\w+(?:\s+\w+)*)\s*\|\s*(\w+(?:\s+\w+)*)')
+
+    # Squad markers, checked against the whole text
+    WOMENS_PATTERN = re.compile(build_alternation([' women', ' w vs', 'vs w', 'w xi']))
+    U19_PATTERN = re.compile(build_alternation(['u19', 'under-19', 'under 19']))
+    A_TEAM_PATTERN = re.compile(build_alternation(['-a team', ' a vs', 'a xi']))
+
+    def __init__(self, team_variations=None, ipl_teams=None):
+        team_variations = team_variations or TEAM_VARIATIONS
+        ipl_teams = ipl_teams or IPL_TEAMS
+
+        # One alternation over every alias, mapped back to its team
+        self.alias_to_team = {}
+        for team, variations in team_variations.items():
+            for variation in variations:
+                self.alias_to_team[variation.strip()] = team.title()
+        self.alias_pattern = re.compile(r'\b(?:' + build_alternation(self.alias_to_team) + r')\b')
+
+        # IPL codes are matched case-sensitively, full names case-insensitively
+        self.ipl_teams = dict(ipl_teams)
+        self.ipl_name_to_team = {name.lower(): name for name in ipl_teams.values()}
+        self.ipl_code_pattern = re.compile(r'\b(?:' + build_alternation(ipl_teams) + r')\b')
+        self.ipl_name_pattern = re.compile(r'\b(?:' + build_alternation(self.ipl_name_to_team) + r')\b', re.IGNORECASE)
+
+    def match_sides(self, text_lower):
+        """Get the two sides of the first vs or | match in the text"""
+        match = self.VS_PATTERN.search(text_lower) or self.SEPARATOR_PATTERN.search(text_lower)
+        if not match:
+            return None
+        return match.group(1).strip(), match.group(2).strip()
+
+    def extract_teams(self, text):
+        """Extract team names from the sides of a vs match in the text"""
+        text_lower = text.lower()
+        sides = self.match_sides(text_lower)
+        if not sides:
+            return []  # If no vs pattern found, return empty list
+
+        base_teams = []
+        for side in sides:
+            for match in self.alias_pattern.finditer(side):
+                team = self.alias_to_team[match.group(0)]
+                if team not in base_teams:
+                    base_teams.append(team)
+
+        if not base_teams:
+            return []
+
+        # Squad markers apply to every team found in the text
+        if self.WOMENS_PATTERN.search(text_lower):
+            suffix = ' Women'
+        elif self.U19_PATTERN.search(text_lower):
+            suffix = ' U19'
+        elif self.A_TEAM_PATTERN.search(text_lower):
+            suffix = ' A'
+        else:
+            suffix = ''
+
+        return [f"{team}{suffix}" for team in base_teams]
+
+    def extract_ipl_teams(self, title):
+        """Extract IPL franchise names from a title using codes or full names"""
+        teams = []
+        for match in self.ipl_code_pattern.finditer(title):
+            team = self.ipl_teams[match.group(0)]
+            if team not in teams:
+                teams.append(team)
+        for match in self.ipl_name_pattern.finditer(title):
+            team = self.ipl_name_to_team[match.group(0).lower()]
+            if team not in teams:
+                teams.append(team)
+        return teams
+
+    def tag_titles(self, titles):
+        """Extract teams for a list of titles, matching repeated titles once"""
+        seen = {}
+        results = []
+        for title in titles:
+            if title not in seen:
+                seen[title] = self.extract_teams(title)
+            results.append(list(seen[title]))
+        return results
+
+    def tag_videos(self, videos):
+        """Set the teams of every video from its title, using IPL codes for IPL videos"""
+        ipl_videos = [v for v in videos if v.get('source') == 'IPL']
+        other_videos = [v for v in videos if v.get('source') != 'IPL']
+
+        for video in ipl_videos:
+            video['teams'] = self.extract_ipl_teams(video['title']) or ['IPL']
+        for video, teams in zip(other_videos, self.tag_titles([v['title'] for v in other_videos])):
+            video['teams'] = teams
+        return videos
+
+# Built once per process and shared by every ingest path
+team_matcher = TeamMatcher()
+
+def extract_teams_from_text(text):
+    """Extract team names from text using the shared matcher"""
+    return team_matcher.extract_teams(text)
+
+def extract_ipl_teams(title):
+    """Extract IPL franchise names from a title, defaulting to ['IPL']"""
+    return team_matcher.extract_ipl_teams(title) or ['IPL']
+
+def tag_titles(titles):
+    """Extract teams for a batch of titles"""
+    return team_matcher.tag_titles(titles)
+
+def tag_videos(videos):
+    """Re-extract teams for a batch of video records in place"""
+    return team_matcher.tag_videos(videos)
@@ -0,0 +1,33 @@
+import os
+import sys
+import threading
+import pytest
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BUCKET = 'test-bucket'
+
+@pytest.fixture
+def s3(monkeypatch):
+    moto = pytest.importorskip('moto')
+
+    # moto's in-process S3 is not thread safe when writers replace the same key; real S3 applies
+    # each request atomically, so requests are serialized while writers still interleave between them
+    from moto.core.botocore_stubber import BotocoreStubber
+    lock = threading.Lock()
+    handle = BotocoreStubber.__call__
+
+    def locked(self, *args, **kwargs):
+        with lock:
+            return handle(self, *args, **kwargs)
+
+    monkeypatch.setattr(BotocoreStubber, '__call__', locked)
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with moto.mock_aws():
+        import boto3
+        client = boto3.client('s3')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
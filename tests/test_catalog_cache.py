@@ -0,0 +1,15 @@
+from catalog_cache import CatalogCache
+
+def test_cached_values_are_tied_to_the_etag_they_were_built_from():
+    cache = CatalogCache()
+    catalog = object()
+    assert cache.get('state/videos.db', 'etag-1') is None
+
+    cache.put('state/videos.db', 'etag-1', catalog)
+    assert cache.get('state/videos.db', 'etag-1') is catalog
+    assert cache.get('state/videos.db', 'etag-2') is None
+    assert cache.get('state/videos.db', None) is None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    cache.invalidate('state/videos.db')
+    assert cache.get('state/videos.db', 'etag-1') is None
@@ -0,0 +1,48 @@
+import os
+from catalog_publisher import Catalog, publish_catalog
+
+def make_video(video_id, category, upload_ts):
+    return {
+        'id': video_id,
+        'title': f'India vs Australia {video_id}',
+        'category': category,
+        'thumbnail_url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg',
+        'upload_date': '2020-01-01T00:00:00Z',
+        'upload_ts': upload_ts,
+        'teams': ['India', 'Australia']
+    }
+
+def test_republishing_an_unchanged_catalog_writes_nothing(tmp_path):
+    videos = [make_video(f'v{i}', 'matches' if i % 2 else 'other', 1600000000 + i * 86400 * 200) for i in range(6)]
+    written = publish_catalog(Catalog(videos), str(tmp_path))
+    assert 'all_videos.json' in written and 'all_videos.json.gz' in written
+
+    mtime = os.path.getmtime(tmp_path / 'all_videos.json.gz')
+    assert publish_catalog(Catalog(videos), str(tmp_path)) == []
+    assert os.path.getmtime(tmp_path / 'all_videos.json.gz') == mtime
+
+    # Only the files the new video lands in are rewritten and recompressed
+    written = publish_catalog(Catalog(videos + [make_video('new', 'matches', 1700000000)]), str(tmp_path))
+    assert 'matches_videos.json.gz' in written and 'all_videos.json' in written
+    assert not {'other_videos.json', 'other_videos.json.gz', 'other_videos.compact.json'} & set(written)
+
+def test_shards_split_by_year_and_only_changed_years_are_rewritten(tmp_path):
+    from catalog_publisher import MANIFEST_FILE, load_manifest, publish_shards
+
+    # 2020-09-13 and 2023-11-14
+    old, new = make_video('old', 'matches', 1600000000), make_video('new', 'matches', 1700000000)
+    written = publish_shards({'matches': [new, old], 'other': []}, str(tmp_path))
+    assert set(written) == {'matches/2023.json', 'matches/2020.json', MANIFEST_FILE}
+
+    manifest = load_manifest(str(tmp_path))
+    entry = manifest['categories']['matches']
+    assert entry['count'] == 2 and entry['compact'] == 'matches_videos.compact.json'
+    assert [(shard['year'], shard['count']) for shard in entry['shards']] == [('2023', 1), ('2020', 1)]
+    assert manifest['categories']['other']['shards'] == []
+
+    # A new 2023 video only rewrites that year; dropping 2020 removes its shard
+    newer = make_video('newer', 'matches', 1700000100)
+    written = publish_shards({'matches': [newer, new], 'other': []}, str(tmp_path))
+    assert set(written) == {'matches/2023.json', MANIFEST_FILE}
+    assert not (tmp_path / 'matches' / '2020.json').exists()
+    assert publish_shards({'matches': [newer, new], 'other': []}, str(tmp_path)) == []
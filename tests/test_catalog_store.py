@@ -0,0 +1,48 @@
+import time
+from catalog_store import CatalogStore
+
+def make_video(video_id, category, teams=('India',)):
+    return {
+        'id': video_id,
+        'title': f'India vs Australia {video_id}',
+        'category': category,
+        'upload_date': '2020-01-01T00:00:00Z',
+        'upload_ts': int(time.time()),
+        'teams': list(teams)
+    }
+
+def test_moving_two_videos_out_of_one_category(tmp_path):
+    store = CatalogStore(str(tmp_path / 'videos.db'))
+    videos = [make_video('a', 'classic'), make_video('b', 'classic')]
+    store.insert_new(videos)
+
+    # Each upsert fires the category trigger for the same old category
+    for video in videos:
+        video['category'] = 'matches'
+        store.upsert_many([video])
+
+    assert 'classic' in store.changed_categories(int(time.time()) + 1)
+    assert store.get_team_stats()['India']['matches'] == 2
+
+def test_deleting_two_videos_from_one_category(tmp_path):
+    store = CatalogStore(str(tmp_path / 'videos.db'))
+    store.insert_new([make_video('a', 'classic'), make_video('b', 'classic')])
+
+    store.delete_many(['a'])
+    store.delete_many(['b'])
+
+    assert store.count() == 0
+    assert 'classic' in store.changed_categories(int(time.time()) + 1)
+
+def test_seeded_videos_do_not_count_as_recent_activity(tmp_path):
+    from quota_planner import ACTIVITY_WINDOW_DAYS, staleness_days
+
+    store = CatalogStore(str(tmp_path / 'videos.db'))
+    old_ts = int(time.time()) - 400 * 86400
+    videos = [dict(make_video(f'v{i}', 'matches'), channel_id='UC1', upload_ts=old_ts + i) for i in range(5)]
+    store.insert_new(videos)
+
+    since = int(time.time()) - ACTIVITY_WINDOW_DAYS * 86400
+    activity = store.channel_activity(since)['UC1']
+    assert (activity['total'], activity['added']) == (5, 0)
+    assert staleness_days(None, activity['newest_upload_ts'], time.time()) == ACTIVITY_WINDOW_DAYS
@@ -0,0 +1,80 @@
+from classic_discovery import discover, query_order
+
+NOW = 1700000000
+WEEK = 7 * 86400
+
+class FakeSearch:
+    """Serves numbered pages of IDs per query; a query's pages can repeat IDs of another"""
+
+    def __init__(self, pages, fail_on=None):
+        self.pages = pages
+        self.fail_on = fail_on
+        self.calls = []
+
+    def __call__(self, query, page_token):
+        self.calls.append((query, page_token))
+        if (query, page_token) == self.fail_on:
+            raise RuntimeError('backend error')
+        index = int(page_token or 0)
+        next_token = str(index + 1) if index + 1 < len(self.pages[query]) else None
+        return self.pages[query][index], next_token
+
+def lookup(video_ids):
+    return [{'id': video_id} for video_id in video_ids]
+
+def test_queries_in_progress_go_first_and_completed_ones_wait():
+    progress = {
+        'finished': {'completed_at': NOW - 3600, 'last_run': NOW - 3600},
+        'stale': {'completed_at': NOW - 2 * WEEK, 'last_run': NOW - 2 * WEEK},
+        'resumed': {'page_token': 'abc', 'last_run': NOW - 60}
+    }
+
+    order = query_order(['finished', 'stale', 'new', 'resumed'], progress, NOW, WEEK)
+
+    assert order == ['resumed', 'new', 'stale']
+
+def test_discover_skips_known_ids_and_batches_lookups():
+    ids = [f'v{i:03}' for i in range(120)]
+    search = FakeSearch({'classic': [ids[:60], ids[60:]], 'other': [ids[:10]]})
+    looked_up = []
+
+    def batched_lookup(video_ids):
+        looked_up.append(len(video_ids))
+        return lookup(video_ids)
+
+    progress = {}
+    saves = []
+    stats = discover(['classic', 'other'], progress, search, batched_lookup, lambda video_id: video_id < 'v010',
+                     max_pages=10, revisit_seconds=WEEK, save=lambda: saves.append(dict(progress)), now=NOW)
+
+    # Known IDs and ones already seen this run are never looked up
+    assert looked_up == [50, 50, 10]
+    assert (stats['pages'], stats['found'], stats['looked_up']) == (3, 130, 110)
+    assert len(stats['videos']) == 110
+    assert len(saves) == 3
+    assert progress['classic'] == {'last_run': NOW, 'page_token': None, 'completed_at': NOW}
+
+def test_discover_stops_at_the_page_budget_and_resumes():
+    search = FakeSearch({'classic': [['a'], ['b'], ['c']]})
+    progress = {}
+
+    stats = discover(['classic'], progress, search, lookup, lambda video_id: False, max_pages=2,
+                     revisit_seconds=WEEK, now=NOW)
+    assert [video['id'] for video in stats['videos']] == ['a', 'b']
+    assert progress['classic']['page_token'] == '2'
+
+    stats = discover(['classic'], progress, search, lookup, lambda video_id: False, max_pages=2,
+                     revisit_seconds=WEEK, now=NOW + 60)
+    assert [video['id'] for video in stats['videos']] == ['c']
+    assert progress['classic']['completed_at'] == NOW + 60
+
+def test_failed_page_is_searched_again_next_run():
+    search = FakeSearch({'classic': [['a'], ['b']]}, fail_on=('classic', '1'))
+    progress = {}
+
+    stats = discover(['classic'], progress, search, lookup, lambda video_id: False, max_pages=5,
+                     revisit_seconds=WEEK, now=NOW)
+
+    assert stats['pages'] == 1
+    assert progress['classic']['page_token'] == '1'
+    assert 'completed_at' not in progress['classic']
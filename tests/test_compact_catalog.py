@@ -0,0 +1,35 @@
+import json
+import pytest
+from compact_catalog import decode_videos, encode_compact, encode_videos
+
+VIDEOS = [
+    {
+        'id': 'abc123', 'title': 'India vs Australia Highlights', 'upload_ts': 1700000000,
+        'upload_date': '2023-11-14T22:13:20Z', 'category': 'matches', 'teams': ['India', 'Australia'],
+        'channel_name': 'ICC', 'channel_id': 'UC1', 'duration': 'PT1H2M3S', 'views': '12345',
+        'thumbnail_url': 'https://i.ytimg.com/vi/abc123/hqdefault.jpg', 'rules_version': 'r1'
+    },
+    {
+        # Values the row layout can't shorten go through unchanged
+        'id': 'ipl-1', 'title': 'MI vs CSK', 'upload_ts': 1700000000, 'upload_date': '14 Nov, 2023',
+        'category': 'matches', 'teams': ['IPL'], 'source': 'IPL', 'duration': 'PT90S', 'views': 'N/A',
+        'thumbnail_url': 'https://www.iplt20.com/thumb.jpg', 'thumbnail_src': 'https://www.iplt20.com/thumb.jpg',
+        'external_url': 'https://www.iplt20.com/video/1', 'disclaimer': 'Hosted by IPL', 'featured': True
+    },
+    {'id': 'bare', 'title': 'Press conference', 'upload_ts': 0, 'category': 'other', 'views': None}
+]
+
+def test_compact_format_round_trips_every_record():
+    assert decode_videos(encode_videos(VIDEOS)) == VIDEOS
+    assert decode_videos(json.loads(encode_compact(VIDEOS))) == VIDEOS
+
+def test_repeated_strings_are_stored_once():
+    data = encode_videos(VIDEOS)
+    assert data['strings'].count('matches') == 1
+    # Thumbnail URLs built from the ID become a template index
+    assert 'https://i.ytimg.com/vi/abc123/hqdefault.jpg' not in json.dumps(data)
+
+def test_unknown_versions_are_refused():
+    data = dict(encode_videos(VIDEOS), version=99)
+    with pytest.raises(ValueError):
+        decode_videos(data)
@@ -0,0 +1,137 @@
+import gzip
+import json
+import threading
+import pytest
+from botocore.exceptions import ClientError
+from conftest import BUCKET
+
+WRITERS = 16
+
+def make_videos(writer, count=3):
+    return [
+        {
+            'id': f'w{writer}-{i}',
+            'title': f'India vs Australia {writer}-{i}',
+            'category': 'matches',
+            'thumbnail_url': f'https://i.ytimg.com/vi/w{writer}-{i}/hqdefault.jpg',
+            'upload_date': f'2024-01-{1 + i:02d}T00:00:00Z',
+            'upload_ts': 1704067200 + writer * 100 + i
+        }
+        for i in range(count)
+    ]
+
+def run_concurrently(target, count):
+    errors = []
+
+    def run(index):
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+def read_list(s3, key):
+    return json.loads(s3.get_object(Bucket=BUCKET, Key=key)['Body'].read())
+
+def test_conditional_put_refuses_stale_writes(s3):
+    from conditional_write import conditional_put, is_conflict
+
+    etag = conditional_put(s3, BUCKET, 'k', b'1', None)
+    with pytest.raises(ClientError) as created:
+        conditional_put(s3, BUCKET, 'k', b'2', None)
+    assert is_conflict(created.value)
+
+    with pytest.raises(ClientError) as replaced:
+        conditional_put(s3, BUCKET, 'k', b'2', '0' * 32)
+    assert is_conflict(replaced.value)
+
+    conditional_put(s3, BUCKET, 'k', b'3', etag)
+    assert s3.get_object(Bucket=BUCKET, Key='k')['Body'].read() == b'3'
+
+def test_concurrent_update_json_keeps_every_write(s3):
+    from conditional_write import update_json
+
+    def write(index):
+        update_json(s3, BUCKET, 'list.json', lambda items: items + [index], default=[], max_attempts=50)
+
+    run_concurrently(write, WRITERS)
+    assert sorted(read_list(s3, 'list.json')) == list(range(WRITERS))
+
+def test_concurrent_bcci_ipl_writers_keep_every_video(s3, monkeypatch):
+    import bcci_ipl_fetcher
+
+    monkeypatch.setattr(bcci_ipl_fetcher, 's3', s3)
+    monkeypatch.setattr(bcci_ipl_fetcher, 'BUCKET_NAME', BUCKET)
+
+    results = []
+    run_concurrently(lambda index: results.append(bcci_ipl_fetcher.update_json_files(make_videos(index))), WRITERS)
+
+    assert all(results)
+    for key in ('static/data/all_videos.json', 'static/data/matches_videos.json'):
+        videos = read_list(s3, key)
+        assert len({video['id'] for video in videos}) == WRITERS * 3
+        compressed = s3.get_object(Bucket=BUCKET, Key=f'{key}.gz')['Body'].read()
+        assert json.loads(gzip.decompress(compressed)) == videos
+
+def test_concurrent_deltas_are_all_kept(s3):
+    from delta_log import append_delta, delta_videos, read_deltas
+
+    run_concurrently(lambda index: append_delta(s3, BUCKET, make_videos(index)), WRITERS)
+
+    deltas = read_deltas(s3, BUCKET)
+    assert len(deltas) == WRITERS
+    assert len({video['id'] for video in delta_videos(deltas)}) == WRITERS * 3
+
+def test_merged_list_upload_reports_other_writers_videos(s3, monkeypatch, tmp_path):
+    import lambda_function
+
+    monkeypatch.setattr(lambda_function, 's3', s3)
+    monkeypatch.setattr(lambda_function, 'BUCKET_NAME', BUCKET)
+    monkeypatch.setattr(lambda_function, 'local_etags', {})
+
+    s3_path = 'static/data/all_videos.json'
+    base_etag = s3.put_object(Bucket=BUCKET, Key=s3_path, Body=json.dumps(make_videos(0)))['ETag'].strip('"')
+    lambda_function.local_etags[s3_path] = (base_etag, None)
+
+    # Another writer publishes after this run downloaded the list
+    s3.put_object(Bucket=BUCKET, Key=s3_path, Body=json.dumps(make_videos(0) + make_videos(1)))
+
+    local_path = tmp_path / 'all_videos.json'
+    local_path.write_text(json.dumps(make_videos(0) + make_videos(2)))
+    with pytest.raises(lambda_function.UploadConflict) as conflict:
+        lambda_function.put_merged_file('all_videos.json', str(local_path), s3_path)
+
+    assert {video['id'] for video in conflict.value.videos} == {video['id'] for video in make_videos(1)}
+    assert len(read_list(s3, s3_path)) == 6
+
+def test_downloaded_lists_are_folded_into_the_store(s3, tmp_path):
+    import lambda_function
+    from video_fetcher import VideoFetcher
+
+    fetcher = VideoFetcher(['key'], base_path=str(tmp_path))
+    assert fetcher.update_json_files(make_videos(0))
+
+    # The BCCI/IPL fetcher adds a video to the published list behind the store's back
+    bcci_video = dict(make_videos(1, count=1)[0], source='BCCI', external_url='https://www.bcci.tv/videos/1')
+    all_videos = json.loads((tmp_path / 'static/data/all_videos.json').read_text())
+    (tmp_path / 'static/data/all_videos.json').write_text(json.dumps([bcci_video] + all_videos))
+
+    assert [video['id'] for video in lambda_function.store_missing_videos(fetcher)] == [bcci_video['id']]
+
+def test_pending_list_keeps_every_webhook_video_until_folded_in(s3):
+    from delta_log import PENDING_KEY, publish_pending
+
+    run_concurrently(lambda index: publish_pending(s3, BUCKET, added=make_videos(index)), WRITERS)
+    assert len({video['id'] for video in read_list(s3, PENDING_KEY)}) == WRITERS * 3
+
+    # The scheduled run folds writer 0's deltas into the catalog
+    publish_pending(s3, BUCKET, published_ids=[video['id'] for video in make_videos(0)])
+    pending_ids = {video['id'] for video in read_list(s3, PENDING_KEY)}
+    assert len(pending_ids) == (WRITERS - 1) * 3
+    assert not pending_ids & {video['id'] for video in make_videos(0)}
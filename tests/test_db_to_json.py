@@ -0,0 +1,43 @@
+import json
+from catalog_store import CatalogStore
+from db_to_json import export_catalog
+
+def make_video(video_id, category, upload_ts):
+    return {
+        'id': video_id,
+        'title': f'India vs Australia {video_id}',
+        'category': category,
+        'thumbnail_url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg',
+        'upload_date': '2020-01-01T00:00:00Z',
+        'upload_ts': upload_ts,
+        'teams': ['India']
+    }
+
+def read_data(data_dir):
+    return {
+        path.relative_to(data_dir).as_posix(): json.loads(path.read_text())
+        for path in sorted(data_dir.rglob('*.json'))
+    }
+
+def test_incremental_export_matches_a_full_export(tmp_path):
+    store = CatalogStore(str(tmp_path / 'videos.db'))
+    store.insert_new([make_video(f'v{i}', 'matches' if i % 2 else 'other', 1600000000 + i * 86400 * 200) for i in range(6)])
+    incremental_dir = tmp_path / 'incremental'
+    incremental_dir.mkdir()
+    export_catalog(store, str(incremental_dir))
+
+    moved = make_video('v1', 'classic', 1600000000 + 86400 * 200)
+    store.upsert_many([moved])
+    store.delete_many(['v2'])
+    store.insert_new([make_video('new', 'matches', 1700000000)])
+    export_catalog(store, str(incremental_dir))
+
+    full_dir = tmp_path / 'full'
+    full_dir.mkdir()
+    export_catalog(store, str(full_dir), incremental=False)
+
+    exported = read_data(incremental_dir)
+    assert exported == read_data(full_dir)
+    assert {video['id'] for video in exported['all_videos.json']} == {'v0', 'v1', 'v3', 'v4', 'v5', 'new'}
+    assert [video['id'] for video in exported['classic_videos.json']] == ['v1']
+    assert 'manifest.json' in exported and 'search/index.json' in exported
@@ -0,0 +1,72 @@
+import pytest
+import details_cache
+from details_cache import VideoDetailsCache, get_details
+
+class Clock:
+    def __init__(self, now=1700000000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(details_cache, 'time', clock)
+    return clock
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = VideoDetailsCache(str(tmp_path / 'details.db'), ttl_seconds=3600, max_entries=3)
+    yield cache
+    cache.close()
+
+def make_items(video_ids):
+    return [{'id': video_id, 'statistics': {'viewCount': '1'}} for video_id in video_ids]
+
+def test_cached_items_expire_after_the_ttl(cache, clock):
+    cache.put_many(make_items(['a', 'b']))
+    assert sorted(cache.get_many(['a', 'b', 'c'])) == ['a', 'b']
+
+    clock.now += 3601
+    assert cache.get_many(['a', 'b']) == {}
+
+    # Expired entries are cleared on the next write
+    cache.put_many(make_items(['c']))
+    assert cache.size() == 1
+
+def test_least_recently_used_items_are_evicted(cache, clock):
+    cache.put_many(make_items(['a', 'b', 'c']))
+    clock.now += 1
+    cache.get_many(['a'])
+
+    clock.now += 1
+    cache.put_many(make_items(['d']))
+
+    assert cache.size() == 3
+    assert sorted(cache.get_many(['a', 'b', 'c', 'd'])) == ['a', 'c', 'd']
+
+def test_only_missing_ids_are_fetched_in_batches_of_50(tmp_path, clock):
+    cache = VideoDetailsCache(str(tmp_path / 'details.db'), ttl_seconds=3600, max_entries=1000)
+    cache.put_many(make_items(['v000', 'v001']))
+    calls = []
+
+    def fetch(video_ids):
+        calls.append(list(video_ids))
+        # Deleted videos are left out of the response
+        return make_items([video_id for video_id in video_ids if video_id != 'v099'])
+
+    ids = [f'v{i:03}' for i in range(120)]
+    items = get_details(cache, ids + ['v000'], fetch)
+
+    assert [len(batch) for batch in calls] == [50, 50, 18]
+    assert 'v000' not in calls[0]
+    assert len(items) == 119
+
+    calls.clear()
+    assert len(get_details(cache, ids, fetch)) == 119
+    assert calls == [['v099']]
+    cache.close()
+
+def test_get_details_without_a_cache_fetches_everything():
+    assert sorted(get_details(None, ['a', 'b'], make_items)) == ['a', 'b']
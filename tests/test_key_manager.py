@@ -0,0 +1,93 @@
+import json
+import threading
+import httplib2
+from datetime import datetime, timezone
+from googleapiclient.errors import HttpError
+from conftest import BUCKET
+from key_manager import S3QuotaLedger, SQLiteQuotaLedger, YouTubeKeyManager, is_quota_exceeded, quota_day
+
+def make_error(status, reason):
+    content = json.dumps({'error': {'code': status, 'errors': [{'reason': reason}]}}).encode('utf-8')
+    return HttpError(httplib2.Response({'status': status}), content)
+
+def test_parallel_callers_never_overspend_a_key():
+    manager = YouTubeKeyManager(['a', 'b'], daily_quota_limit=250)
+    acquired = []
+
+    def search():
+        for _ in range(3):
+            key = manager.acquire_key(100)
+            if key:
+                acquired.append(key)
+
+    threads = [threading.Thread(target=search) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Each key affords two 100-unit searches out of 250
+    assert sorted(acquired) == ['a', 'a', 'b', 'b']
+    assert manager.quota_usage == {'a': 200, 'b': 200}
+    assert manager.acquire_key(100) is None
+    assert manager.acquire_key(50) in ('a', 'b')
+
+def test_quota_day_resets_at_pacific_midnight():
+    # Midnight PST is 08:00 UTC
+    assert quota_day(datetime(2024, 1, 15, 7, 59, tzinfo=timezone.utc)) == '2024-01-14'
+    assert quota_day(datetime(2024, 1, 15, 8, 0, tzinfo=timezone.utc)) == '2024-01-15'
+
+def test_only_quota_reasons_count_as_exhausted():
+    assert is_quota_exceeded(make_error(403, 'quotaExceeded'))
+    assert is_quota_exceeded(make_error(403, 'dailyLimitExceeded'))
+    assert not is_quota_exceeded(make_error(403, 'forbidden'))
+    assert not is_quota_exceeded(make_error(500, 'backendError'))
+
+def test_sqlite_ledger_survives_restarts(tmp_path):
+    path = str(tmp_path / 'quota.db')
+    manager = YouTubeKeyManager(['a', 'b'], SQLiteQuotaLedger(path), daily_quota_limit=1000)
+    manager.charge('a', 'search.list')
+    manager.charge('a', 'videos.list')
+
+    restarted = YouTubeKeyManager(['a', 'b'], SQLiteQuotaLedger(path), daily_quota_limit=1000)
+    assert restarted.quota_usage == {'a': 101, 'b': 0}
+    assert restarted.get_total_available_quota() == 1899
+
+def test_exhausted_key_is_skipped_until_the_reset(tmp_path):
+    ledger = SQLiteQuotaLedger(str(tmp_path / 'quota.db'))
+    manager = YouTubeKeyManager(['a', 'b'], ledger, daily_quota_limit=1000)
+    manager.mark_exhausted(manager.get_current_key())
+
+    assert manager.get_current_key() == 'b'
+    assert manager.acquire_key(100) == 'b'
+    # Another day's usage starts every key from zero
+    assert ledger.usage('2000-01-01') == {}
+
+def test_s3_ledgers_add_up_each_others_charges(s3):
+    day = quota_day()
+    ledgers = [S3QuotaLedger(s3, BUCKET) for _ in range(4)]
+
+    def spend(ledger):
+        for _ in range(5):
+            ledger.charge(day, 'key', 10)
+        ledger.flush()
+
+    threads = [threading.Thread(target=spend, args=(ledger,)) for ledger in ledgers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert S3QuotaLedger(s3, BUCKET).usage(day) == {'key': 200}
+
+def test_s3_ledger_buffers_small_charges(s3):
+    day = quota_day()
+    ledger = S3QuotaLedger(s3, BUCKET)
+    ledger.charge(day, 'key', 1)
+
+    assert ledger.usage(day) == {'key': 1}
+    assert S3QuotaLedger(s3, BUCKET).usage(day) == {}
+
+    # Exhaustion is shared right away, along with anything buffered
+    ledger.exhaust(day, 'other', 10000)
+    assert S3QuotaLedger(s3, BUCKET).usage(day) == {'key': 1, 'other': 10000}
@@ -0,0 +1,78 @@
+import os
+import uuid
+import pytest
+from conftest import BUCKET
+
+@pytest.fixture
+def lambda_s3(s3, monkeypatch, tmp_path):
+    import lambda_function
+
+    monkeypatch.setattr(lambda_function, 's3', s3)
+    monkeypatch.setattr(lambda_function, 'BUCKET_NAME', BUCKET)
+    monkeypatch.setattr(lambda_function, 'local_etags', {})
+    monkeypatch.setattr(lambda_function, 'PUBLISHED_HASHES_PATH', str(tmp_path / 'published_hashes.json'))
+    return lambda_function
+
+@pytest.fixture
+def data_files():
+    # The Lambda works in /tmp/static/data; unique names keep tests clear of real runs
+    os.makedirs('/tmp/static/data', exist_ok=True)
+    names = [f'test-{uuid.uuid4().hex}-{i}.json' for i in range(3)]
+    yield names
+    for name in names:
+        for path in (f'/tmp/static/data/{name}', f'/tmp/static/data/{name}.part'):
+            if os.path.exists(path):
+                os.remove(path)
+
+def write_local(name, content):
+    with open(f'/tmp/static/data/{name}', 'w') as f:
+        f.write(content)
+
+def test_upload_skips_files_s3_already_has(lambda_s3, data_files):
+    for name in data_files:
+        write_local(name, f'["{name}"]')
+
+    stats = lambda_s3.upload_to_s3(data_files)
+    assert (stats['uploaded'], stats['skipped'], stats['failed']) == (3, 0, 0)
+
+    write_local(data_files[0], '["changed"]')
+    stats = lambda_s3.upload_to_s3(data_files)
+    assert (stats['uploaded'], stats['skipped']) == (1, 2)
+    assert lambda_s3.s3.get_object(Bucket=BUCKET, Key=f'static/data/{data_files[0]}')['Body'].read() == b'["changed"]'
+
+    # Without the recorded hashes, the objects' ETags still show nothing changed
+    os.remove(lambda_s3.PUBLISHED_HASHES_PATH)
+    assert lambda_s3.upload_to_s3(data_files)['skipped'] == 3
+
+def test_nothing_is_uploaded_for_an_empty_publish(lambda_s3):
+    assert lambda_s3.upload_to_s3([])['uploaded'] == 0
+
+def test_download_fetches_only_changed_objects(lambda_s3, tmp_path):
+    local_path = str(tmp_path / 'teams.json')
+    assert lambda_s3.download_if_changed('static/data/teams.json', local_path) == ('missing', 0)
+
+    lambda_s3.s3.put_object(Bucket=BUCKET, Key='static/data/teams.json', Body=b'{"v": 1}')
+    assert lambda_s3.download_if_changed('static/data/teams.json', local_path) == ('downloaded', 8)
+    assert lambda_s3.download_if_changed('static/data/teams.json', local_path) == ('not_modified', 0)
+
+    # A local edit since the download means the ETag no longer describes the file
+    with open(local_path, 'w') as f:
+        f.write('{"v": 0, "edited": true}')
+    assert lambda_s3.download_if_changed('static/data/teams.json', local_path)[0] == 'downloaded'
+
+    lambda_s3.s3.put_object(Bucket=BUCKET, Key='static/data/teams.json', Body=b'{"v": 2}')
+    assert lambda_s3.download_if_changed('static/data/teams.json', local_path)[0] == 'downloaded'
+    with open(local_path) as f:
+        assert f.read() == '{"v": 2}'
+
+def test_download_existing_files_runs_every_file_and_creates_missing_ones(lambda_s3, data_files, monkeypatch):
+    monkeypatch.setattr(lambda_s3, 'DATA_FILES', data_files)
+    monkeypatch.setattr(lambda_s3, 'SHARD_LISTINGS', [])
+    lambda_s3.s3.put_object(Bucket=BUCKET, Key=f'static/data/{data_files[0]}', Body=b'["a"]')
+
+    stats = lambda_s3.download_existing_files()
+    assert (stats['downloaded'], stats['missing'], stats['failed']) == (1, 2, 0)
+    with open(f'/tmp/static/data/{data_files[1]}') as f:
+        assert f.read() == '[]'
+
+    assert lambda_s3.download_existing_files()['not_modified'] == 1
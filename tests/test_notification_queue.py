@@ -0,0 +1,122 @@
+import pytest
+from notification_queue import MAX_ATTEMPTS, NotificationQueue
+
+FEED = '''<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <yt:videoId>v1</yt:videoId>
+    <yt:channelId>UC1</yt:channelId>
+  </entry>
+  <entry>
+    <yt:videoId>v2</yt:videoId>
+    <yt:channelId>UC2</yt:channelId>
+  </entry>
+  <entry>
+    <title>Deleted entries carry no video ID</title>
+  </entry>
+</feed>'''
+
+def make_details(video_id, duration='PT10M', title='India vs Australia Highlights'):
+    return {
+        'id': video_id,
+        'snippet': {
+            'title': title,
+            'description': '',
+            'thumbnails': {'high': {'url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg'}},
+            'channelTitle': 'Cricket',
+            'publishedAt': '2024-01-01T00:00:00Z'
+        },
+        'contentDetails': {'duration': duration},
+        'statistics': {'viewCount': '10'}
+    }
+
+@pytest.fixture
+def queue(tmp_path):
+    notification_queue = NotificationQueue(str(tmp_path / 'queue.db'))
+    yield notification_queue
+    notification_queue.close()
+
+class StubKeyManager:
+    def flush(self):
+        pass
+
+@pytest.fixture
+def published():
+    return []
+
+@pytest.fixture
+def webhook(s3, monkeypatch, published):
+    import webhook_handler
+
+    def update_json_files(new_videos):
+        published.extend(new_videos)
+        return True
+
+    monkeypatch.setattr(webhook_handler, 'get_key_manager', StubKeyManager)
+    monkeypatch.setattr(webhook_handler, 'update_json_files', update_json_files)
+    return webhook_handler
+
+def test_enqueue_ignores_videos_already_waiting(queue):
+    assert queue.enqueue([('v1', 'UC1'), ('v2', 'UC1')]) == 2
+    assert queue.enqueue([('v2', 'UC1'), ('v3', 'UC2')]) == 1
+    assert queue.size() == 3
+
+    # Oldest first, and peeking leaves the entries queued
+    assert queue.peek(2) == [('v1', 'UC1'), ('v2', 'UC1')]
+    assert queue.size() == 3
+
+    queue.remove(['v1', 'v2'])
+    assert queue.peek(10) == [('v3', 'UC2')]
+
+def test_repeated_failures_drop_a_notification(queue):
+    queue.enqueue([('v1', 'UC1'), ('v2', 'UC1')])
+    for _ in range(MAX_ATTEMPTS - 1):
+        queue.record_failure(['v1'])
+    assert queue.size() == 2
+
+    queue.record_failure(['v1'])
+    assert queue.peek(10) == [('v2', 'UC1')]
+
+def test_queue_outlives_the_connection(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    first = NotificationQueue(path)
+    first.enqueue([('v1', 'UC1')])
+    first.close()
+
+    second = NotificationQueue(path)
+    assert second.peek(10) == [('v1', 'UC1')]
+    second.close()
+
+def test_parse_notifications_reads_every_entry(webhook):
+    assert webhook.parse_notifications(FEED) == [('v1', 'UC1'), ('v2', 'UC2')]
+
+def test_flush_publishes_batches_and_drops_shorts(webhook, queue, published, monkeypatch):
+    lookups = []
+
+    def get_videos_details(video_ids):
+        lookups.append(list(video_ids))
+        return {video_id: make_details(video_id, 'PT30S' if video_id == 'short' else 'PT10M')
+                for video_id in video_ids if video_id != 'gone'}
+
+    monkeypatch.setattr(webhook, 'get_videos_details', get_videos_details)
+    monkeypatch.setattr(webhook, 'WEBHOOK_BATCH_SIZE', 2)
+    queue.enqueue([('v1', 'UC1'), ('short', 'UC1'), ('gone', 'UC1'), ('v2', 'UC1')])
+
+    flushed, batches = webhook.flush_queue(queue)
+
+    assert batches == 2
+    assert [len(ids) for ids in lookups] == [2, 2]
+    assert sorted(video['id'] for video in flushed) == ['v1', 'v2']
+    assert flushed == published
+    assert queue.size() == 0
+
+def test_failed_lookup_keeps_the_batch_queued(webhook, queue, published, monkeypatch):
+    def get_videos_details(video_ids):
+        raise RuntimeError('backend error')
+
+    monkeypatch.setattr(webhook, 'get_videos_details', get_videos_details)
+    queue.enqueue([('v1', 'UC1')])
+
+    assert webhook.flush_queue(queue) == ([], 0)
+    assert queue.peek(10) == [('v1', 'UC1')]
+    assert published == []
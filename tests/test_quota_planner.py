@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from quota_planner import (build_plan, channel_cost, expected_videos, run_budget, runs_left_today,
+                           selected_labels, source_entry, staleness_days)
+
+# Noon Pacific standard time
+NOON = datetime(2024, 1, 15, 20, 0, tzinfo=timezone.utc)
+
+def test_budget_is_split_over_the_runs_left_before_the_reset():
+    assert runs_left_today(NOON, 60) == 12
+    assert runs_left_today(NOON, 45) == 16
+    assert runs_left_today(datetime(2024, 1, 16, 7, 59, tzinfo=timezone.utc), 60) == 1
+
+    # The webhook reserve comes off before the split
+    assert run_budget(10000, NOON, 60, 400) == 800
+    assert run_budget(300, NOON, 60, 400) == 0
+
+def test_staleness_is_capped_and_expected_videos_has_a_floor():
+    now_ts = NOON.timestamp()
+    assert staleness_days(now_ts - 2 * 86400, None, now_ts) == 2.0
+    assert staleness_days(None, now_ts - 86400, now_ts) == 1.0
+    assert staleness_days(None, None, now_ts) == 30.0
+    assert staleness_days(now_ts - 400 * 86400, None, now_ts) == 30.0
+
+    assert expected_videos(60, 1.0) == 2.0
+    assert expected_videos(0, 10.0) == 1.0
+
+def test_channel_costs():
+    # Incremental: one playlist page at least, the playlist lookup only when not cached
+    assert channel_cost(True, 0, 1000, True) == 1
+    assert channel_cost(True, 0, 1000, False) == 2
+    assert channel_cost(True, 120, 1000, True) == 6
+
+    # Search pages through the whole result set, up to what search.list returns
+    assert channel_cost(False, 2, 120, True) == 3 * 101
+    assert channel_cost(False, 2, 5000, True) == 10 * 101
+
+def test_plan_prefers_videos_per_unit_within_the_budget():
+    sources = [
+        source_entry('search', 'channel', 303, 3.0, 1.0),
+        source_entry('busy', 'channel', 2, 4.0, 1.0),
+        source_entry('quiet', 'channel', 2, 0.1, 1.0),
+        source_entry('bcci', 'site', 0, 1.0, 1.0)
+    ]
+
+    plan = build_plan(sources, 10000, 100, now=NOON)
+
+    assert selected_labels(plan) == {'bcci', 'busy', 'quiet'}
+    assert plan['planned_units'] == 4
+    assert plan['quota_day'] == '2024-01-15'
+    assert [source['label'] for source in plan['sources']] == ['bcci', 'busy', 'quiet', 'search']
+    assert plan['sources'][-1]['reason'] == 'over budget'
@@ -0,0 +1,23 @@
+import time
+from rate_limiter import RateLimiter, TokenBucket
+
+def test_token_bucket_allows_a_burst_then_holds_to_its_rate():
+    bucket = TokenBucket(rate=20, capacity=5)
+
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+
+    # The next five tokens refill at 20 per second
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.2
+
+def test_rate_limiter_keeps_one_bucket_per_host():
+    limiter = RateLimiter({'www.iplt20.com': (2, 3)}, default_rate=7)
+
+    limiter.acquire_url('https://www.iplt20.com/videos/highlights')
+    assert limiter.get_bucket('www.iplt20.com') is limiter.get_bucket('www.iplt20.com')
+    assert (limiter.get_bucket('www.iplt20.com').rate, limiter.get_bucket('www.iplt20.com').capacity) == (2, 3)
+    assert limiter.get_bucket('www.bcci.tv').rate == 7
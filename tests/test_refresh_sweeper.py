@@ -0,0 +1,89 @@
+import time
+from catalog_store import CatalogStore
+from refresh_sweeper import due_videos, refresh_interval, sweep
+
+DAY = 86400
+
+def make_video(video_id, upload_ts, views='10'):
+    return {
+        'id': video_id,
+        'title': f'India vs Australia {video_id}',
+        'category': 'matches',
+        'upload_date': '2020-01-01T00:00:00Z',
+        'upload_ts': upload_ts,
+        'views': views,
+        'teams': ['India']
+    }
+
+def make_item(video_id, views='20', privacy='public'):
+    return {'id': video_id, 'statistics': {'viewCount': views}, 'status': {'privacyStatus': privacy, 'embeddable': True}}
+
+def test_new_and_popular_videos_are_refreshed_more_often():
+    now = int(time.time())
+    new = {'id': 'new', 'upload_ts': now - DAY, 'views': 10, 'refreshed_at': now - 7 * 3600, 'misses': 0}
+    old = {'id': 'old', 'upload_ts': now - 3 * 365 * DAY, 'views': 10, 'refreshed_at': now - 7 * 3600, 'misses': 0}
+    popular = dict(old, id='popular', views=2000000, refreshed_at=now - 8 * DAY)
+    flagged = dict(old, id='flagged', misses=1, refreshed_at=now - 8 * 3600)
+
+    assert refresh_interval(new, now) == 6 * 3600
+    assert refresh_interval(old, now) == 60 * DAY
+    assert refresh_interval(popular, now) == 7 * DAY
+    assert refresh_interval(flagged, now) == 6 * 3600
+
+    # Most overdue first; the old video is nowhere near due
+    assert due_videos([new, old, popular, flagged], now) == [('flagged', 1), ('new', 0), ('popular', 0)]
+
+def test_sweep_checks_the_most_overdue_batches_within_budget(tmp_path):
+    store = CatalogStore(str(tmp_path / 'videos.db'))
+    now = int(time.time()) + 30 * DAY
+    store.insert_new([make_video(f'v{i:03}', now - 3 * DAY) for i in range(120)])
+    calls = []
+
+    def lookup(video_ids):
+        calls.append(len(video_ids))
+        return [make_item(video_id) for video_id in video_ids]
+
+    stats = sweep(store, lookup, max_batches=2, now=now)
+
+    assert calls == [50, 50]
+    assert (stats['due'], stats['checked'], stats['batches']) == (120, 100, 2)
+    assert len(stats['changed']) == 100
+    assert sum(video['views'] == '20' for video in store.get_videos([f'v{i:03}' for i in range(120)])) == 100
+
+    # The rest are still due on the next run; the refreshed ones are not
+    stats = sweep(store, lookup, max_batches=2, now=now)
+    assert (stats['due'], stats['checked']) == (20, 20)
+
+def test_missing_videos_are_flagged_then_dropped(tmp_path):
+    store = CatalogStore(str(tmp_path / 'videos.db'))
+    now = int(time.time()) + 30 * DAY
+    store.insert_new([make_video('kept', now - 3 * DAY), make_video('gone', now - 3 * DAY)])
+
+    def lookup(video_ids):
+        return [make_item('kept')]
+
+    stats = sweep(store, lookup, max_batches=1, now=now)
+    assert stats['flagged'] == ['gone']
+    assert store.get_videos(['gone'])[0]['unavailable'] is True
+
+    # Rechecked sooner than usual, and dropped when it is still missing
+    stats = sweep(store, lookup, max_batches=1, now=now + 7 * 3600)
+    assert stats['dropped'] == ['gone']
+    assert [video['id'] for video in store.get_videos(['kept', 'gone'])] == ['kept']
+
+def test_failed_lookup_keeps_the_saved_batches(tmp_path):
+    store = CatalogStore(str(tmp_path / 'videos.db'))
+    now = int(time.time()) + 30 * DAY
+    store.insert_new([make_video(f'v{i:03}', now - 3 * DAY) for i in range(100)])
+    calls = []
+
+    def lookup(video_ids):
+        calls.append(len(video_ids))
+        if len(calls) > 1:
+            raise RuntimeError('backend error')
+        return [make_item(video_id) for video_id in video_ids]
+
+    stats = sweep(store, lookup, max_batches=2, now=now)
+
+    assert (stats['checked'], stats['batches']) == (50, 1)
+    assert len(due_videos(store.refresh_candidates(), now)) == 50
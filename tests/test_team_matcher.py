@@ -0,0 +1,26 @@
+import pytest
+from team_matcher import extract_ipl_teams, extract_teams_from_text, tag_videos
+
+@pytest.mark.parametrize('title, teams', [
+    ('India vs Australia 1st Test Highlights', ['India', 'Australia']),
+    ('NZ v Ind | 3rd T20I', ['New Zealand', 'India']),
+    ('India Women vs England Women | 2nd ODI', ['India Women', 'England Women']),
+    ('Pakistan U19 v Sri Lanka U19', ['Pakistan U19', 'Sri Lanka U19']),
+    ('Press conference after day one', []),
+])
+def test_extract_teams_from_the_sides_of_a_match(title, teams):
+    assert extract_teams_from_text(title) == teams
+
+def test_ipl_teams_match_codes_and_full_names():
+    assert extract_ipl_teams('MI vs CSK Highlights') == ['Mumbai Indians', 'Chennai Super Kings']
+    assert extract_ipl_teams('kolkata knight riders beat Gujarat Titans') == ['Kolkata Knight Riders', 'Gujarat Titans']
+    assert extract_ipl_teams('Match preview') == ['IPL']
+
+def test_tag_videos_uses_ipl_codes_only_for_ipl_videos():
+    videos = [
+        {'title': 'MI vs CSK Highlights', 'source': 'IPL'},
+        {'title': 'MI vs CSK Highlights'},
+        {'title': 'England vs Pakistan Highlights'},
+    ]
+    tag_videos(videos)
+    assert [video['teams'] for video in videos] == [['Mumbai Indians', 'Chennai Super Kings'], [], ['England', 'Pakistan']]
@@ -0,0 +1,28 @@
+import video_classifier
+from video_classifier import RULES_VERSION, get_rules_version, reclassify_videos
+
+def make_video(title, category='matches', **fields):
+    return dict({'id': title, 'title': title, 'category': category, 'upload_date': '2025-03-01T00:00:00Z'}, **fields)
+
+def test_only_videos_from_older_rules_are_reclassified():
+    current = make_video('India vs England 1970 classic', rules_version=RULES_VERSION)
+    stale = make_video('Australia vs India 1981 Highlights', rules_version='old')
+    unversioned = make_video('Pakistan vs New Zealand Highlights')
+
+    assert reclassify_videos([current, stale, unversioned]) == 2
+    assert current['category'] == 'matches'
+    assert stale['category'] == 'classic' and stale['teams'] == ['Australia', 'India']
+    assert unversioned['rules_version'] == RULES_VERSION and 'upload_ts' in unversioned
+
+    # Forcing reprocesses current records too
+    assert reclassify_videos([current], force=True) == 1
+    assert current['category'] == 'classic'
+
+def test_bcci_non_highlights_move_to_other():
+    video = make_video('Behind the scenes at training', source='BCCI')
+    reclassify_videos([video])
+    assert video['category'] == 'other'
+
+def test_rules_version_changes_with_the_rules(monkeypatch):
+    monkeypatch.setattr(video_classifier, 'CLASSIC_YEAR_CUTOFF', 2024)
+    assert get_rules_version() != RULES_VERSION
@@ -0,0 +1,21 @@
+import pytest
+from video_dates import normalize_upload_dates, upload_timestamp, upload_year
+
+@pytest.mark.parametrize('date_str, expected', [
+    ('2022-07-28T21:41:27Z', 1659044487),
+    ('2022-07-29T03:11:27+05:30', 1659044487),
+    ('2022-07-28', 1658966400),
+    ('28th Jul, 2022', 1658966400),
+    ('28 July 2022', 1658966400),
+    ('', 0),
+    ('yesterday', 0),
+])
+def test_upload_timestamp_parses_every_source_format(date_str, expected):
+    assert upload_timestamp(date_str) == expected
+
+def test_normalize_keeps_existing_timestamps():
+    videos = [{'upload_date': '2022-07-28'}, {'upload_date': '2022-07-28', 'upload_ts': 1}]
+    normalize_upload_dates(videos)
+    assert [video['upload_ts'] for video in videos] == [1658966400, 1]
+    assert upload_year(videos[0]) == 2022
+    assert upload_year({'upload_ts': 0}) is None
@@ -0,0 +1,49 @@
+import json
+from video_fetcher import VideoFetcher
+
+def make_video(video_id, title, category):
+    return {
+        'id': video_id,
+        'title': title,
+        'category': category,
+        'thumbnail_url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg',
+        'upload_date': '2025-01-10T00:00:00Z',
+        'upload_ts': 1736467200
+    }
+
+def write_list(tmp_path, file_name, videos):
+    data_dir = tmp_path / 'static' / 'data'
+    data_dir.mkdir(parents=True, exist_ok=True)
+    (data_dir / file_name).write_text(json.dumps(videos))
+
+def test_videos_in_several_category_files_are_filed_where_the_rules_put_them(tmp_path):
+    # Listed first under matches, but the title is a domestic highlight
+    domestic = 'Ranji Trophy Highlights | Mumbai vs Delhi'
+    write_list(tmp_path, 'matches_videos.json', [make_video('a', domestic, 'matches')])
+    write_list(tmp_path, 'domestic_videos.json', [make_video('a', domestic, 'domestic')])
+    highlights = 'Australia vs India Highlights'
+    write_list(tmp_path, 'classic_videos.json', [make_video('b', highlights, 'classic')])
+    write_list(tmp_path, 'other_videos.json', [make_video('b', highlights, 'other')])
+
+    catalog = VideoFetcher(['key'], base_path=str(tmp_path), use_store=False).load_catalog()
+
+    assert catalog.videos['a']['category'] == 'domestic'
+    # The rules' pick is neither file, so the first listing is kept
+    assert catalog.videos['b']['category'] == 'classic'
+
+def playlist_item(video_id, published_at):
+    return {'contentDetails': {'videoId': video_id, 'videoPublishedAt': published_at}, 'snippet': {'title': video_id}}
+
+def test_incremental_sync_compares_watermarks_as_timestamps(tmp_path, monkeypatch):
+    fetcher = VideoFetcher(['key'], base_path=str(tmp_path), incremental=True)
+    fetcher.load_sync_state()['watermarks']['UC1'] = '2025-01-10T05:00:00Z'
+
+    # Newest first; the second upload is 04:30 UTC, older than the watermark despite its larger string
+    items = [playlist_item('new', '2025-01-10T06:00:00Z'), playlist_item('old', '2025-01-10T10:00:00+05:30'),
+             playlist_item('older', '2025-01-09T00:00:00Z')]
+    monkeypatch.setattr(fetcher, 'get_uploads_playlist_id', lambda channel_id: 'UU1')
+    monkeypatch.setattr(fetcher, 'execute', lambda build_request, method: {'items': items})
+    monkeypatch.setattr(fetcher, 'fetch_video_details', lambda video_ids, channel_id, channel_name: video_ids)
+
+    assert fetcher.fetch_channel_videos_incremental('UC1', 'Channel') == ['new']
+    assert fetcher.pending_watermarks == {'UC1': '2025-01-10T06:00:00Z'}
@@ -0,0 +1,112 @@
+import json
+import threading
+import httplib2
+import pytest
+import youtube_client
+from googleapiclient.errors import HttpError
+from key_manager import YouTubeKeyManager
+from youtube_client import NoKeysAvailable, YouTubeClientPool, is_transient
+
+def make_error(status, reason):
+    content = json.dumps({'error': {'code': status, 'message': reason, 'errors': [{'reason': reason}]}}).encode('utf-8')
+    return HttpError(httplib2.Response({'status': status}), content)
+
+class FakeRequest:
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def execute(self):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+class Script:
+    """Answers each request with the next outcome, recording which key made it"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.keys = []
+
+    def __call__(self, client):
+        self.keys.append(client.api_key)
+        return FakeRequest(self.outcomes.pop(0))
+
+class FakeClient:
+    def __init__(self, api_key):
+        self.api_key = api_key
+
+@pytest.fixture
+def built(monkeypatch):
+    built = []
+
+    def build(service, version, developerKey, **kwargs):
+        built.append((developerKey, threading.get_ident()))
+        return FakeClient(developerKey)
+
+    monkeypatch.setattr(youtube_client, 'build', build)
+    return built
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(youtube_client.time, 'sleep', sleeps.append)
+    monkeypatch.setattr(youtube_client, 'retry_delay', lambda attempt: 2 ** attempt)
+    return sleeps
+
+def test_transient_errors():
+    assert is_transient(make_error(503, 'backendError'))
+    assert is_transient(make_error(429, 'rateLimitExceeded'))
+    assert is_transient(make_error(403, 'userRateLimitExceeded'))
+    assert is_transient(OSError('connection reset'))
+    assert not is_transient(make_error(403, 'quotaExceeded'))
+    assert not is_transient(make_error(404, 'videoNotFound'))
+
+def test_transient_errors_are_retried_with_backoff(built, sleeps):
+    manager = YouTubeKeyManager(['a'])
+    pool = YouTubeClientPool(manager, max_retries=3)
+    script = Script(make_error(503, 'backendError'), OSError('timed out'), {'items': []})
+
+    assert pool.execute(script, 'search.list') == {'items': []}
+    assert sleeps == [1, 2]
+    # Every attempt is charged, since the API may have counted it
+    assert manager.quota_usage == {'a': 300}
+
+def test_retries_give_up_after_max_retries(built, sleeps):
+    pool = YouTubeClientPool(YouTubeKeyManager(['a']), max_retries=2)
+    script = Script(*[make_error(500, 'backendError')] * 3)
+
+    with pytest.raises(HttpError):
+        pool.execute(script, 'videos.list')
+    assert len(sleeps) == 2
+
+def test_spent_key_fails_over_to_the_next(built, sleeps):
+    manager = YouTubeKeyManager(['a', 'b'])
+    manager.charge('b', 'search.list')
+    pool = YouTubeClientPool(manager)
+    script = Script(make_error(403, 'quotaExceeded'), {'items': ['ok']})
+
+    assert pool.execute(script, 'videos.list') == {'items': ['ok']}
+    assert script.keys == ['a', 'b']
+    assert manager.get_available_quota('a') == 0
+    assert sleeps == []
+
+def test_no_keys_left(built, sleeps):
+    manager = YouTubeKeyManager(['a', 'b'])
+    pool = YouTubeClientPool(manager)
+
+    with pytest.raises(HttpError):
+        pool.execute(Script(make_error(403, 'quotaExceeded'), make_error(403, 'dailyLimitExceeded')), 'videos.list')
+    with pytest.raises(NoKeysAvailable):
+        pool.execute(Script({'items': []}), 'videos.list')
+
+def test_clients_are_reused_per_key_and_thread(built):
+    pool = YouTubeClientPool(YouTubeKeyManager(['a', 'b']))
+    assert pool.client('a') is pool.client('a')
+    pool.client('b')
+
+    thread = threading.Thread(target=pool.client, args=('a',))
+    thread.start()
+    thread.join()
+
+    assert [key for key, _ in built] == ['a', 'b', 'a']
+    assert built[0][1] != built[2][1]
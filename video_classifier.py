@@ -0,0 +1,235 @@
+import hashlib
+import json
+import re
+from team_matcher import TEAM_VARIATIONS, IPL_TEAMS, build_alternation, extract_teams_from_text, tag_videos
+from video_dates import upload_timestamp, upload_year, normalize_upload_dates
+
+# PakistanSuperLeague channel: every highlight is a match
+PSL_CHANNEL_ID = 'UCpNzXJ5jpcJojC5mHQvGA8w'
+
+# Non-match topics that send a BCCI highlights video to 'other' in categorize_video
+BCCI_NON_MATCH_TOPICS = [
+    'practice', 'training', 'tour', 'ceremony', 'celebration',
+    'event', 'press conference', 'interview', 'preview',
+    'behind the scenes', 'dressing room', 'trophy', 'award',
+    'fan', 'journey', 'story', 'memories', 'reaction'
+]
+
+# Stricter BCCI highlights check used when ingesting and reclassifying
+BCCI_NON_MATCH_HIGHLIGHTS = [f"{topic} highlights" for topic in BCCI_NON_MATCH_TOPICS]
+
+BCCI_MATCH_INDICATORS = [
+    'match highlights',
+    'innings highlights',
+    'day 1 highlights',
+    'day 2 highlights',
+    'day 3 highlights',
+    'day 4 highlights',
+    'day 5 highlights',
+    'test highlights',
+    'odi highlights',
+    't20 highlights',
+    't20i highlights'
+]
+
+HIGHLIGHT_INDICATORS = [
+    'highlights', 'match highlights', 'innings highlights',
+    'batting highlights', 'bowling highlights', ' vs ', ' v ',
+    'match summary', 'key moments', 'match report',
+    'day 1 highlights', 'day 2 highlights', 'day 3 highlights',
+    'day 4 highlights', 'day 5 highlights'
+]
+
+DOMESTIC_INDICATORS = [
+    'domestic', 'county', 'shield', 'trophy', 'cup',
+    'ranji', 'irani', 'syed mushtaq', 'vijay hazare',
+    'super50', 'plunket shield', 'sheffield', 'marsh',
+    'royal london', 't20 blast', 'vitality blast',
+    'cpl', 'bbl', 'bpl', 'lanka premier', 'hundred'
+]
+
+CLASSIC_INDICATORS = [
+    'classic', 'vintage', 'retro', 'throwback',
+    'memorable', 'history', 'historical', 'legend'
+]
+
+# Years mentioned before the classic cutoff make a video classic
+CLASSIC_YEAR_CUTOFF = 2023
+
+# Videos from before the recent cutoff are treated as archive
+RECENT_YEAR_CUTOFF = 2025
+
+def get_rules_version():
+    """Fingerprint every rule that feeds a stored video's teams and category"""
+    rules = {
+        'bcci_non_match_topics': BCCI_NON_MATCH_TOPICS,
+        'bcci_non_match_highlights': BCCI_NON_MATCH_HIGHLIGHTS,
+        'bcci_match_indicators': BCCI_MATCH_INDICATORS,
+        'highlight_indicators': HIGHLIGHT_INDICATORS,
+        'domestic_indicators': DOMESTIC_INDICATORS,
+        'classic_indicators': CLASSIC_INDICATORS,
+        'classic_year_cutoff': CLASSIC_YEAR_CUTOFF,
+        'recent_year_cutoff': RECENT_YEAR_CUTOFF,
+        'team_variations': TEAM_VARIATIONS,
+        'ipl_teams': IPL_TEAMS
+    }
+    encoded = json.dumps(rules, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+# Stored on each video so unchanged records can skip reclassification
+RULES_VERSION = get_rules_version()
+
+def compile_keywords(keywords):
+    """Compile a keyword list into one substring matcher"""
+    return re.compile(build_alternation(keywords))
+
+class VideoClassifier:
+    YEAR_PATTERN = re.compile(r'20\d{2}|19\d{2}')
+
+    def __init__(self):
+        self.bcci_non_match_topics = compile_keywords(BCCI_NON_MATCH_TOPICS)
+        self.bcci_non_match_highlights = compile_keywords(BCCI_NON_MATCH_HIGHLIGHTS)
+        self.bcci_match_indicators = compile_keywords(BCCI_MATCH_INDICATORS)
+        self.highlight_indicators = compile_keywords(HIGHLIGHT_INDICATORS)
+        self.domestic_indicators = compile_keywords(DOMESTIC_INDICATORS)
+        self.classic_indicators = compile_keywords(CLASSIC_INDICATORS)
+
+    def title_years(self, title_lower):
+        """Get the four-digit years mentioned in a lowercased title"""
+        return [int(year) for year in self.YEAR_PATTERN.findall(title_lower)]
+
+    def video_upload_year(self, video):
+        """Get a record's upload year from its normalized timestamp"""
+        if 'upload_ts' in video:
+            return upload_year(video)
+        return upload_year({'upload_ts': upload_timestamp(video.get('upload_date', ''))})
+
+    def categorize(self, title_lower, description_lower='', channel_id='', source=''):
+        """Categorize a video from its lowercased title and description"""
+        # For BCCI videos, use strict highlights check
+        if source == 'BCCI':
+            # Must explicitly contain 'highlights' keyword
+            if 'highlights' not in title_lower:
+                return 'other'
+            if self.bcci_non_match_topics.search(title_lower):
+                return 'other'
+            return 'matches'
+
+        # Check for live videos first - these go to 'other' category
+        if 'live' in title_lower:
+            return 'other'
+
+        if self.highlight_indicators.search(title_lower):
+            # Special case for PakistanSuperLeague channel
+            if channel_id == PSL_CHANNEL_ID:
+                return 'matches'
+
+            if self.domestic_indicators.search(f"{title_lower} {description_lower}"):
+                return 'domestic'
+
+            # International or undetermined highlights both go to matches
+            return 'matches'
+
+        return 'other'
+
+    def is_bcci_highlight(self, title_lower):
+        """Check that a BCCI title is a proper match highlight"""
+        if 'highlights' not in title_lower:
+            return False
+        if self.bcci_non_match_highlights.search(title_lower):
+            return False
+        return bool(self.bcci_match_indicators.search(title_lower))
+
+    def is_classic(self, title_lower, years, year):
+        """Check if a video should be categorized as classic (pre-2023)"""
+        if any(year < CLASSIC_YEAR_CUTOFF for year in years):
+            return True
+
+        # More recent years should go to matches even if marked as classic
+        if years and self.classic_indicators.search(title_lower):
+            return False
+
+        return year is not None and year < CLASSIC_YEAR_CUTOFF
+
+    def is_recent_relevant(self, title_lower, years, year):
+        """Check if a video is recent and relevant (not archive)"""
+        if 'archive' in title_lower:
+            return False
+        if any(2000 <= year < RECENT_YEAR_CUTOFF for year in years):
+            return False
+        return year is None or year >= RECENT_YEAR_CUTOFF
+
+    def classify(self, video):
+        """Evaluate every rule for a video record in a single pass"""
+        title_lower = video.get('title', '').lower()
+        description_lower = (video.get('description') or '').lower()
+        source = video.get('source', '')
+        years = self.title_years(title_lower)
+        year = self.video_upload_year(video)
+
+        return {
+            'category': self.categorize(title_lower, description_lower, video.get('channel_id', ''), source),
+            'is_bcci_highlight': self.is_bcci_highlight(title_lower),
+            'is_classic': self.is_classic(title_lower, years, year),
+            'is_recent_relevant': self.is_recent_relevant(title_lower, years, year)
+        }
+
+    def classify_many(self, videos):
+        """Classify a list of video records"""
+        return [self.classify(video) for video in videos]
+
+    def apply(self, video, result=None):
+        """Apply the catalog rules to a stored video's category"""
+        result = result or self.classify(video)
+
+        # Move BCCI non-highlights to other, and old videos to classic
+        if video.get('source') == 'BCCI' and not result['is_bcci_highlight']:
+            video['category'] = 'other'
+        if result['is_classic']:
+            video['category'] = 'classic'
+        return video
+
+    def apply_many(self, videos):
+        """Apply the catalog rules to every video in a list"""
+        for video, result in zip(videos, self.classify_many(videos)):
+            self.apply(video, result)
+        return videos
+
+# Compiled once per process
+video_classifier = VideoClassifier()
+
+def categorize_video(title, description='', channel_id='', source=''):
+    """Categorize video based on title and description"""
+    title_lower = title.lower()
+    description_lower = description.lower() if description else ''
+
+    # Extract teams from both title and description
+    teams = extract_teams_from_text(f"{title_lower} {description_lower}")
+    return video_classifier.categorize(title_lower, description_lower, channel_id, source), teams
+
+def classify_many(videos):
+    """Evaluate every classification rule for a list of video records"""
+    return video_classifier.classify_many(videos)
+
+def apply_classification(videos):
+    """Reapply the BCCI and classic rules to a list of video records in place"""
+    return video_classifier.apply_many(videos)
+
+def resolve_category(video, categories):
+    """Pick the category the rules give a video listed in several category files, out of the ones it was listed in"""
+    result = video_classifier.classify(video)
+    resolved = video_classifier.apply(dict(video, category=result['category']), result)['category']
+    return resolved if resolved in categories else categories[0]
+
+def reclassify_videos(videos, force=False):
+    """Re-tag and reclassify records produced by older rules, returning how many were processed"""
+    stale = videos if force else [v for v in videos if v.get('rules_version') != RULES_VERSION]
+    if not stale:
+        return 0
+
+    normalize_upload_dates(stale)
+    tag_videos(stale)
+    apply_classification(stale)
+    for video in stale:
+        video['rules_version'] = RULES_VERSION
+    return len(stale)
@@ -0,0 +1,64 @@
+import calendar
+import logging
+import re
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {name.lower(): index for index, name in enumerate(calendar.month_abbr) if name}
+
+# "2nd Nov, 2024", "20 Apr, 2025" and "20 April 2025" from the IPL/BCCI sites
+DAY_MONTH_YEAR_PATTERN = re.compile(r'(\d{1,2})(?:st|nd|rd|th)?\s+([A-Za-z]+),?\s+(\d{4})')
+
+# "2022-07-28" and "2022-07-28T21:41:27Z" from YouTube
+ISO_DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def parse_upload_date(date_str):
+    """Parse an upload date from any source format into a UTC datetime"""
+    if not date_str:
+        return None
+
+    date_str = date_str.strip()
+    try:
+        if ISO_DATE_PATTERN.match(date_str):
+            if 'T' not in date_str:
+                return datetime.strptime(date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            parsed = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+            if parsed.tzinfo is None:
+                return parsed.replace(tzinfo=timezone.utc)
+            return parsed.astimezone(timezone.utc)
+
+        match = DAY_MONTH_YEAR_PATTERN.fullmatch(date_str)
+        if match:
+            day, month, year = match.groups()
+            return datetime(int(year), MONTHS[month[:3].lower()], int(day), tzinfo=timezone.utc)
+    except (ValueError, KeyError) as e:
+        logger.error(f"Error parsing date '{date_str}': {e}")
+        return None
+
+    logger.error(f"Unrecognized date format '{date_str}'")
+    return None
+
+def upload_timestamp(date_str):
+    """Convert an upload date string to epoch seconds, 0 if it can't be parsed"""
+    parsed = parse_upload_date(date_str)
+    return int(parsed.timestamp()) if parsed else 0
+
+def upload_year(video):
+    """Get the upload year of a normalized video record"""
+    upload_ts = video.get('upload_ts')
+    if not upload_ts:
+        return None
+    return datetime.fromtimestamp(upload_ts, timezone.utc).year
+
+def normalize_upload_date(video):
+    """Store the sortable upload timestamp on a video record if it is missing"""
+    if 'upload_ts' not in video:
+        video['upload_ts'] = upload_timestamp(video.get('upload_date', ''))
+    return video
+
+def normalize_upload_dates(videos):
+    """Store the sortable upload timestamp on every record that lacks one"""
+    for video in videos:
+        normalize_upload_date(video)
+    return videos
@@ -1,91 +1,40 @@
 import json
 import os
 import logging
-from datetime import datetime
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from config import CRICKET_CHANNELS, IPL_VIDEO_BASE_URL, IPL_DISCLAIMER, BCCI_VIDEO_BASE_URL, BCCI_DISCLAIMER
-from key_manager import YouTubeKeyManager
+from concurrent.futures import ThreadPoolExecutor
+from config import (CRICKET_CHANNELS, IPL_VIDEO_BASE_URL, IPL_DISCLAIMER, BCCI_VIDEO_BASE_URL, BCCI_DISCLAIMER, RATE_LIMITS,
+                    FETCH_RUN_INTERVAL_MINUTES, QUOTA_RESERVE_UNITS, REFRESH_UNITS_PER_RUN, CLASSIC_QUERIES,
+                    CLASSIC_PAGES_PER_RUN, CLASSIC_REVISIT_DAYS, CLASSIC_MIN_VIEWS, DETAILS_CACHE_TTL_HOURS,
+                    DETAILS_CACHE_MAX_ENTRIES)
+from key_manager import YouTubeKeyManager, SQLiteQuotaLedger, METHOD_COSTS
+from quota_planner import (ACTIVITY_WINDOW_DAYS, build_plan, channel_cost, expected_videos, run_budget,
+                           selected_labels, source_entry, staleness_days)
+from rate_limiter import RateLimiter
+from team_matcher import extract_teams_from_text, extract_ipl_teams
+from video_classifier import RULES_VERSION, video_classifier, categorize_video, reclassify_videos, resolve_category
+from video_dates import parse_upload_date, upload_timestamp
+from catalog_publisher import CATEGORIES, Catalog, load_existing_json, is_international_team, publish_catalog
+from catalog_store import CatalogStore
+from refresh_sweeper import sweep
+from details_cache import DETAILS_FIELDS, DETAILS_PARTS, VideoDetailsCache, get_details
+from youtube_client import YouTubeClientPool
+from classic_discovery import BATCH_SIZE as DISCOVERY_BATCH_SIZE, PAGE_SIZE as DISCOVERY_PAGE_SIZE, discover
+import threading
 import time
 import isodate
 import requests
 from bs4 import BeautifulSoup
-import re
+from datetime import datetime, timezone
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def load_existing_json(file_path):
-    """Load existing JSON file if it exists"""
-    try:
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        logger.warning(f"Could not load existing file {file_path}: {e}")
-    return []
-
 def merge_videos(existing_videos, new_videos):
     """Merge new videos with existing ones, avoiding duplicates and sorting by upload date"""
-    # Create a dictionary of existing videos by ID and external_url
-    existing_dict = {}
-    for video in existing_videos:
-        existing_dict[video['id']] = video
-        # Also index by external_url for IPL/BCCI videos
-        if video.get('source') in ['IPL', 'BCCI'] and video.get('external_url'):
-            existing_dict[video['external_url']] = video
-    
-    # Add or update videos
-    for video in new_videos:
-        # For IPL/BCCI videos, check both ID and external_url
-        if video.get('source') in ['IPL', 'BCCI']:
-            # Skip if video already exists by external_url
-            if video.get('external_url') in existing_dict:
-                logger.debug(f"Skipping duplicate {video.get('source')} video: {video.get('title')}")
-                continue
-            # Skip if video already exists by ID
-            if video['id'] in existing_dict:
-                logger.debug(f"Skipping duplicate {video.get('source')} video by ID: {video.get('title')}")
-                continue
-        else:
-            # For YouTube videos, just check ID
-            if video['id'] in existing_dict:
-                logger.debug(f"Skipping duplicate video: {video.get('title')}")
-                continue
-        
-        # Add new video
-        existing_dict[video['id']] = video
-        if video.get('source') in ['IPL', 'BCCI'] and video.get('external_url'):
-            existing_dict[video['external_url']] = video
-    
-    # Convert back to list and remove any duplicates
-    merged = list({v['id']: v for v in existing_dict.values()}.values())
-    
-    # Parse dates for sorting
-    def parse_date(video):
-        try:
-            date_str = video.get('upload_date', '')
-            if not date_str:
-                return datetime.min
-                
-            if ',' in date_str:  # IPL/BCCI format (e.g., "2nd Nov, 2024")
-                parts = date_str.split(',')
-                year = parts[1].strip()
-                month_day = parts[0].strip().split(' ')
-                month = month_day[1]
-                day = month_day[0].replace('th', '').replace('nd', '').replace('rd', '').replace('st', '')
-                return datetime.strptime(f"{day} {month} {year}", "%d %b %Y")
-            elif 'T' in date_str:  # YouTube ISO format with time (e.g., "2022-07-28T21:41:27Z")
-                return datetime.strptime(date_str.split('T')[0], "%Y-%m-%d")
-            else:  # Simple date format (e.g., "2022-07-28")
-                return datetime.strptime(date_str, "%Y-%m-%d")
-        except Exception as e:
-            logger.error(f"Error parsing date '{date_str}': {e}")
-            return datetime.min  # Default to oldest date if parsing fails
-    
-    # Sort by upload date, newest first
-    merged.sort(key=lambda x: parse_date(x), reverse=True)
+    catalog = Catalog(existing_videos)
+    catalog.add_many(new_videos)
+    merged = catalog.sorted_videos()
     
     logger.info(f"Merged videos: {len(merged)} total, {len(new_videos)} new")
     return merged
@@ -115,192 +64,81 @@ def get_best_thumbnail(video):
             return thumbnails[quality]['url']
     return f"https://i.ytimg.com/vi/{video['id']}/hqdefault.jpg"
 
-def get_team_variations():
-    """Get variations of team names with more precise matching"""
-    return {
-        'australia': ['australia', 'aussies'],
-        'india': ['india', 'ind'],
-        'england': ['england', 'eng'],
-        'pakistan': ['pakistan', 'pak'],
-        'south africa': ['south africa', 'proteas'],
-        'new zealand': ['new zealand', 'nz', 'blackcaps'],
-        'west indies': ['west indies', 'windies'],  # Removed 'wi' as it's too ambiguous
-        'sri lanka': ['sri lanka', 'lanka'],
-        'bangladesh': ['bangladesh', 'ban'],
-        'afghanistan': ['afghanistan', 'afg'],
-        'ireland': ['ireland', 'ire'],
-        'zimbabwe': ['zimbabwe', 'zim']
-    }
-
-def extract_teams_from_text(text):
-    """Extract team names from text using variations with more precise matching"""
-    teams = set()
-    text_lower = text.lower()
-    team_variations = get_team_variations()
-    
-    # First check for explicit match patterns with word boundaries
-    vs_patterns = [
-        r'\b(\w+(?:\s+\w+)*)\s+(?:vs|v|versus)\s+(\w+(?:\s+\w+)*)\b',  # normal vs pattern
-        r'\b(\w+(?:\s+\w+)*)\s+(?:vs|v|versus)\s+(\w+(?:\s+\w+)*)\b',  # with extra spaces
-        r'(\w+(?:\s+\w+)*)\s*\|\s*(\w+(?:\s+\w+)*)'  # pattern with | separator
-    ]
-    
-    # Try each pattern to find the teams
-    matched_teams = []
-    for pattern in vs_patterns:
-        matches = re.findall(pattern, text_lower)
-        if matches:
-            # Take only the first match as it's usually the main teams
-            team1, team2 = matches[0][0].strip(), matches[0][1].strip()
-            matched_teams = [team1, team2]
-            break
-    
-    if not matched_teams:
-        return []  # If no vs pattern found, return empty list
-    
-    # Now check each team variation against ONLY the matched teams
-    for team, variations in team_variations.items():
-        for matched_team in matched_teams:
-            # Clean up the variation and add word boundaries
-            for variation in variations:
-                var_pattern = r'\b' + re.escape(variation.strip()) + r'\b'
-                if re.search(var_pattern, matched_team):
-                    # Check if it's a women's team
-                    is_womens = any(w in text_lower for w in [' women', ' w vs', 'vs w', 'w xi'])
-                    # Check if it's U19/Under-19
-                    is_u19 = any(u in text_lower for u in ['u19', 'under-19', 'under 19'])
-                    # Check if it's A team
-                    is_a_team = any(a in text_lower for a in ['-a team', ' a vs', 'a xi'])
-                    
-                    base_team = team.title()
-                    if is_womens:
-                        teams.add(f"{base_team} Women")
-                    elif is_u19:
-                        teams.add(f"{base_team} U19")
-                    elif is_a_team:
-                        teams.add(f"{base_team} A")
-                    else:
-                        teams.add(base_team)
-                    break
-    
-    return list(teams)
-
-def categorize_video(title, description='', channel_id='', source=''):
-    """Categorize video based on title and description"""
-    title_lower = title.lower()
-    description_lower = description.lower() if description else ''
-    
-    # Extract teams from both title and description
-    teams = extract_teams_from_text(f"{title_lower} {description_lower}")
-    
-    # For BCCI videos, use strict highlights check
-    if source == 'BCCI':
-        # Must explicitly contain 'highlights' keyword
-        if 'highlights' not in title_lower:
-            return 'other', teams
-            
-        # Check for non-match highlight types
-        non_match_highlights = [
-            'practice', 'training', 'tour', 'ceremony', 'celebration',
-            'event', 'press conference', 'interview', 'preview',
-            'behind the scenes', 'dressing room', 'trophy', 'award',
-            'fan', 'journey', 'story', 'memories', 'reaction'
-        ]
-        
-        if any(phrase in title_lower for phrase in non_match_highlights):
-            return 'other', teams
-            
-        return 'matches', teams
-    
-    # For other sources, use existing categorization logic
-    # Check for live videos first - these go to 'other' category
-    if 'live' in title_lower:
-        return 'other', teams
-    
-    # Common indicators
-    highlight_indicators = [
-        'highlights', 'match highlights', 'innings highlights',
-        'batting highlights', 'bowling highlights', ' vs ', ' v ',
-        'match summary', 'key moments', 'match report',
-        'day 1 highlights', 'day 2 highlights', 'day 3 highlights',
-        'day 4 highlights', 'day 5 highlights'
-    ]
-    
-    domestic_indicators = [
-        'domestic', 'county', 'shield', 'trophy', 'cup',
-        'ranji', 'irani', 'syed mushtaq', 'vijay hazare',
-        'super50', 'plunket shield', 'sheffield', 'marsh',
-        'royal london', 't20 blast', 'vitality blast',
-        'cpl', 'bbl', 'bpl', 'lanka premier', 'hundred'
-    ]
-    
-    international_indicators = [
-        'test match', 'test series', 'odi series', 't20i',
-        'world cup', 'champions trophy', 'asia cup',
-        'bilateral', 'tri-series', 'tri series',
-        'international', ' vs ', ' v '
-    ]
-    
-    # Check for highlights in title
-    if any(indicator in title_lower for indicator in highlight_indicators):
-        # Special case for PakistanSuperLeague channel
-        if channel_id == 'UCpNzXJ5jpcJojC5mHQvGA8w':
-            return 'matches', teams
-            
-        # Check if it's domestic or international
-        is_domestic = any(indicator in f"{title_lower} {description_lower}" 
-                        for indicator in domestic_indicators)
-        
-        if is_domestic:
-            return 'domestic', teams
-            
-        if any(indicator in f"{title_lower} {description_lower}" 
-               for indicator in international_indicators):
-            return 'matches', teams
-            
-        # Default to matches if we can't determine
-        return 'matches', teams
-    
-    # Rest of your existing categorization logic...
-    # ... (keep the interview and classic detection logic)
-    
-    return 'other', teams
-
 class VideoFetcher:
-    def __init__(self, api_keys, base_path=None):
-        self.key_manager = YouTubeKeyManager(api_keys)
-        self.youtube = None
-        
+    def __init__(self, api_keys, base_path=None, incremental=False, max_workers=1, reclassify_all=False, use_store=True,
+                 quota_ledger=None):
         # Use base_path if provided, otherwise use default
         self.base_path = base_path or '.'
         
-        # Create static/data directory if it doesn't exist
+        # Quota usage outlives the run: a local ledger by default, the shared S3 one in Lambda
+        self.key_manager = YouTubeKeyManager(
+            api_keys, quota_ledger or SQLiteQuotaLedger(f'{self.base_path}/state/quota_ledger.db')
+        )
+        
+        # Bounded worker pool for channels and sources; 1 keeps the serial behaviour
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = RateLimiter(RATE_LIMITS)
+        
+        # Every API call goes through pooled per-key clients with retries and quota failover
+        self.youtube = YouTubeClientPool(self.key_manager, self.rate_limiter)
+        
+        # Existing videos are only reclassified when their rules version is stale
+        self.reclassify_all = reclassify_all
+        
+        # SQLite catalog store is the source of truth behind the JSON files
+        self.use_store = use_store
+        self.store_path = f'{self.base_path}/state/videos.db'
+        self.store = None
+        
+        # Catalog matching the store; a warm Lambda container passes in the one from its last run
+        self.catalog = None
+        
+        # Data files the last publish changed, relative to static/data; None until a publish succeeds
+        self.published_files = None
+        
+        # Incremental mode reads uploads playlists and stops at the last seen upload
+        self.incremental = incremental
+        self.sync_state_path = f'{self.base_path}/state/sync_state.json'
+        self.sync_state = None
+        self.catalog_watermarks = None
+        self.state_lock = threading.RLock()
+        
+        # Watermarks only advance once the uploads they pass are stored, so a failed run fetches them again
+        self.pending_watermarks = {}
+        
+        # Create static/data and state directories if they don't exist
         os.makedirs(f'{self.base_path}/static/data', exist_ok=True)
+        os.makedirs(f'{self.base_path}/state', exist_ok=True)
+        
+        # Known catalog IDs are never looked up again; other details are reused until they expire
+        self.known_ids = None
+        self.details_cache = VideoDetailsCache(
+            f'{self.base_path}/state/video_details.db', DETAILS_CACHE_TTL_HOURS * 3600, DETAILS_CACHE_MAX_ENTRIES
+        )
     
-    def get_youtube_service(self):
-        api_key = self.key_manager.get_current_key()
-        if not api_key:
-            raise Exception("No API keys available")
-        return build('youtube', 'v3', developerKey=api_key, cache_discovery=False)
+    def execute(self, build_request, method):
+        """Run a YouTube API request built from a pooled client, charging its quota cost to the key used"""
+        return self.youtube.execute(build_request, method)
     
     def fetch_channel_videos(self, channel_id, channel_name):
         """Fetch videos from a YouTube channel"""
         try:
-            youtube = self.get_youtube_service()
             videos = []
             next_page_token = None
             
             while True:
                 # Get channel's uploads
-                request = youtube.search().list(
-                    part="id,snippet",
-                    channelId=channel_id,
-                    maxResults=50,
-                    order="date",
-                    type="video",
-                    pageToken=next_page_token
+                response = self.execute(
+                    lambda youtube: youtube.search().list(
+                        part="id,snippet",
+                        channelId=channel_id,
+                        maxResults=50,
+                        order="date",
+                        type="video",
+                        pageToken=next_page_token
+                    ),
+                    'search.list'
                 )
-                response = request.execute()
                 
                 video_ids = []
                 for item in response['items']:
@@ -312,36 +150,7 @@ class VideoFetcher:
                     video_ids.append(item['id']['videoId'])
                 
                 if video_ids:
-                    # Get detailed video information
-                    video_request = youtube.videos().list(
-                        part="snippet,contentDetails,statistics",
-                        id=','.join(video_ids)
-                    )
-                    video_response = video_request.execute()
-                    
-                    for video in video_response['items']:
-                        # Skip shorts
-                        if is_short(video):
-                            continue
-                            
-                        # Create video object
-                        video_data = {
-                            'id': video['id'],
-                            'title': video['snippet']['title'],
-                            'thumbnail_url': video['snippet']['thumbnails']['high']['url'],
-                            'duration': video['contentDetails']['duration'],
-                            'views': video.get('statistics', {}).get('viewCount', 'N/A'),
-                            'category': categorize_video(
-                                video['snippet']['title'],
-                                video['snippet'].get('description', ''),
-                                channel_id
-                            )[0],
-                            'teams': extract_teams_from_text(video['snippet']['title']),
-                            'channel_id': channel_id,
-                            'channel_name': channel_name,
-                            'upload_date': video['snippet']['publishedAt']
-                        }
-                        videos.append(video_data)
+                    videos.extend(self.fetch_video_details(video_ids, channel_id, channel_name))
                 
                 next_page_token = response.get('nextPageToken')
                 if not next_page_token:
@@ -353,336 +162,539 @@ class VideoFetcher:
             logger.error(f"Error fetching videos for channel {channel_name}: {e}")
             return []
     
-    def fetch_classic_matches(self):
+    def fetch_channel_videos_incremental(self, channel_id, channel_name):
+        """Fetch only uploads newer than the channel's watermark via its uploads playlist"""
         try:
-            self.youtube = self.get_youtube_service()
-            
-            # Search for classic cricket match highlights
-            request = self.youtube.search().list(
-                part="id",
-                q="classic cricket match highlights",
-                order="viewCount",  # Changed to viewCount to prioritize popular videos
-                maxResults=1000,
-                type="video",
-                videoDuration="medium"  # Filter for medium length videos
-            )
-            response = request.execute()
-            
+            playlist_id = self.get_uploads_playlist_id(channel_id)
+            watermark = self.get_channel_watermark(channel_id)
+            newest_seen = watermark
+            newest_seen_date = None
             videos = []
-            video_ids = [item['id']['videoId'] for item in response.get('items', [])]
-            
-            if not video_ids:
-                return []
-            
-            # Get detailed video information
-            video_response = self.youtube.videos().list(
-                part="snippet,contentDetails,statistics,status",
-                id=','.join(video_ids)
-            ).execute()
+            next_page_token = None
             
-            for video in video_response.get('items', []):
-                if (video['status'].get('embeddable', False) and 
-                    video['status'].get('privacyStatus') == 'public' and 
-                    not is_short(video)):
-                    try:
-                        # Check if video has at least 100k views
-                        view_count = int(video['statistics'].get('viewCount', '0'))
-                        if view_count < 100000:
+            while True:
+                # playlistItems.list costs 1 unit per page versus 100 for search.list
+                response = self.execute(
+                    lambda youtube: youtube.playlistItems().list(
+                        part="snippet,contentDetails",
+                        playlistId=playlist_id,
+                        maxResults=50,
+                        pageToken=next_page_token
+                    ),
+                    'playlistItems.list'
+                )
+                
+                video_ids = []
+                reached_watermark = False
+                for item in response.get('items', []):
+                    published_at = item['contentDetails'].get('videoPublishedAt') or item['snippet'].get('publishedAt', '')
+                    published_ts = upload_timestamp(published_at)
+                    
+                    # Uploads playlists are newest first, so stop at the first known upload
+                    if watermark and published_ts and published_ts <= watermark:
+                        reached_watermark = True
+                        break
+                    
+                    if published_ts > newest_seen:
+                        newest_seen = published_ts
+                        newest_seen_date = published_at
+                    
+                    # For ICC Cricket channel, only include videos with "Short Highlights"
+                    if channel_id == 'UCpNzXJ5jpcJojC5mHQvGA8w':
+                        if 'Short Highlights' not in item['snippet']['title']:
                             continue
-                            
-                        video_data = {
-                            'id': video['id'],
-                            'title': video['snippet']['title'],
-                            'thumbnail_src': get_best_thumbnail(video),
-                            'thumbnail_url': get_best_thumbnail(video),
-                            'duration': video['contentDetails']['duration'],
-                            'views': video['statistics'].get('viewCount', 'N/A'),
-                            'category': 'classic',
-                            'teams': extract_teams_from_text(video['snippet']['title'] + ' ' + video['snippet'].get('description', '')),
-                            'channel_id': video['snippet']['channelId'],
-                            'channel_name': video['snippet']['channelTitle'],
-                            'upload_date': video['snippet']['publishedAt']
-                        }
-                        videos.append(video_data)
-                        
-                        if len(videos) >= 500:
-                            break
-                    except Exception as e:
-                        logger.error(f"Error processing video {video.get('id')}: {e}")
-                        continue
+                    
+                    video_ids.append(item['contentDetails']['videoId'])
+                
+                if video_ids:
+                    videos.extend(self.fetch_video_details(video_ids, channel_id, channel_name))
+                
+                next_page_token = response.get('nextPageToken')
+                if reached_watermark or not next_page_token:
+                    break
+            
+            if newest_seen_date:
+                with self.state_lock:
+                    self.pending_watermarks[channel_id] = newest_seen_date
             
+            logger.info(f"Incremental sync for {channel_name}: {len(videos)} new videos since {watermark or 'beginning'}")
             return videos
             
-        except HttpError as e:
-            if e.resp.status in [403, 429]:  # Quota exceeded
-                logger.warning(f"Quota exceeded for key: {self.youtube._developerKey[:10]}...")
-                self.key_manager.update_quota_usage(self.youtube._developerKey, 
-                                                  self.key_manager.daily_quota_limit)
-                return self.fetch_classic_matches()
-            raise
+        except Exception as e:
+            logger.error(f"Error fetching incremental videos for channel {channel_name}: {e}")
+            return []
+    
+    def is_known(self, video_id):
+        """Check whether a video ID is already in the catalog"""
+        with self.state_lock:
+            if self.known_ids is None:
+                self.known_ids = self.get_store().ids() if self.use_store else set(self.load_catalog().videos)
+            return video_id in self.known_ids
+    
+    def get_video_details(self, video_ids):
+        """Get videos.list items keyed by video ID, from the details cache where possible"""
+        def fetch(batch):
+            response = self.execute(
+                lambda youtube: youtube.videos().list(
+                    part=DETAILS_PARTS,
+                    id=','.join(batch),
+                    maxResults=len(batch),
+                    fields=DETAILS_FIELDS
+                ),
+                'videos.list'
+            )
+            return response.get('items', [])
+        
+        return get_details(self.details_cache, video_ids, fetch)
+    
+    def fetch_video_details(self, video_ids, channel_id, channel_name):
+        """Get detailed information for a page of channel video IDs, skipping shorts and known videos"""
+        videos = []
+        new_ids = [video_id for video_id in video_ids if not self.is_known(video_id)]
+        details = self.get_video_details(new_ids) if new_ids else {}
+        
+        for video_id in new_ids:
+            video = details.get(video_id)
+            
+            # Skip deleted, private and short videos
+            if not video or is_short(video):
+                continue
+                
+            # Create video object
+            video_data = {
+                'id': video['id'],
+                'title': video['snippet']['title'],
+                'thumbnail_url': video['snippet']['thumbnails']['high']['url'],
+                'duration': video['contentDetails']['duration'],
+                'views': video.get('statistics', {}).get('viewCount', 'N/A'),
+                'category': categorize_video(
+                    video['snippet']['title'],
+                    video['snippet'].get('description', ''),
+                    channel_id
+                )[0],
+                'teams': extract_teams_from_text(video['snippet']['title']),
+                'channel_id': channel_id,
+                'channel_name': channel_name,
+                'upload_date': video['snippet']['publishedAt'],
+                'upload_ts': upload_timestamp(video['snippet']['publishedAt'])
+            }
+            videos.append(video_data)
+        
+        return videos
+    
+    def load_sync_state(self):
+        """Load cached uploads playlist IDs and per-channel watermarks"""
+        with self.state_lock:
+            if self.sync_state is None:
+                state = load_existing_json(self.sync_state_path)
+                if not isinstance(state, dict):
+                    state = {}
+                state.setdefault('uploads_playlists', {})
+                state.setdefault('watermarks', {})
+                state.setdefault('checked', {})
+                state.setdefault('classic_discovery', {})
+                self.sync_state = state
+            return self.sync_state
+    
+    def save_sync_state(self):
+        """Persist the sync state so the next run can resume from it"""
+        with self.state_lock:
+            try:
+                with open(self.sync_state_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.sync_state, f, ensure_ascii=False, indent=2)
+            except Exception as e:
+                logger.warning(f"Could not save sync state {self.sync_state_path}: {e}")
+    
+    def mark_checked(self, source_key):
+        """Record when a source was last fetched, for quota planning"""
+        state = self.load_sync_state()
+        with self.state_lock:
+            state['checked'][source_key] = int(time.time())
+            self.save_sync_state()
+    
+    def commit_watermarks(self):
+        """Save the watermarks of this run's fetches once their videos are stored"""
+        state = self.load_sync_state()
+        with self.state_lock:
+            if not self.pending_watermarks:
+                return
+            state['watermarks'].update(self.pending_watermarks)
+            self.pending_watermarks = {}
+            self.save_sync_state()
+    
+    def get_uploads_playlist_id(self, channel_id):
+        """Get a channel's uploads playlist ID, using the cached value when available"""
+        state = self.load_sync_state()
+        playlist_id = state['uploads_playlists'].get(channel_id)
+        if playlist_id:
+            return playlist_id
+        
+        response = self.execute(
+            lambda youtube: youtube.channels().list(
+                part="contentDetails",
+                id=channel_id
+            ),
+            'channels.list'
+        )
+        items = response.get('items', [])
+        if not items:
+            raise Exception(f"Channel {channel_id} not found")
+        
+        playlist_id = items[0]['contentDetails']['relatedPlaylists']['uploads']
+        with self.state_lock:
+            state['uploads_playlists'][channel_id] = playlist_id
+            self.save_sync_state()
+        return playlist_id
+    
+    def get_channel_watermark(self, channel_id):
+        """Get the upload timestamp of the newest video already known for a channel, 0 if none is"""
+        state = self.load_sync_state()
+        
+        # Newest upload per channel in the existing catalog, computed once per run
+        with self.state_lock:
+            if self.catalog_watermarks is None:
+                watermarks = {}
+                for video in load_existing_json(f'{self.base_path}/static/data/all_videos.json'):
+                    video_channel = video.get('channel_id')
+                    upload_ts = video.get('upload_ts') or upload_timestamp(video.get('upload_date', ''))
+                    if video_channel and upload_ts > watermarks.get(video_channel, 0):
+                        watermarks[video_channel] = upload_ts
+                self.catalog_watermarks = watermarks
+            
+            # Saved watermarks are dates as the API returned them, compared by their timestamps
+            return max(upload_timestamp(state['watermarks'].get(channel_id, '')), self.catalog_watermarks.get(channel_id, 0))
+    
+    def classic_video_record(self, video):
+        """Build a classic video record from videos.list details, None if it should not be listed"""
+        try:
+            if (not video['status'].get('embeddable', False) or
+                    video['status'].get('privacyStatus') != 'public' or
+                    is_short(video)):
+                return None
+            
+            # Only well-watched videos make the classics list
+            if int(video['statistics'].get('viewCount', '0')) < CLASSIC_MIN_VIEWS:
+                return None
+            
+            return {
+                'id': video['id'],
+                'title': video['snippet']['title'],
+                'thumbnail_src': get_best_thumbnail(video),
+                'thumbnail_url': get_best_thumbnail(video),
+                'duration': video['contentDetails']['duration'],
+                'views': video['statistics'].get('viewCount', 'N/A'),
+                'category': 'classic',
+                'teams': extract_teams_from_text(video['snippet']['title'] + ' ' + video['snippet'].get('description', '')),
+                'channel_id': video['snippet']['channelId'],
+                'channel_name': video['snippet']['channelTitle'],
+                'upload_date': video['snippet']['publishedAt'],
+                'upload_ts': upload_timestamp(video['snippet']['publishedAt'])
+            }
+        except Exception as e:
+            logger.error(f"Error processing video {video.get('id')}: {e}")
+            return None
+    
+    def fetch_classic_matches(self):
+        """Discover classic matches by paging through the configured search queries, a few pages per run"""
+        # Work on a copy so concurrent sync state saves never see it half updated
+        state = self.load_sync_state()
+        with self.state_lock:
+            progress = json.loads(json.dumps(state['classic_discovery']))
+        
+        def search_page(query, page_token):
+            params = {
+                'part': "id",
+                'q': query,
+                'order': "viewCount",  # Most watched first, so the best classics come in first
+                'maxResults': DISCOVERY_PAGE_SIZE,
+                'type': "video",
+                'videoDuration': "medium"  # Filter for medium length videos
+            }
+            if page_token:
+                params['pageToken'] = page_token
+            response = self.execute(lambda youtube: youtube.search().list(**params), 'search.list')
+            video_ids = [item['id']['videoId'] for item in response.get('items', []) if item.get('id', {}).get('videoId')]
+            return video_ids, response.get('nextPageToken')
+        
+        def lookup(video_ids):
+            details = self.get_video_details(video_ids)
+            records = (self.classic_video_record(details[video_id]) for video_id in video_ids if video_id in details)
+            return [record for record in records if record]
+        
+        def save():
+            with self.state_lock:
+                state['classic_discovery'] = json.loads(json.dumps(progress))
+                self.save_sync_state()
+        
+        stats = discover(CLASSIC_QUERIES, progress, search_page, lookup, self.is_known,
+                         CLASSIC_PAGES_PER_RUN, CLASSIC_REVISIT_DAYS * 86400, save)
+        return stats['videos']
     
     def is_recent_relevant_video(self, video_title, upload_date):
         """
         Check if video is recent and relevant (not archive)
         """
         title_lower = video_title.lower()
-        
-        # Filter out archive videos
-        if 'archive' in title_lower:
-            return False
-        
-        # Check for years in title (like 2023, 2022, etc)
-        years = re.findall(r'20\d{2}', title_lower)
-        if years:
-            # If any year mentioned is before 2025, filter it out
-            if any(int(year) < 2025 for year in years):
-                return False
-        
-        # Convert upload_date to datetime for comparison
-        if upload_date:
-            try:
-                upload_datetime = datetime.strptime(upload_date, '%Y-%m-%d')
-                # Filter videos uploaded before 2025
-                if upload_datetime.year < 2025:
-                    return False
-            except ValueError:
-                pass
-            
-        return True
+        year = video_classifier.video_upload_year({'upload_date': upload_date})
+        return video_classifier.is_recent_relevant(title_lower, video_classifier.title_years(title_lower), year)
 
     def is_classic_video(self, video_title, upload_date):
         """
         Check if video should be categorized as classic (pre-2023)
         """
         title_lower = video_title.lower()
+        year = video_classifier.video_upload_year({'upload_date': upload_date})
+        return video_classifier.is_classic(title_lower, video_classifier.title_years(title_lower), year)
+
+    def load_catalog(self):
+        """Load every stored video into one catalog, reclassifying stale records"""
+        data_dir = f'{self.base_path}/static/data'
+        catalog = Catalog()
+        listed = {}  # video ID -> categories whose file lists it
         
-        # Check for explicit classic indicators
-        classic_indicators = [
-            'classic', 'vintage', 'retro', 'throwback',
-            'memorable', 'history', 'historical', 'legend'
-        ]
-        
-        # First check if it has classic indicators and years before 2023
-        if any(indicator in title_lower for indicator in classic_indicators):
-            years = re.findall(r'20\d{2}|19\d{2}', title_lower)
-            if years:
-                # If any year mentioned is before 2023, consider it classic
-                if any(int(year) < 2023 for year in years):
-                    return True
-                else:
-                    return False  # More recent years should go to matches even if marked as classic
-        
-        # Check for years in title (like 2022, 2021, etc)
-        years = re.findall(r'20\d{2}|19\d{2}', title_lower)
-        if years:
-            # If any year mentioned is before 2023, consider it classic
-            if any(int(year) < 2023 for year in years):
-                return True
+        # Category files are what the site shows, so their copy of a video wins over all_videos.json
+        for category in CATEGORIES:
+            for video in load_existing_json(f'{data_dir}/{category}_videos.json'):
+                listed.setdefault(video['id'], []).append(category)
+                catalog.add(video)
+        catalog.add_many(load_existing_json(f'{data_dir}/all_videos.json'))
         
-        # Check upload date
-        if upload_date:
-            try:
-                upload_datetime = datetime.strptime(upload_date.split('T')[0], '%Y-%m-%d')
-                # If uploaded before 2023, consider it classic
-                if upload_datetime.year < 2023:
-                    return True
-            except ValueError:
-                pass
-            
-        return False
-
+        # Older runs could list a video in several category files; the classifier picks the one it stays in
+        moved = 0
+        for video_id, categories in listed.items():
+            video = catalog.videos.get(video_id)
+            if video is None or len(set(categories)) < 2:
+                continue
+            category = resolve_category(video, categories)
+            if category != video['category']:
+                video['category'] = category
+                moved += 1
+        duplicates = sum(1 for categories in listed.values() if len(set(categories)) > 1)
+        if duplicates:
+            logger.info(f"Resolved {duplicates} videos listed in several category files, {moved} moved")
+        
+        videos = list(catalog.videos.values())
+        reclassified = reclassify_videos(videos, force=self.reclassify_all)
+        if reclassified:
+            logger.info(f"Reclassified {reclassified} of {len(videos)} stored videos")
+        return catalog
+    
+    def get_store(self):
+        """Open the catalog store, seeding it from the JSON files the first time"""
+        if self.store is None:
+            self.store = CatalogStore(self.store_path)
+            if self.store.count() == 0:
+                catalog = self.load_catalog()
+                added = self.store.insert_new(list(catalog.videos.values()))
+                logger.info(f"Seeded catalog store with {len(added)} videos from JSON files")
+        return self.store
+    
+    def update_store(self, processed_videos):
+        """Upsert reclassified and new videos into the store, returning the store catalog"""
+        store = self.get_store()
+        
+        if self.reclassify_all:
+            stale = list(store.iter_videos())
+        else:
+            stale = list(store.iter_stale_videos(RULES_VERSION))
+        if stale:
+            reclassify_videos(stale, force=True)
+            store.upsert_many(stale)
+            logger.info(f"Reclassified {len(stale)} stored videos")
+            if self.catalog is not None:
+                self.catalog.videos.update((video['id'], video) for video in stale)
+        
+        added = store.insert_new(processed_videos)
+        logger.info(f"Catalog store has {store.count()} videos, {len(added)} new")
+        with self.state_lock:
+            if self.known_ids is not None:
+                self.known_ids.update(video['id'] for video in added)
+        
+        # Apply this run's changes to a catalog kept from the last run instead of re-reading every row
+        if self.catalog is None:
+            self.catalog = store.load_catalog()
+        else:
+            self.catalog.add_many(added)
+        store.checkpoint()
+        return self.catalog
+    
     def update_json_files(self, new_videos):
         """Update JSON files with new videos"""
         try:
-            # Process videos - filter BCCI non-highlights and handle classics
-            processed_videos = []
-            for video in new_videos:
-                # For BCCI videos, apply strict highlights check
-                if video.get('source') == 'BCCI':
-                    if not self.is_bcci_highlight_video(video['title']):
-                        video['category'] = 'other'  # Move non-highlights to other
-                
-                # Re-extract teams from title
-                video['teams'] = extract_teams_from_text(video['title'])
-                
-                # Handle classic categorization
-                if self.is_classic_video(video['title'], video.get('upload_date')):
-                    video['category'] = 'classic'
-                elif video['category'] == 'matches':
-                    if not self.is_classic_video(video['title'], video.get('upload_date')):
-                        processed_videos.append(video)
-                    continue
-                processed_videos.append(video)
-            
-            categories = ['matches', 'domestic', 'interviews', 'classic', 'other']
-            for category in categories:
-                file_path = f'{self.base_path}/static/data/{category}_videos.json'
-                existing_videos = load_existing_json(file_path)
-                
-                # Filter and update existing videos
-                filtered_existing = []
-                for video in existing_videos:
-                    # Re-extract teams from title for existing videos
-                    video['teams'] = extract_teams_from_text(video['title'])
-                    
-                    # For BCCI videos, apply strict highlights check
-                    if video.get('source') == 'BCCI':
-                        if not self.is_bcci_highlight_video(video['title']):
-                            video['category'] = 'other'  # Move non-highlights to other
-                    
-                    # Handle classic categorization
-                    if self.is_classic_video(video['title'], video.get('upload_date')):
-                        video['category'] = 'classic'
-                    
-                    # Only include videos that belong in this category
-                    if video['category'] == category:
-                        filtered_existing.append(video)
-                
-                # Filter new videos for this category
-                new_category_videos = [v for v in processed_videos if v['category'] == category]
-                
-                if new_category_videos or filtered_existing:
-                    merged_videos = merge_videos(filtered_existing, new_category_videos)
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        json.dump(merged_videos, f, ensure_ascii=False, indent=2)
-                    logger.info(f"Updated {category}_videos.json with {len(merged_videos)} videos")
-            
-            # Update all_videos.json with reprocessed teams
-            all_videos_path = f'{self.base_path}/static/data/all_videos.json'
-            existing_all = load_existing_json(all_videos_path)
-            
-            # Reprocess all existing videos
-            for video in existing_all:
-                # Re-extract teams
-                video['teams'] = extract_teams_from_text(video['title'])
-                
-                # Update categorization
-                if self.is_classic_video(video['title'], video.get('upload_date')):
-                    video['category'] = 'classic'
-                elif video.get('source') == 'BCCI' and not self.is_bcci_highlight_video(video['title']):
-                    video['category'] = 'other'
-            
-            merged_all = merge_videos(existing_all, processed_videos)
-            with open(all_videos_path, 'w', encoding='utf-8') as f:
-                json.dump(merged_all, f, ensure_ascii=False, indent=2)
-            logger.info(f"Updated all_videos.json with {len(merged_all)} total videos")
-            
-            # Update team stats with domestic matches
-            teams_path = f'{self.base_path}/static/data/teams.json'
-            team_stats = {}
-            
-            for video in merged_all:
-                for team in video.get('teams', []):
-                    if team not in team_stats:
-                        team_stats[team] = {
-                            'name': team,
-                            'video_count': 0,
-                            'matches': 0,
-                            'domestic_matches': 0,  # Add counter for domestic matches
-                            'latest_video': None
-                        }
-                    
-                    team_stats[team]['video_count'] += 1
-                    
-                    # Count both international and domestic matches
-                    if video['category'] == 'matches':
-                        team_stats[team]['matches'] += 1
-                    elif video['category'] == 'domestic':
-                        team_stats[team]['domestic_matches'] += 1
-                    
-                    # Update latest video if current video is newer
-                    if not team_stats[team]['latest_video'] or \
-                       video['upload_date'] > team_stats[team]['latest_video']['upload_date']:
-                        team_stats[team]['latest_video'] = {
-                            'id': video['id'],
-                            'title': video['title'],
-                            'thumbnail_url': video['thumbnail_url'],
-                            'upload_date': video['upload_date'],
-                            'category': video['category']  # Add category to latest video info
-                        }
-            
-            # Create a new structure for teams.json that includes domestic teams
-            teams_data = {
-                'international_teams': [],
-                'domestic_teams': [],
-                'variations': get_team_variations(),
-                'domestic_tournaments': {
-                    'india': ['ranji trophy', 'vijay hazare', 'syed mushtaq ali', 'duleep trophy'],
-                    'england': ['county championship', 't20 blast', 'royal london cup', 'the hundred'],
-                    'australia': ['sheffield shield', 'marsh cup', 'big bash'],
-                    'west_indies': ['super50 cup', 'regional 4-day', 'cpl'],
-                    'south_africa': ['4-day series', 'csa t20', 'momentum cup'],
-                    'new_zealand': ['plunket shield', 'ford trophy', 'super smash'],
-                    'pakistan': ['quaid-e-azam trophy', 'pakistan cup', 'national t20'],
-                    'bangladesh': ['national cricket league', 'bangladesh premier league'],
-                    'sri_lanka': ['premier league tournament', 'lanka premier league']
-                }
-            }
-            
-            # Categorize teams as international or domestic
-            for team_data in team_stats.values():
-                if self.is_international_team(team_data['name']):
-                    teams_data['international_teams'].append(team_data)
-                else:
-                    teams_data['domestic_teams'].append(team_data)
-            
-            # Sort teams by video count
-            teams_data['international_teams'].sort(key=lambda x: x['video_count'], reverse=True)
-            teams_data['domestic_teams'].sort(key=lambda x: x['video_count'], reverse=True)
+            # Process videos - normalize dates, re-extract teams, filter BCCI non-highlights and handle classics
+            processed_videos = list(new_videos)
+            reclassify_videos(processed_videos, force=True)
+            
+            if self.use_store:
+                catalog = self.update_store(processed_videos)
+                self.commit_watermarks()
+                self.published_files = publish_catalog(catalog, f'{self.base_path}/static/data')
+                return True
             
-            with open(teams_path, 'w', encoding='utf-8') as f:
-                json.dump(teams_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"Updated teams.json with {len(teams_data['international_teams'])} international teams and {len(teams_data['domestic_teams'])} domestic teams")
+            catalog = self.load_catalog()
+            added = catalog.add_many(processed_videos)
+            logger.info(f"Catalog has {len(catalog)} videos, {added} new")
             
+            self.published_files = publish_catalog(catalog, f'{self.base_path}/static/data')
+            self.commit_watermarks()
             return True
             
         except Exception as e:
             logger.error(f"Error updating JSON files: {e}")
             return False
     
-    def fetch_all_videos(self):
-        all_new_videos = []
-        
-        # First fetch classic matches from general YouTube search
+    def fetch_classic_source(self):
+        """Fetch classic matches from general YouTube search"""
         logger.info("Fetching classic matches from YouTube")
+        videos = self.fetch_classic_matches()
+        self.mark_checked('classic')
+        return videos
+    
+    def fetch_channel_source(self, channel_id, channel_name):
+        """Fetch new non-classic videos for one configured channel"""
+        logger.info(f"Fetching new videos for {channel_name}")
+        if self.incremental:
+            channel_videos = self.fetch_channel_videos_incremental(channel_id, channel_name)
+        else:
+            channel_videos = self.fetch_channel_videos(channel_id, channel_name)
+        self.mark_checked(channel_id)
+        return [v for v in channel_videos if v['category'] != 'classic']
+    
+    def get_source_result(self, label, fetch):
+        """Run a source fetch, logging failures instead of aborting the run"""
         try:
-            classic_videos = self.fetch_classic_matches()
-            all_new_videos.extend(classic_videos)
-            logger.info(f"Fetched {len(classic_videos)} classic matches")
+            return fetch() or []
         except Exception as e:
-            logger.error(f"Error fetching classic matches: {e}")
+            logger.error(f"Error fetching {label}: {e}")
+            return []
+    
+    def refresh_catalog(self, max_units=REFRESH_UNITS_PER_RUN):
+        """Refresh view counts and drop removed videos in the store, returning the sweep stats"""
+        if not self.use_store:
+            logger.warning("Refreshing the catalog needs the catalog store")
+            return {'changed': [], 'flagged': [], 'dropped': []}
+        
+        budget = min(max_units, self.key_manager.get_total_available_quota() - QUOTA_RESERVE_UNITS)
+        if budget <= 0:
+            logger.info("No quota left for refreshing the catalog")
+            return {'changed': [], 'flagged': [], 'dropped': []}
+        
+        def lookup(video_ids):
+            response = self.execute(
+                lambda youtube: youtube.videos().list(
+                    part="statistics,status",
+                    id=','.join(video_ids),
+                    maxResults=len(video_ids),
+                    fields="items(id,statistics/viewCount,status(privacyStatus,embeddable))"
+                ),
+                'videos.list'
+            )
+            return response.get('items', [])
+        
+        stats = sweep(self.get_store(), lookup, budget // METHOD_COSTS['videos.list'])
+        
+        # Keep a catalog carried over from the last run in step with the store
+        if self.catalog is not None:
+            self.catalog.videos.update((video['id'], video) for video in stats['changed'])
+            for video_id in stats['dropped']:
+                self.catalog.remove(video_id)
+        return stats
+    
+    def reclassify_catalog(self, new_videos=()):
+        """Reclassify every stored video with the current rules, without fetching"""
+        self.reclassify_all = True
+        logger.info("Reclassifying all stored videos")
+        return self.update_json_files(list(new_videos))
+    
+    def catalog_activity(self, since):
+        """Get per channel the known videos, the ones uploaded since a timestamp and the newest upload"""
+        if self.use_store:
+            return self.get_store().channel_activity(since)
+        
+        activity = {}
+        for video in load_existing_json(f'{self.base_path}/static/data/all_videos.json'):
+            channel_id = video.get('channel_id')
+            if not channel_id:
+                continue
+            stats = activity.setdefault(channel_id, {'total': 0, 'added': 0, 'newest_upload_ts': 0})
+            upload_ts = video.get('upload_ts') or 0
+            stats['total'] += 1
+            stats['added'] += upload_ts >= since
+            stats['newest_upload_ts'] = max(stats['newest_upload_ts'], upload_ts)
+        return activity
+    
+    def classic_search_cost(self):
+        """Quota units one classic discovery run costs at most: each search page plus its detail lookups"""
+        detail_calls = -(-DISCOVERY_PAGE_SIZE // DISCOVERY_BATCH_SIZE)
+        return CLASSIC_PAGES_PER_RUN * (METHOD_COSTS['search.list'] + detail_calls * METHOD_COSTS['videos.list'])
+    
+    def plan_fetch(self, now=None):
+        """Estimate each source's quota cost and expected new videos, and pick the ones this run's budget allows"""
+        now = now or datetime.now(timezone.utc)
+        now_ts = now.timestamp()
+        since = int(now_ts - ACTIVITY_WINDOW_DAYS * 86400)
+        state = self.load_sync_state()
+        checked = state['checked']
+        activity = self.catalog_activity(since)
+        sources = []
+        
+        classic_added = self.get_store().count_added('classic', since) if self.use_store else 0
+        staleness = staleness_days(checked.get('classic'), None, now_ts)
+        sources.append(source_entry('classic matches', 'search', self.classic_search_cost(),
+                                    expected_videos(classic_added, staleness), staleness))
         
-        # Then fetch other categories from specific channels
         for channel_name, channel_id in CRICKET_CHANNELS.items():
-            logger.info(f"Fetching new videos for {channel_name}")
-            try:
-                channel_videos = self.fetch_channel_videos(channel_id, channel_name)
-                channel_videos = [v for v in channel_videos if v['category'] != 'classic']
-                all_new_videos.extend(channel_videos)
-                logger.info(f"Fetched {len(channel_videos)} new videos from {channel_name}")
-            except Exception as e:
-                logger.error(f"Error fetching videos for {channel_name}: {e}")
-            time.sleep(1)
+            stats = activity.get(channel_id, {'total': 0, 'added': 0, 'newest_upload_ts': None})
+            staleness = staleness_days(checked.get(channel_id), stats['newest_upload_ts'], now_ts)
+            expected = expected_videos(stats['added'], staleness)
+            units = channel_cost(self.incremental, expected, stats['total'], channel_id in state['uploads_playlists'])
+            sources.append(source_entry(channel_name, 'channel', units, expected, staleness, channel_id=channel_id))
         
-        # Fetch IPL videos
-        logger.info("Fetching IPL videos")
-        try:
-            ipl_videos = self.fetch_ipl_videos()
-            if ipl_videos:
-                all_new_videos.extend(ipl_videos)
-                logger.info("Successfully fetched IPL videos")
-        except Exception as e:
-            logger.error(f"Error fetching IPL videos: {e}")
+        # Scrapes cost no API quota
+        for label in ('IPL videos', 'BCCI videos'):
+            sources.append(source_entry(label, 'scrape', 0, 0, 0))
         
-        # Fetch BCCI videos
-        logger.info("Fetching BCCI videos")
-        try:
-            bcci_videos = self.fetch_bcci_videos()
-            if bcci_videos:
-                all_new_videos.extend(bcci_videos)
-                logger.info("Successfully fetched BCCI videos")
-        except Exception as e:
-            logger.error(f"Error fetching BCCI videos: {e}")
+        available = self.key_manager.get_total_available_quota()
+        budget = run_budget(available, now, FETCH_RUN_INTERVAL_MINUTES, QUOTA_RESERVE_UNITS)
+        plan = build_plan(sources, available, budget, now, mode='incremental' if self.incremental else 'search')
+        logger.info(f"Planned {plan['planned_units']} of {budget} budgeted units ({available} left today) "
+                    f"for {len(selected_labels(plan))} of {len(sources)} sources")
+        return plan
+    
+    def fetch_all_videos(self, pending_videos=None, plan=None):
+        """Fetch the sources a quota plan selected, all without one, and publish, folding in videos recorded elsewhere"""
+        # Classic search first, then the channels, then the IPL and BCCI scrapes
+        tasks = [('classic matches', self.fetch_classic_source)]
+        for channel_name, channel_id in CRICKET_CHANNELS.items():
+            tasks.append((channel_name, lambda name=channel_name, cid=channel_id: self.fetch_channel_source(cid, name)))
+        tasks.append(('IPL videos', self.fetch_ipl_videos))
+        tasks.append(('BCCI videos', self.fetch_bcci_videos))
+        
+        if plan is not None:
+            selected = selected_labels(plan)
+            skipped = [label for label, _ in tasks if label not in selected]
+            tasks = [(label, fetch) for label, fetch in tasks if label in selected]
+            if skipped:
+                logger.info(f"Skipping sources over this run's quota budget: {', '.join(skipped)}")
+        
+        if self.max_workers > 1:
+            logger.info(f"Fetching {len(tasks)} sources with {self.max_workers} workers")
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [(label, executor.submit(fetch)) for label, fetch in tasks]
+                results = [(label, self.get_source_result(label, future.result)) for label, future in futures]
+        else:
+            results = [(label, self.get_source_result(label, fetch)) for label, fetch in tasks]
+        
+        # Keep the serial source order so merging stays deterministic
+        all_new_videos = []
+        for label, videos in results:
+            all_new_videos.extend(videos)
+            logger.info(f"Fetched {len(videos)} videos from {label}")
+        
+        # Fetched copies come first so they win over pending ones when merging
+        if pending_videos:
+            all_new_videos.extend(pending_videos)
+            logger.info(f"Folding in {len(pending_videos)} pending videos")
         
         # Update JSON files
         if all_new_videos:
@@ -692,6 +704,8 @@ class VideoFetcher:
             else:
                 logger.error("Failed to update JSON files")
         else:
+            # Nothing to store, so uploads that were all filtered out are not fetched again
+            self.commit_watermarks()
             logger.info("No new videos found")
         
         return all_new_videos
@@ -706,6 +720,7 @@ class VideoFetcher:
                 'Cookie': 'BCCI_COOKIE_CONSENT=Y'
             }
             
+            self.rate_limiter.acquire_url(IPL_VIDEO_BASE_URL)
             response = requests.get(IPL_VIDEO_BASE_URL, headers=headers)
             logger.info(f"IPL response status: {response.status_code}")
             
@@ -730,6 +745,7 @@ class VideoFetcher:
                         'teams': self.extract_ipl_teams(element['data-title']),
                         'source': 'IPL',
                         'upload_date': element['data-videodate'],  # Use data-videodate directly
+                        'upload_ts': upload_timestamp(element['data-videodate']),
                         'disclaimer': IPL_DISCLAIMER,
                         'channel_name': 'IPL',
                         'views': element['data-videoview']
@@ -750,36 +766,13 @@ class VideoFetcher:
 
     def extract_ipl_teams(self, title):
         """Extract team names from IPL video title"""
-        # Add logic to extract team names from title
-        # Example: "CSK vs MI Highlights" -> ["CSK", "MI"]
-        teams = []
-        ipl_teams = {
-            'CSK': 'Chennai Super Kings',
-            'MI': 'Mumbai Indians',
-            'RCB': 'Royal Challengers Bangalore',
-            'KKR': 'Kolkata Knight Riders',
-            'DC': 'Delhi Capitals',
-            'PBKS': 'Punjab Kings',
-            'RR': 'Rajasthan Royals',
-            'SRH': 'Sunrisers Hyderabad',
-            'GT': 'Gujarat Titans',
-            'LSG': 'Lucknow Super Giants'
-        }
-        
-        for short_name in ipl_teams:
-            if short_name in title:
-                teams.append(ipl_teams[short_name])
-        
-        return teams or ['IPL']  # Return ['IPL'] if no teams found
+        # Example: "CSK vs MI Highlights" -> ["Chennai Super Kings", "Mumbai Indians"]
+        return extract_ipl_teams(title)
 
     def parse_ipl_date(self, date_str):
         """Convert IPL date format to ISO format"""
-        try:
-            # Add date parsing logic based on IPL's date format
-            # Return in ISO format: YYYY-MM-DD
-            return datetime.strptime(date_str, '%d %B %Y').strftime('%Y-%m-%d')
-        except:
-            return datetime.now().strftime('%Y-%m-%d')
+        parsed = parse_upload_date(date_str)
+        return parsed.strftime('%Y-%m-%d') if parsed else None
 
     def fetch_bcci_videos(self):
         """Fetch BCCI video information by scraping the website"""
@@ -791,6 +784,7 @@ class VideoFetcher:
             }
             
             logger.info(f"Fetching BCCI videos from: {BCCI_VIDEO_BASE_URL}")
+            self.rate_limiter.acquire_url(BCCI_VIDEO_BASE_URL)
             response = requests.get(BCCI_VIDEO_BASE_URL, headers=headers)
             logger.info(f"BCCI response status: {response.status_code}")
             
@@ -823,6 +817,7 @@ class VideoFetcher:
                             'teams': extract_teams_from_text(title),
                             'source': 'BCCI',
                             'upload_date': element['data-videodate'],
+                            'upload_ts': upload_timestamp(element['data-videodate']),
                             'disclaimer': BCCI_DISCLAIMER,
                             'channel_name': 'BCCI',
                             'views': element['data-videoview']
@@ -848,89 +843,64 @@ class VideoFetcher:
         Determine if a BCCI video is a highlights video - very strict version
         Only allow videos that explicitly contain 'highlights' in the title
         """
-        title_lower = title.lower()
-        
-        # Must contain 'highlights' explicitly
-        if 'highlights' not in title_lower:
-            return False
-        
-        # Even if it has 'highlights', check it's not one of these non-match highlight types
-        non_match_highlights = [
-            'practice highlights',
-            'training highlights',
-            'tour highlights',
-            'ceremony highlights',
-            'celebration highlights',
-            'event highlights',
-            'press conference highlights',
-            'interview highlights',
-            'preview highlights',
-            'behind the scenes highlights',
-            'dressing room highlights',
-            'trophy highlights',
-            'award highlights',
-            'fan highlights',
-            'journey highlights',
-            'story highlights',
-            'memories highlights',
-            'reaction highlights'
-        ]
-        
-        # If it contains any of the non-match highlight phrases, reject it
-        if any(phrase in title_lower for phrase in non_match_highlights):
-            return False
-        
-        # Additional check to ensure it's a match highlight
-        match_indicators = [
-            'match highlights',
-            'innings highlights',
-            'day 1 highlights',
-            'day 2 highlights',
-            'day 3 highlights',
-            'day 4 highlights',
-            'day 5 highlights',
-            'test highlights',
-            'odi highlights',
-            't20 highlights',
-            't20i highlights'
-        ]
-        
-        # Must contain at least one match indicator
-        return any(indicator in title_lower for indicator in match_indicators)
+        return video_classifier.is_bcci_highlight(title.lower())
 
     def parse_bcci_date(self, date_str):
         """Convert BCCI date format to ISO format"""
-        try:
-            # Example: "2nd Nov, 2024" -> "2024-11-02"
-            return datetime.strptime(date_str, '%dth %b, %Y').strftime('%Y-%m-%d')
-        except:
-            try:
-                # Try alternate format: "2 Nov, 2024" -> "2024-11-02"
-                return datetime.strptime(date_str, '%d %b, %Y').strftime('%Y-%m-%d')
-            except:
-                return datetime.now().strftime('%Y-%m-%d')
+        # Example: "2nd Nov, 2024" -> "2024-11-02"
+        parsed = parse_upload_date(date_str)
+        return parsed.strftime('%Y-%m-%d') if parsed else None
 
     def is_international_team(self, team_name):
         """Determine if a team is an international team"""
-        international_teams = set(get_team_variations().keys())
-        # Add women's and U19 variations
-        for team in list(international_teams):
-            international_teams.add(f"{team} Women")
-            international_teams.add(f"{team} U19")
-            international_teams.add(f"{team} A")
-        
-        return team_name.lower() in {t.lower() for t in international_teams}
+        return is_international_team(team_name)
 
 if __name__ == "__main__":
+    import argparse
     from config import get_api_keys
     
+    parser = argparse.ArgumentParser(description="Fetch cricket videos and update the JSON files")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only fetch uploads newer than the last known video of each channel")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of channels and sources to fetch in parallel")
+    parser.add_argument('--reclassify-all', action='store_true',
+                        help="Reclassify every stored video with the current rules and exit")
+    parser.add_argument('--no-store', action='store_true',
+                        help="Merge into the JSON files directly instead of the SQLite catalog store")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Print the quota plan for this run as JSON without fetching anything")
+    parser.add_argument('--plan', action='store_true',
+                        help="Only fetch the sources the quota plan fits into this run's budget")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Refresh view counts and drop removed videos within the refresh budget, then exit")
+    args = parser.parse_args()
+    
+    if args.reclassify_all:
+        # Reclassification only rewrites the stored files, so no API keys are needed
+        fetcher = VideoFetcher(get_api_keys(), reclassify_all=True, use_store=not args.no_store)
+        if not fetcher.reclassify_catalog():
+            exit(1)
+        exit(0)
+    
     api_keys = get_api_keys()
     if not any(api_keys):
         logger.error("No API keys configured")
         exit(1)
     
-    fetcher = VideoFetcher(api_keys)
-    videos = fetcher.fetch_all_videos()
+    fetcher = VideoFetcher(api_keys, incremental=args.incremental, max_workers=args.workers,
+                           use_store=not args.no_store)
+    if args.dry_run:
+        print(json.dumps(fetcher.plan_fetch(), indent=2))
+        exit(0)
+    
+    if args.refresh:
+        stats = fetcher.refresh_catalog()
+        if (stats['changed'] or stats['dropped']) and not fetcher.update_json_files([]):
+            exit(1)
+        exit(0)
+    
+    videos = fetcher.fetch_all_videos(plan=fetcher.plan_fetch() if args.plan else None)
     
     if not videos:
         logger.error("Failed to fetch any videos")
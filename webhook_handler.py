@@ -2,9 +2,15 @@ import json
 import boto3
 import logging
 from video_fetcher import categorize_video
-from config import get_api_keys, CRICKET_CHANNELS
+from video_dates import upload_timestamp
+from delta_log import append_delta, publish_pending
+from notification_queue import NotificationQueue
+from details_cache import DETAILS_FIELDS, DETAILS_PARTS, VideoDetailsCache, get_details
+from config import (get_api_keys, CRICKET_CHANNELS, WEBHOOK_BATCH_SIZE, DETAILS_CACHE_TTL_HOURS,
+                    DETAILS_CACHE_MAX_ENTRIES)
 import xml.etree.ElementTree as ET
-from googleapiclient.discovery import build
+from key_manager import YouTubeKeyManager, S3QuotaLedger
+from youtube_client import YouTubeClientPool
 import isodate
 
 # Set up logging
@@ -15,13 +21,25 @@ logger = logging.getLogger(__name__)
 s3 = boto3.client('s3')
 BUCKET_NAME = 'latestcrickethighlights-videos'
 youtube = None
+key_manager = None
+queue = None
+details_cache = None
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+YT_NS = '{http://www.youtube.com/xml/schemas/2015}'
+
+def get_key_manager():
+    """Get or create the key manager, sharing quota usage with the scheduled fetcher through S3"""
+    global key_manager
+    if key_manager is None:
+        key_manager = YouTubeKeyManager(get_api_keys(), S3QuotaLedger(s3, BUCKET_NAME))
+    return key_manager
 
 def get_youtube_client():
-    """Get or create YouTube client using connection reuse"""
+    """Get the pooled YouTube clients, reused by warm containers so their connections stay open"""
     global youtube
     if youtube is None:
-        api_keys = get_api_keys()
-        youtube = build('youtube', 'v3', developerKey=api_keys[0], cache_discovery=False)
+        youtube = YouTubeClientPool(get_key_manager())
     return youtube
 
 def is_short(video_details):
@@ -37,136 +55,184 @@ def is_short(video_details):
         logger.error(f"Error checking if video is short: {e}")
         return False
 
-def get_video_details(video_id):
-    """Get video details with minimal fields"""
+def get_details_cache():
+    """Get or create the video details cache, reused by warm containers"""
+    global details_cache
+    if details_cache is None:
+        details_cache = VideoDetailsCache(
+            '/tmp/state/video_details.db', DETAILS_CACHE_TTL_HOURS * 3600, DETAILS_CACHE_MAX_ENTRIES
+        )
+    return details_cache
+
+def fetch_videos_details(video_ids):
+    """Get details for up to 50 videos with a single videos.list call"""
+    response = get_youtube_client().execute(
+        lambda client: client.videos().list(
+            part=DETAILS_PARTS,
+            id=','.join(video_ids),
+            maxResults=len(video_ids),
+            fields=DETAILS_FIELDS
+        ),
+        'videos.list'
+    )
+    return response.get('items', [])
+
+def get_videos_details(video_ids):
+    """Get details for a batch of videos keyed by video ID, looking up only the ones not cached"""
+    return get_details(get_details_cache(), video_ids, fetch_videos_details)
+
+def build_video_record(video_details, channel_id):
+    """Categorize a video and build its catalog record"""
+    category, teams = categorize_video(
+        video_details['snippet']['title'],
+        video_details['snippet'].get('description', ''),
+        channel_id
+    )
+    return {
+        'id': video_details['id'],
+        'title': video_details['snippet']['title'],
+        'thumbnail_url': video_details['snippet']['thumbnails']['high']['url'],
+        'duration': video_details['contentDetails']['duration'],
+        'views': video_details['statistics'].get('viewCount', 'N/A'),
+        'category': category,
+        'teams': teams,
+        'channel_id': channel_id,
+        'channel_name': video_details['snippet']['channelTitle'],
+        'upload_date': video_details['snippet']['publishedAt'],
+        'upload_ts': upload_timestamp(video_details['snippet']['publishedAt'])
+    }
+
+def update_json_files(new_videos):
+    """Record a batch of new videos as one delta and list them as pending; the scheduled run folds deltas into the published files"""
     try:
-        client = get_youtube_client()
-        response = client.videos().list(
-            part="snippet,contentDetails,statistics",
-            id=video_id,
-            fields="items(id,snippet(title,description,channelId,channelTitle,publishedAt,thumbnails/high/url),contentDetails/duration,statistics/viewCount)"
-        ).execute()
-        
-        if response['items']:
-            return response['items'][0]
-        return None
+        append_delta(s3, BUCKET_NAME, new_videos)
     except Exception as e:
-        logger.error(f"Error getting video details: {e}")
-        return None
+        logger.error(f"Error recording {len(new_videos)} videos: {e}")
+        return False
 
-def update_json_files(new_video, category):
-    """Update JSON files efficiently"""
+    # The delta is recorded either way, this only makes the videos visible before the next run
     try:
-        file_paths = {
-            'all': 'static/data/all_videos.json',
-            category: f'static/data/{category}_videos.json'
-        }
-        
-        updated = False
-        for key, path in file_paths.items():
-            try:
-                # Get existing videos
-                response = s3.get_object(Bucket=BUCKET_NAME, Key=path)
-                videos = json.loads(response['Body'].read().decode('utf-8'))
-            except s3.exceptions.NoSuchKey:
-                videos = []
-            
-            # Check for duplicates
-            if not any(v['id'] == new_video['id'] for v in videos):
-                videos.insert(0, new_video)  # Add to beginning
-                
-                # Upload with minimal metadata
-                s3.put_object(
-                    Bucket=BUCKET_NAME,
-                    Key=path,
-                    Body=json.dumps(videos, ensure_ascii=False, separators=(',', ':')),
-                    ContentType='application/json'
-                )
-                updated = True
-                logger.info(f"Updated {path}")
-        
-        return updated
+        publish_pending(s3, BUCKET_NAME, added=new_videos)
     except Exception as e:
-        logger.error(f"Error updating JSON files: {e}")
-        return False
+        logger.warning(f"Could not list {len(new_videos)} videos as pending: {e}")
+    return True
+
+def get_queue():
+    """Get or create the notification queue, reused by warm containers"""
+    global queue
+    if queue is None:
+        queue = NotificationQueue()
+    return queue
+
+def parse_notifications(body):
+    """Get (video_id, channel_id) pairs for every entry in a hub feed"""
+    root = ET.fromstring(body)
+    notifications = []
+    for entry in root.findall(f'{ATOM_NS}entry'):
+        video_id = entry.find(f'{YT_NS}videoId')
+        channel_id = entry.find(f'{YT_NS}channelId')
+        if video_id is not None and channel_id is not None:
+            notifications.append((video_id.text, channel_id.text))
+    return notifications
+
+def process_batch(notification_queue, batch):
+    """Look up one batch of queued notifications and publish its videos in a single write"""
+    video_ids = [video_id for video_id, _ in batch]
+    try:
+        details = get_videos_details(video_ids)
+    except Exception as e:
+        logger.error(f"Error getting details for {len(video_ids)} videos: {e}")
+        notification_queue.record_failure(video_ids)
+        return None
+
+    new_videos = []
+    skipped = 0
+    for video_id, channel_id in batch:
+        video_details = details.get(video_id)
+        if not video_details or is_short(video_details):
+            # Deleted, private or short videos are dropped from the queue
+            skipped += 1
+            continue
+        new_videos.append(build_video_record(video_details, channel_id))
+
+    if new_videos and not update_json_files(new_videos):
+        notification_queue.record_failure(video_ids)
+        return None
+
+    notification_queue.remove(video_ids)
+    logger.info(f"Flushed {len(batch)} notifications: {len(new_videos)} published, {skipped} skipped")
+    return new_videos
+
+def flush_queue(notification_queue):
+    """Drain the queued notifications in batches of up to WEBHOOK_BATCH_SIZE"""
+    published = []
+    batches = 0
+    while notification_queue.size():
+        new_videos = process_batch(notification_queue, notification_queue.peek(WEBHOOK_BATCH_SIZE))
+        if new_videos is None:
+            # The hub redelivers the feed when this invocation fails, so nothing depends on the local queue
+            break
+        published.extend(new_videos)
+        batches += 1
+    get_key_manager().flush()
+    return published, batches
 
 def lambda_handler(event, context):
-    """Optimized Lambda handler"""
+    """Queue hub notifications and publish them in batches"""
     try:
         # Handle verification request quickly
-        if event.get('queryStringParameters', {}).get('hub.challenge'):
+        if (event.get('queryStringParameters') or {}).get('hub.challenge'):
             return {
                 'statusCode': 200,
                 'body': event['queryStringParameters']['hub.challenge']
             }
-        
+
+        notification_queue = get_queue()
+
+        # Scheduled flushes drain whatever an earlier failure left in this container
+        if event.get('flush'):
+            published, batches = flush_queue(notification_queue)
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'message': 'Flushed queue', 'published': len(published), 'batches': batches})
+            }
+
         # Parse notification
         body = event.get('body', '')
         if not body:
             return {'statusCode': 400, 'body': 'No body in request'}
-        
-        # Parse XML efficiently
-        root = ET.fromstring(body)
-        entry = root.find('{http://www.w3.org/2005/Atom}entry')
-        if not entry:
+
+        notifications = parse_notifications(body)
+        if not notifications:
             return {'statusCode': 400, 'body': 'No entry in feed'}
-        
-        # Get video and channel IDs
-        video_id = entry.find('{http://www.youtube.com/xml/schemas/2015}videoId').text
-        channel_id = entry.find('{http://www.youtube.com/xml/schemas/2015}channelId').text
-        
+
         # Quick channel validation
-        if channel_id not in CRICKET_CHANNELS.values():
+        monitored = set(CRICKET_CHANNELS.values())
+        notifications = [(video_id, channel_id) for video_id, channel_id in notifications if channel_id in monitored]
+        if not notifications:
             return {'statusCode': 200, 'body': 'Not from monitored channel'}
-        
-        # Get video details
-        video_details = get_video_details(video_id)
-        if not video_details:
-            return {'statusCode': 400, 'body': 'Could not get video details'}
-        
-        # Check if short
-        if is_short(video_details):
-            return {
-                'statusCode': 200,
-                'body': json.dumps({'message': 'Ignored short video'})
-            }
-        
-        # Categorize video
-        category, teams = categorize_video(
-            video_details['snippet']['title'],
-            video_details['snippet'].get('description', ''),
-            channel_id
-        )
-        
-        # Create video object with minimal data
-        new_video = {
-            'id': video_id,
-            'title': video_details['snippet']['title'],
-            'thumbnail_url': video_details['snippet']['thumbnails']['high']['url'],
-            'duration': video_details['contentDetails']['duration'],
-            'views': video_details['statistics'].get('viewCount', 'N/A'),
-            'category': category,
-            'teams': teams,
-            'channel_id': channel_id,
-            'channel_name': video_details['snippet']['channelTitle'],
-            'upload_date': video_details['snippet']['publishedAt']
-        }
-        
-        # Update files
-        success = update_json_files(new_video, category)
-        
+
+        # Every entry of the feed is looked up and published before returning; the queue only
+        # batches them (with anything a failed invocation left behind) into shared lookups
+        queued = notification_queue.enqueue(notifications)
+        published, batches = flush_queue(notification_queue)
+        pending = notification_queue.size()
+
         return {
-            'statusCode': 200,
+            # A failed lookup or write is answered with an error so the hub delivers the feed again
+            'statusCode': 503 if pending else 200,
             'body': json.dumps({
-                'message': 'Successfully processed new video' if success else 'Failed to process video',
-                'video_id': video_id,
-                'category': category
+                'message': 'Queued notifications',
+                'queued': queued,
+                'published': [video['id'] for video in published],
+                'batches': batches,
+                'pending': pending
             })
         }
-        
+
     except Exception as e:
         logger.error(f"Error processing webhook: {e}")
         return {
             'statusCode': 500,
             'body': str(e)
-        } 
\ No newline at end of file
+        }
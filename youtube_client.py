@@ -0,0 +1,99 @@
+import logging
+import random
+import threading
+import time
+import httplib2
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from key_manager import METHOD_COSTS, is_quota_exceeded
+
+logger = logging.getLogger(__name__)
+
+# Transient failures retried with backoff: server errors, throttling and per-second rate limits
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'backendError'}
+MAX_RETRIES = 4
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+# Seconds before a hung request is abandoned and retried
+REQUEST_TIMEOUT = 30
+
+def retry_delay(attempt):
+    """Seconds to wait before a retry, with full jitter so parallel workers spread out"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def error_reasons(error):
+    """Get the reasons listed in a YouTube API error"""
+    details = getattr(error, 'error_details', None) or []
+    return {detail.get('reason') for detail in details if isinstance(detail, dict)}
+
+def is_transient(error):
+    """Check whether an API or network error is worth retrying with the same key"""
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        return status in RETRY_STATUSES or (status == 403 and bool(error_reasons(error) & RETRY_REASONS))
+    return isinstance(error, (OSError, httplib2.HttpLib2Error))
+
+class NoKeysAvailable(Exception):
+    """Every API key has run out of quota for today"""
+
+class YouTubeClientPool:
+    """YouTube API clients shared by every caller: one per key and thread, reusing its keep-alive connections.
+
+    Requests go through execute, which atomically picks and charges the key
+    with the most quota left, retries transient errors with backoff and moves
+    on to the next key when the API reports a key's quota as spent.
+    """
+
+    def __init__(self, key_manager, rate_limiter=None, max_retries=MAX_RETRIES):
+        self.key_manager = key_manager
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+
+        # httplib2 connections are not thread safe, so each worker thread keeps its own clients
+        self.local = threading.local()
+
+    def client(self, api_key):
+        """Get this thread's client for a key, building it the first time"""
+        clients = getattr(self.local, 'clients', None)
+        if clients is None:
+            clients = self.local.clients = {}
+        if api_key not in clients:
+            # The bundled discovery document avoids a network round-trip per client
+            clients[api_key] = build('youtube', 'v3', developerKey=api_key, http=httplib2.Http(timeout=REQUEST_TIMEOUT),
+                                     cache_discovery=False, static_discovery=True)
+        return clients[api_key]
+
+    def execute(self, build_request, method):
+        """Run the request build_request makes from a client, charging method's cost to the key used"""
+        cost = METHOD_COSTS.get(method, 1)
+        retries = 0
+        failovers = 0
+
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire('youtube')
+
+            # Picking the key and charging it is one atomic step, so parallel workers never share its last units
+            api_key = self.key_manager.acquire_key(cost)
+            if api_key is None:
+                raise NoKeysAvailable("No API keys available")
+            try:
+                return build_request(self.client(api_key)).execute()
+            except Exception as e:
+                if isinstance(e, HttpError) and is_quota_exceeded(e) and not is_transient(e):
+                    # Record the spent key so every caller moves on to the next one
+                    logger.warning(f"Quota exceeded for key {self.key_manager.key_ids[api_key]}, trying the next key")
+                    self.key_manager.mark_exhausted(api_key)
+                    failovers += 1
+                    if failovers >= len(self.key_manager.api_keys):
+                        raise
+                    continue
+
+                if not is_transient(e) or retries >= self.max_retries:
+                    raise
+                delay = retry_delay(retries)
+                retries += 1
+                logger.warning(f"{method} failed ({e}), retry {retries} of {self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)